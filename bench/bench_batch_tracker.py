@@ -0,0 +1,127 @@
+# bench_batch_tracker.py
+# RSSITracker(트랙마다 step) vs BatchRSSITracker(NumPy 일괄 step): 결과 일치 확인 + 처리 속도 비교
+"""
+트랙 N개에 같은 RSSI 기록(경로 손실 + 잡음 + 드롭아웃)을 넣고
+1) 두 구현의 전진/회전 명령과 상태가 --tolerance 안에서 같은지 확인하고 (다르면 종료 코드 1)
+2) 초당 처리한 트랙-스텝 수를 비교합니다.
+
+Usage (저장소 루트에서):
+  python bench/bench_batch_tracker.py
+  python bench/bench_batch_tracker.py --tracks 5000 --steps 300 --report out/batch_tracker.json
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from drone.main.rssi_tracker import BatchRSSITracker, Config, RSSITracker  # noqa: E402
+
+# sim3d_run.py와 같은 설정
+CONFIG = Config(
+    ema_alpha=0.25, der_alpha=0.35, scan_period=0.2, found_threshold_db=-70.0, close_threshold_db=-45.0,
+    lost_timeout_s=2.5, yaw_sweep_rate=0.8, yaw_nudge_rate=0.3, approach_speed=0.8, min_speed=0.1,
+    max_speed=1.6, der_gain=5.0,
+)
+
+
+def make_rssi(tracks, steps, dropout, seed):
+    """(steps, tracks) RSSI 기록. 트랙마다 거리가 다르게 변하고, 드롭아웃과 긴 끊김(LOST 유도)은 nan."""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(2.0, 40.0, tracks)
+    speed = rng.uniform(-0.3, 0.1, tracks)
+    t = np.arange(steps)[:, None] * CONFIG.scan_period
+    distance = np.maximum(0.3, start + speed * t)
+    rssi = -45.0 - 20.0 * np.log10(distance) + rng.normal(0.0, 2.0, (steps, tracks))
+    rssi[rng.random((steps, tracks)) < dropout] = np.nan
+    # 일부 트랙은 중간에 lost_timeout_s보다 길게 끊김
+    gap = rng.random(tracks) < 0.2
+    lo = steps // 3
+    rssi[lo:lo + int(CONFIG.lost_timeout_s / CONFIG.scan_period) + 5, gap] = np.nan
+    return rssi
+
+
+def run_scalar(rssi, times):
+    steps, tracks = rssi.shape
+    forward = np.empty((steps, tracks))
+    yaw = np.empty((steps, tracks))
+    states = np.empty((steps, tracks), dtype=np.int8)
+    trackers = [RSSITracker(CONFIG) for _ in range(tracks)]
+    rows = rssi.tolist()
+    started = time.perf_counter()
+    for i in range(steps):
+        now = times[i]
+        row = rows[i]
+        for j, tracker in enumerate(trackers):
+            value = row[j]
+            cmd = tracker.step(None if value != value else value, now=now)
+            forward[i, j] = cmd.forward
+            yaw[i, j] = cmd.yaw_rate
+            states[i, j] = tracker.state.value
+    return forward, yaw, states, time.perf_counter() - started
+
+
+def run_batch(rssi, times):
+    steps, tracks = rssi.shape
+    forward = np.empty((steps, tracks))
+    yaw = np.empty((steps, tracks))
+    states = np.empty((steps, tracks), dtype=np.int8)
+    tracker = BatchRSSITracker(tracks, CONFIG)
+    started = time.perf_counter()
+    for i in range(steps):
+        cmd = tracker.step(rssi[i], now=times[i])
+        forward[i] = cmd.forward
+        yaw[i] = cmd.yaw_rate
+        states[i] = tracker.state
+    return forward, yaw, states, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--steps", type=int, default=300)
+    parser.add_argument("--dropout", type=float, default=0.12, help="packet dropout probability [0..1]")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="max abs difference of forward / yaw")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--report", default=None, help="write the JSON report to this path")
+    args = parser.parse_args()
+
+    rssi = make_rssi(args.tracks, args.steps, args.dropout, args.seed)
+    times = (1000.0 + np.arange(args.steps) * CONFIG.scan_period).tolist()
+
+    f_s, y_s, st_s, scalar_s = run_scalar(rssi, times)
+    f_b, y_b, st_b, batch_s = run_batch(rssi, times)
+
+    track_steps = args.tracks * args.steps
+    report = {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "config": vars(args),
+        "max_abs_diff_forward": float(np.max(np.abs(f_s - f_b))),
+        "max_abs_diff_yaw": float(np.max(np.abs(y_s - y_b))),
+        "state_mismatches": int(np.count_nonzero(st_s != st_b)),
+        "scalar_s": round(scalar_s, 3),
+        "batch_s": round(batch_s, 3),
+        "scalar_track_steps_per_s": round(track_steps / scalar_s),
+        "batch_track_steps_per_s": round(track_steps / batch_s),
+        "speedup": round(scalar_s / batch_s, 1),
+    }
+    report["equivalent"] = (report["max_abs_diff_forward"] <= args.tolerance
+                            and report["max_abs_diff_yaw"] <= args.tolerance
+                            and report["state_mismatches"] == 0)
+    print(json.dumps(report, indent=2))
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to: {args.report}")
+    if not report["equivalent"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# bench_http.py
+# 대시보드 HTTP 처리량 측정: run_server.py(Flask 개발 서버) / asgi.py(uvicorn)
+"""
+keep-alive 연결 N개로 대시보드 경로에 GET을 반복해 초당 요청 수와 지연(p50/p99)을 잽니다.
+드론 부하를 같이 걸려면 다른 터미널에서 bench/loadgen.py를 함께 실행합니다.
+
+Usage (저장소 루트에서):
+  # 1) 기존 구성
+  python origin/run_server.py &
+  python bench/bench_http.py --url http://127.0.0.1:5000 --report out/http_flask.json
+  # 2) 통합 서버
+  python origin/asgi.py --port 8765 --workers 4 &
+  python bench/bench_http.py --url http://127.0.0.1:8765 --report out/http_asgi.json --compare out/http_flask.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_PATHS = ["/drones/status", "/api/tags?limit=50", "/cache/stats"]
+
+
+class Counters:
+    def __init__(self):
+        self.ok = 0
+        self.not_modified = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latencies_ms = []
+        self.status = {}
+
+
+async def read_response(reader):
+    """HTTP/1.1 응답 하나를 읽습니다 (Content-Length / chunked)."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    size = 0
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            n = int((await reader.readuntil(b"\r\n")).strip().split(b";")[0], 16)
+            await reader.readexactly(n + 2)
+            size += n
+            if n == 0:
+                break
+    elif "content-length" in headers:
+        size = int(headers["content-length"])
+        await reader.readexactly(size)
+    keep_alive = headers.get("connection", "").lower() != "close"
+    return status, size, keep_alive
+
+
+async def client(index, args, counters, stop_at):
+    target = urlsplit(args.url)
+    host, port = target.hostname, target.port or 80
+    reader = writer = None
+    i = index
+    while time.monotonic() < stop_at:
+        if writer is None:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+            except OSError:
+                counters.errors += 1
+                await asyncio.sleep(0.1)
+                continue
+        path = args.path[i % len(args.path)]
+        i += 1
+        request = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nConnection: keep-alive\r\n\r\n"
+        started = time.perf_counter()
+        try:
+            writer.write(request.encode())
+            await writer.drain()
+            status, size, keep_alive = await asyncio.wait_for(read_response(reader), args.timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            counters.errors += 1
+            writer.close()
+            writer = None
+            continue
+        counters.latencies_ms.append((time.perf_counter() - started) * 1000.0)
+        counters.status[status] = counters.status.get(status, 0) + 1
+        counters.bytes += size
+        if status == 304:
+            counters.not_modified += 1
+        elif status < 400:
+            counters.ok += 1
+        else:
+            counters.errors += 1
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo), 3)
+
+
+async def run(args):
+    counters = Counters()
+    t0 = time.monotonic()
+    stop_at = t0 + args.duration
+    await asyncio.gather(*(client(i, args, counters, stop_at) for i in range(args.concurrency)))
+    elapsed = time.monotonic() - t0
+    done = counters.ok + counters.not_modified
+    return {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "config": {k: v for k, v in vars(args).items() if k not in ("report", "compare")},
+        "elapsed_s": round(elapsed, 3),
+        "requests": done,
+        "errors": counters.errors,
+        "status": {str(k): v for k, v in sorted(counters.status.items())},
+        "req_per_s": round(done / elapsed, 1),
+        "kb_per_s": round(counters.bytes / 1024 / elapsed, 1),
+        "latency_ms_p50": percentile(counters.latencies_ms, 50),
+        "latency_ms_p99": percentile(counters.latencies_ms, 99),
+    }
+
+
+def compare(report, baseline):
+    print(f"\n{'metric':<16} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key in ("req_per_s", "latency_ms_p50", "latency_ms_p99", "errors"):
+        old, new = baseline.get(key), report.get(key)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old:+.0%}" if old else "-"
+        print(f"{key:<16} {old:>12.2f} {new:>12.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="dashboard base URL")
+    parser.add_argument("--path", action="append", default=None,
+                        help=f"path to request (repeatable, default: {' '.join(DEFAULT_PATHS)})")
+    parser.add_argument("--concurrency", type=int, default=50, help="keep-alive connections")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=10.0, help="per-request timeout (s)")
+    parser.add_argument("--report", default=None, help="write the JSON report to this path")
+    parser.add_argument("--compare", default=None, help="baseline report to compare against")
+    args = parser.parse_args()
+    args.path = args.path or DEFAULT_PATHS
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to: {args.report}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
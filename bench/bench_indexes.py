@@ -0,0 +1,147 @@
+# bench_indexes.py
+# tags / ble_logs 조회: 인덱스 없음 vs schema.py 인덱스
+"""
+임시 DB에 태그 N개(기본 100k)와 ble_logs를 넣고,
+앱이 실제로 쓰는 조회를 인덱스 생성 전/후로 측정합니다.
+
+  - tags.find_one({"mac_address": ...})               (태그 조회 / 중복 검사)
+  - ble_logs.find_one({"drone_id", "mac_address"})    (BLE upsert 키)
+  - register_tag 방식 비교: find_one + insert_one  vs  insert_one + DuplicateKeyError
+
+Usage (저장소 루트에서, mongod 실행 후):
+  python bench/bench_indexes.py --tags 100000 --lookups 2000
+"""
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "origin"))
+
+from pymongo import MongoClient  # noqa: E402
+from pymongo.errors import DuplicateKeyError  # noqa: E402
+
+import schema  # noqa: E402
+
+
+def mac_for(i):
+    return ":".join(f"{b:02X}" for b in i.to_bytes(6, "big"))
+
+
+def timed(fn, args_list):
+    samples = []
+    for args in args_list:
+        t = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - t) * 1000.0)
+    return samples
+
+
+def plan_stage(collection, query):
+    """explain의 winningPlan 최상위 입력 단계 (COLLSCAN / IXSCAN)"""
+    plan = collection.find(query).explain()["queryPlanner"]["winningPlan"]
+    while "inputStage" in plan:
+        plan = plan["inputStage"]
+    return plan["stage"]
+
+
+def report(label, samples, stage=""):
+    p50 = statistics.median(samples)
+    p99 = sorted(samples)[int(len(samples) * 0.99) - 1]
+    print(f"{label:<34} {stage:<9} p50 {p50:8.3f} ms   p99 {p99:8.3f} ms")
+    return p50
+
+
+def populate(db, n_tags, n_drones):
+    rng = random.Random(0)
+    now = datetime.datetime.utcnow()
+    batch = 10000
+    for start in range(0, n_tags, batch):
+        db.tags.insert_many([
+            {"mac_address": mac_for(i), "tag_name": f"tag{i}", "location": f"room{i % 50}"}
+            for i in range(start, min(start + batch, n_tags))
+        ], ordered=False)
+    # 드론마다 서로 다른 MAC (unique (drone_id, mac_address) 인덱스를 만들 수 있도록)
+    logs = [
+        {"drone_id": f"drone{d:02d}", "mac_address": mac_for(i), "device_name": "dev", "timestamp": now}
+        for d in range(n_drones) for i in rng.sample(range(n_tags), n_tags // n_drones)
+    ]
+    for start in range(0, len(logs), batch):
+        db.ble_logs.insert_many(logs[start:start + batch], ordered=False)
+    return logs
+
+
+def run_lookups(db, logs, n_tags, lookups, label):
+    rng = random.Random(1)
+    macs = [({"mac_address": mac_for(rng.randrange(n_tags))},) for _ in range(lookups)]
+    keys = [({"drone_id": d["drone_id"], "mac_address": d["mac_address"]},) for d in rng.sample(logs, lookups)]
+    print(f"\n[{label}]")
+    tags = report("tags by mac_address", timed(db.tags.find_one, macs), plan_stage(db.tags, macs[0][0]))
+    ble = report("ble_logs by (drone_id, mac)", timed(db.ble_logs.find_one, keys), plan_stage(db.ble_logs, keys[0][0]))
+    return tags, ble
+
+
+def register_two_step(collection, doc):
+    if collection.find_one({"mac_address": doc["mac_address"]}):
+        return 409
+    collection.insert_one(dict(doc))
+    return 201
+
+
+def register_atomic(collection, doc):
+    try:
+        collection.insert_one(dict(doc))
+    except DuplicateKeyError:
+        return 409
+    return 201
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default=os.environ.get("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="DroneDB_bench")
+    parser.add_argument("--tags", type=int, default=100000)
+    parser.add_argument("--drones", type=int, default=10)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="keep the bench database afterwards")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri)
+    client.drop_database(args.db)
+    db = client[args.db]
+    try:
+        t = time.perf_counter()
+        logs = populate(db, args.tags, args.drones)
+        print(f"populated {args.tags} tags, {len(logs)} ble_logs in {time.perf_counter() - t:.1f}s")
+
+        before = run_lookups(db, logs, args.tags, args.lookups, "no indexes")
+
+        # schema.py와 같은 정의로 인덱스 생성
+        t = time.perf_counter()
+        for name, indexes in schema.INDEXES.items():
+            for keys, options in indexes:
+                db[name].create_index(keys, **options)
+        print(f"\ncreated indexes in {time.perf_counter() - t:.1f}s")
+
+        after = run_lookups(db, logs, args.tags, args.lookups, "schema.py indexes")
+        print(f"\nspeedup: tags x{before[0] / after[0]:.1f}, ble_logs x{before[1] / after[1]:.1f}")
+
+        # 등록: 절반은 이미 있는 MAC (409), 절반은 새 MAC (201)
+        rng = random.Random(2)
+        docs = [({"mac_address": mac_for(rng.randrange(args.tags * 2)), "tag_name": "t", "location": "l"},)
+                for _ in range(args.lookups)]
+        print("\n[register_tag]")
+        report("find_one + insert_one", timed(lambda d: register_two_step(db.tags, d), docs))
+        db.tags.delete_many({"tag_name": "t"})  # 첫 측정에서 넣은 태그 제거
+        report("insert_one + DuplicateKeyError", timed(lambda d: register_atomic(db.tags, d), docs))
+    finally:
+        if not args.keep:
+            client.drop_database(args.db)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# bench_protocol.py
+# JSON vs MsgPack 메시지 크기/디코딩 시간 비교
+"""
+드론 <-> 서버 메시지를 JSON과 MsgPack으로 인코딩해 메시지당 바이트 수와 디코딩 시간을 비교합니다.
+
+Usage (저장소 루트에서):
+  python bench/bench_protocol.py
+  python bench/bench_protocol.py --count 200000
+"""
+import argparse
+import filecmp
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "origin"))
+import protocol  # noqa: E402
+
+# 드론 / 서버가 같은 protocol.py를 써야 함
+COPIES = (os.path.join(ROOT, "origin", "protocol.py"), os.path.join(ROOT, "drone", "main", "protocol.py"))
+
+
+def random_mac():
+    return ":".join(f"{random.randint(0, 255):02X}" for _ in range(6))
+
+
+def sample_messages():
+    return {
+        "drone_id": {"type": "drone_id", "drone_id": "drone01", "encodings": ["msgpack", "json"]},
+        "ble": {"type": "ble", "mac": random_mac(), "name": "Galaxy Tag"},
+        "ble(unknown)": {"type": "ble", "mac": random_mac(), "name": "Unknown"},
+        "track": {"type": "track", "mac": random_mac()},
+        "stop": {"type": "stop", "mac": random_mac()},
+        "ble_batch/100": next(protocol.ble_batches(
+            [{"mac": random_mac(), "name": "Unknown", "rssi": random.randint(-90, -40)} for _ in range(100)]
+        )),
+    }
+
+
+def bench(messages, count):
+    rows = []
+    for label, msg in messages.items():
+        row = {"message": label}
+        for enc in (protocol.JSON, protocol.MSGPACK):
+            frame = protocol.encode(msg, enc)
+            size = len(frame.encode() if isinstance(frame, str) else frame)
+            assert protocol.decode(frame) == msg, f"왕복 불일치: {label} ({enc})"
+            sec = timeit.timeit(lambda: protocol.decode(frame), number=count)
+            row[enc] = (size, sec / count * 1e6)
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=50000, help="decode repetitions per message")
+    args = parser.parse_args()
+
+    if not filecmp.cmp(*COPIES, shallow=False):
+        print(f"❌ {COPIES[0]}와 {COPIES[1]}의 내용이 다릅니다")
+        sys.exit(1)
+    if protocol.msgpack is None:
+        print("msgpack이 설치되지 않았습니다: pip install msgpack")
+        return
+
+    print(f"{'message':<14} {'json B':>7} {'msgpack B':>10} {'saved':>7} {'json us':>8} {'msgpack us':>11}")
+    for row in bench(sample_messages(), args.count):
+        (jb, jt), (mb, mt) = row[protocol.JSON], row[protocol.MSGPACK]
+        print(f"{row['message']:<14} {jb:>7} {mb:>10} {1 - mb / jb:>6.0%} {jt:>8.2f} {mt:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# bench_tracking.py
+# 광고 수신 -> 드론 제어 명령 지연 비교: tracking.py 서브프로세스 vs 추적 엔진(tracker_engine.py)
+"""
+가짜 BLE 광고(RSSI)를 --rate Hz로 넣고, 각 RSSI가 제어 명령이 될 때까지의 지연(p50/p99)과
+track 명령을 받은 뒤 첫 제어 명령이 나올 때까지의 시간(startup_ms)을 잽니다.
+
+- subprocess: 이전 drone_client.py 방식. track마다 `python3 tracking.py <mac>`을 띄우고 RSSI를 stdin 텍스트로 씀.
+  제어 명령 출력(🛸)을 읽은 시각을 명령 시각으로 봅니다 (관찰을 위해 -u로 출력 버퍼링을 끔).
+- inprocess: TrackerEngine (asyncio.Queue, 같은 이벤트 루프)
+- process: ProcessTrackerEngine (워커 프로세스 + 공유 메모리 링 버퍼). 첫 결과는 워커를 띄우는 추적(워커가 뜨는 동안
+  쌓인 RSSI의 지연 포함), "warm"은 띄워 둔 워커를 다음 추적에서 다시 쓸 때입니다.
+
+제어 명령 출력(send_drone_command)은 측정하는 동안 /dev/null로 보냅니다.
+
+Usage (저장소 루트에서):
+  python bench/bench_tracking.py --report out/tracking.json
+  python bench/bench_tracking.py --mode inprocess --mode process --rate 50 --samples 1000
+"""
+import argparse
+import asyncio
+import contextlib
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+from drone.main.rssi_tracker import Config  # noqa: E402
+from drone.main.tracker_engine import (  # noqa: E402
+    LatencyLog, ProcessTrackerEngine, TrackerEngine, TrackerProcess
+)
+
+MODES = ["subprocess", "inprocess", "process"]
+TARGET_MAC = "AA:BB:CC:DD:EE:FF"
+# drone_client.py와 같은 설정
+CONFIG = Config(ema_alpha=0.25, der_alpha=0.35, found_threshold_db=-65.0, close_threshold_db=-40.0, lost_timeout_s=3.0)
+
+
+def fake_rssi():
+    return round(random.uniform(-85.0, -40.0), 1)
+
+
+@contextlib.contextmanager
+def quiet_stdout():
+    """fd 1을 /dev/null로 돌립니다 (이 사이에 띄운 워커 프로세스 포함)."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+async def bench_subprocess(args):
+    latency = LatencyLog(maxlen=args.samples)
+    t0 = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "-u", "tracking.py", TARGET_MAC, cwd=os.path.join(ROOT, "drone", "main"),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+    commands = asyncio.Queue()
+
+    async def read_commands():
+        while True:
+            line = await proc.stdout.readline()
+            if not line:
+                break
+            if line.decode(errors="ignore").startswith("🛸"):
+                commands.put_nowait(time.perf_counter())
+
+    reader = asyncio.create_task(read_commands())
+    startup_ms = None
+    try:
+        for i in range(args.samples):
+            t_rx = time.perf_counter()
+            proc.stdin.write(f"{fake_rssi()}\n".encode())
+            await proc.stdin.drain()
+            t_cmd = await asyncio.wait_for(commands.get(), args.timeout)
+            if i == 0:
+                startup_ms = round((t_cmd - t0) * 1000.0, 3)
+            latency.add(t_rx, t_cmd)
+            latency.steps += 1
+            await asyncio.sleep(1.0 / args.rate)
+    finally:
+        proc.stdin.close()
+        await proc.wait()
+        reader.cancel()
+    return {"startup_ms": startup_ms, **latency.summary()}
+
+
+async def feed_engine(engine, args):
+    """광고를 --rate Hz로 넣습니다. 첫 제어 명령까지의 시간(ms)을 반환합니다."""
+    t0 = time.perf_counter()
+    task = asyncio.create_task(engine.run())
+    startup_ms = None
+    try:
+        for _ in range(args.samples):
+            engine.feed(fake_rssi())
+            await asyncio.sleep(1.0 / args.rate)
+            if startup_ms is None and engine.latency.samples:
+                startup_ms = round((engine.latency.t_first - t0) * 1000.0, 3)
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    return startup_ms
+
+
+async def bench_inprocess(args):
+    engine = TrackerEngine(CONFIG)
+    startup_ms = await feed_engine(engine, args)
+    return {"startup_ms": startup_ms, **engine.stats()}
+
+
+async def bench_process(args):
+    t0 = time.perf_counter()
+    process = TrackerProcess(CONFIG)
+    try:
+        engine = ProcessTrackerEngine(process)
+        await feed_engine(engine, args)
+        startup_ms = round((engine.latency.t_first - t0) * 1000.0, 3) if engine.latency.samples else None
+        result = {"startup_ms": startup_ms, **engine.stats()}
+        # 띄워 둔 워커로 다음 추적 (drone_client.py는 워커를 시작 시 미리 띄움)
+        warm = ProcessTrackerEngine(process)
+        warm_startup_ms = await feed_engine(warm, args)
+        result["warm"] = {"startup_ms": warm_startup_ms, **warm.stats()}
+    finally:
+        process.close()
+    return result
+
+
+async def run(args):
+    results = {}
+    for mode in args.mode:
+        with quiet_stdout():
+            results[mode] = await globals()[f"bench_{mode}"](args)
+        print(f"{mode:<11} {json.dumps(results[mode])}")
+    return {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "config": {k: v for k, v in vars(args).items() if k not in ("report", "compare")},
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    print(f"\n{'mode':<11} {'metric':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for mode, result in report["results"].items():
+        old_result = baseline["results"].get(mode, {})
+        for key in ("startup_ms", "latency_ms_p50", "latency_ms_p99"):
+            old, new = old_result.get(key), result.get(key)
+            if mode == "process" and "warm" in result:
+                old, new = old_result.get("warm", {}).get(key), result["warm"].get(key)
+            if old is None or new is None:
+                continue
+            change = f"{(new - old) / old:+.0%}" if old else "-"
+            print(f"{mode:<11} {key:<16} {old:>10.3f} {new:>10.3f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mode", action="append", choices=MODES, default=None,
+                        help=f"mode to measure (repeatable, default: {' '.join(MODES)})")
+    parser.add_argument("--rate", type=float, default=20.0, help="adverts per second")
+    parser.add_argument("--samples", type=int, default=400, help="adverts per mode")
+    parser.add_argument("--timeout", type=float, default=10.0, help="max wait for one command (s)")
+    parser.add_argument("--report", default=None, help="write the JSON report to this path")
+    parser.add_argument("--compare", default=None, help="baseline report to compare against")
+    args = parser.parse_args()
+    args.mode = args.mode or MODES
+
+    report = asyncio.run(run(args))
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to: {args.report}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# loadgen.py
+# 다중 드론 부하 생성기 / 릴레이 벤치마크
+"""
+하나의 asyncio 프로세스에서 N개의 가상 드론을 띄워 origin/server.py에 부하를 겁니다.
+
+가상 드론은 실제 드론과 같은 메시지를 보냅니다:
+  drone_id 등록(인코딩 협상) -> ble_batch 인벤토리 -> ping, ble 갱신, rssi_batch 텔레메트리
+제어 연결 하나가 Flask처럼 track/stop 명령을 보내고, 드론이 받기까지의 릴레이 지연을 잽니다.
+(명령마다 고유한 MAC을 써서 송신/수신을 짝지음)
+--mongo-uri를 주면 serverStatus opcounters로 실행 중 Mongo 쓰기 속도도 측정합니다.
+
+Usage (저장소 루트에서, 로컬 서버/mongod 실행 후):
+  python bench/loadgen.py --drones 50 --duration 30 --report out/run1.json
+  python bench/loadgen.py --drones 200 --encoding json --report out/run2.json --compare out/run1.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "origin"))
+
+import websockets  # noqa: E402
+
+import protocol  # noqa: E402
+from drone.main.sim3d_run import rssi_from_distance_3d  # noqa: E402
+
+
+class Counters:
+    def __init__(self):
+        self.sent = 0            # 드론 -> 서버 프레임 수
+        self.sent_bytes = 0
+        self.received = 0        # 서버 -> 드론 프레임 수
+        self.commands_sent = 0
+        self.commands_lost = 0
+        self.latencies_ms = []   # 명령 릴레이 지연
+        self.connect_ms = []     # 연결 + 등록 + 인벤토리 업로드 시간
+        self.errors = 0
+        self.pending = {}        # {mac: 보낸 시각}
+
+
+def synthetic_mac(rng):
+    return ":".join(f"{rng.randint(0, 255):02X}" for _ in range(6))
+
+
+async def send(ws, counters, msg, encoding):
+    frame = protocol.encode(msg, encoding)
+    await ws.send(frame)
+    counters.sent += 1
+    counters.sent_bytes += len(frame) if isinstance(frame, bytes) else len(frame.encode())
+
+
+async def fake_drone(index, args, counters, stop_at):
+    """가상 드론 하나. 실제 drone_client와 같은 순서로 메시지를 보냅니다."""
+    rng = random.Random(args.seed + index)
+    drone_id = f"load{index:04d}"
+    # 시뮬레이션용 위치: 타깃 주변 무작위 거리
+    pos = [rng.uniform(-20, 20), rng.uniform(-20, 20), rng.uniform(0, 5)]
+    inventory = [{"mac": synthetic_mac(rng), "name": f"dev{i}"} for i in range(args.inventory)]
+
+    started = time.perf_counter()
+    try:
+        async with websockets.connect(args.uri, max_queue=None) as ws:
+            if args.encoding == protocol.JSON:
+                await ws.send(json.dumps({"type": "drone_id", "drone_id": drone_id}))
+                encoding = protocol.JSON
+            else:
+                welcome, _ = await protocol.register(ws, drone_id)
+                encoding = welcome["encoding"]
+            for batch in protocol.ble_batches(inventory, args.chunk):
+                await send(ws, counters, batch, encoding)
+            counters.connect_ms.append((time.perf_counter() - started) * 1000.0)
+
+            async def receiver():
+                async for frame in ws:
+                    counters.received += 1
+                    data = protocol.decode(frame)
+                    sent_at = counters.pending.pop(data.get("mac"), None)
+                    if sent_at is not None:
+                        counters.latencies_ms.append((time.perf_counter() - sent_at) * 1000.0)
+
+            recv_task = asyncio.create_task(receiver())
+            session = f"{drone_id}-{int(time.time() * 1000)}"
+            next_ping = time.monotonic() + args.ping_interval
+            period = 1.0 / args.telemetry_hz if args.telemetry_hz > 0 else 1.0
+            samples = []
+            try:
+                while time.monotonic() < stop_at:
+                    await asyncio.sleep(period * rng.uniform(0.9, 1.1))
+                    now = time.monotonic()
+                    if now >= next_ping:
+                        await send(ws, counters, {"type": "ping"}, encoding)
+                        next_ping = now + args.ping_interval
+                    if args.ble_rate > 0 and rng.random() < args.ble_rate * period:
+                        dev = rng.choice(inventory)
+                        await send(ws, counters, {"type": "ble", "mac": dev["mac"], "name": dev["name"]}, encoding)
+                    if args.telemetry_hz > 0:
+                        rssi = None if rng.random() < 0.1 else rssi_from_distance_3d(*pos)
+                        samples.append([time.time(), rssi, "SEARCH"])
+                        pos = [p * 0.99 for p in pos]  # 타깃 쪽으로 천천히 이동
+                        if len(samples) >= args.telemetry_hz:
+                            await send(ws, counters, {
+                                "type": "rssi_batch", "session": session,
+                                "mac": inventory[0]["mac"], "samples": samples
+                            }, encoding)
+                            samples = []
+            finally:
+                recv_task.cancel()
+    except Exception as e:
+        counters.errors += 1
+        print(f"❌ {drone_id}: {e}")
+
+
+async def controller(args, counters, stop_at, ready_at):
+    """Flask 대신 track/stop 명령을 보내는 제어 연결."""
+    rng = random.Random(args.seed - 1)
+    await asyncio.sleep(max(0.0, ready_at - time.monotonic()))
+    if args.command_rate <= 0:
+        return
+    async with websockets.connect(args.uri) as ws:
+        while time.monotonic() < stop_at - 1.0:
+            mac = synthetic_mac(rng)
+            drone_id = f"load{rng.randrange(args.drones):04d}"
+            counters.pending[mac] = time.perf_counter()
+            await ws.send(json.dumps({
+                "type": rng.choice(("track", "stop")),
+                "drone_id": drone_id,
+                "mac": mac
+            }))
+            counters.commands_sent += 1
+            await asyncio.sleep(rng.expovariate(args.command_rate))
+    await asyncio.sleep(1.0)  # 마지막 명령 도착 대기
+
+
+def mongo_opcounters(uri):
+    from pymongo import MongoClient
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    try:
+        ops = client.admin.command("serverStatus")["opcounters"]
+        return {k: ops[k] for k in ("insert", "update", "delete", "query")}
+    finally:
+        client.close()
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo), 3)
+
+
+async def run(args):
+    counters = Counters()
+    before = mongo_opcounters(args.mongo_uri) if args.mongo_uri else None
+
+    t0 = time.monotonic()
+    stop_at = t0 + args.ramp + args.duration
+    drones = []
+    for i in range(args.drones):
+        drones.append(asyncio.create_task(fake_drone(i, args, counters, stop_at)))
+        if args.ramp > 0:
+            await asyncio.sleep(args.ramp / args.drones)
+    await asyncio.gather(controller(args, counters, stop_at, t0 + args.ramp), *drones)
+    elapsed = time.monotonic() - t0
+
+    after = mongo_opcounters(args.mongo_uri) if args.mongo_uri else None
+    counters.commands_lost = len(counters.pending)
+
+    lat = counters.latencies_ms
+    report = {
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "config": {k: v for k, v in vars(args).items() if k not in ("report", "compare")},
+        "elapsed_s": round(elapsed, 3),
+        "drones_failed": counters.errors,
+        "frames_sent": counters.sent,
+        "frames_received": counters.received,
+        "msgs_per_s": round(counters.sent / elapsed, 1),
+        "bytes_per_msg": round(counters.sent_bytes / counters.sent, 1) if counters.sent else None,
+        "connect_ms_p50": percentile(counters.connect_ms, 50),
+        "connect_ms_p99": percentile(counters.connect_ms, 99),
+        "commands_sent": counters.commands_sent,
+        "commands_lost": counters.commands_lost,
+        "relay_ms_p50": percentile(lat, 50),
+        "relay_ms_p99": percentile(lat, 99),
+        "relay_ms_mean": round(statistics.fmean(lat), 3) if lat else None,
+    }
+    if before and after:
+        report["mongo_writes_per_s"] = {
+            k: round((after[k] - before[k]) / elapsed, 1) for k in ("insert", "update", "delete")
+        }
+    return report
+
+
+def compare(report, baseline):
+    print(f"\n{'metric':<20} {'baseline':>12} {'current':>12} {'change':>8}")
+    for key in ("msgs_per_s", "bytes_per_msg", "connect_ms_p50", "connect_ms_p99",
+                "relay_ms_p50", "relay_ms_p99", "commands_lost"):
+        old, new = baseline.get(key), report.get(key)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old:+.0%}" if old else "-"
+        print(f"{key:<20} {old:>12.2f} {new:>12.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--uri", default="ws://127.0.0.1:8765", help="WebSocket server")
+    parser.add_argument("--mongo-uri", default=None, help="measure write rates via serverStatus (e.g. mongodb://localhost:27017)")
+    parser.add_argument("--drones", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="steady-state seconds after ramp-up")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds to connect all drones")
+    parser.add_argument("--inventory", type=int, default=100, help="devices per drone in the initial ble_batch")
+    parser.add_argument("--chunk", type=int, default=0, help="ble_batch chunk size (0 = one frame)")
+    parser.add_argument("--ble-rate", type=float, default=1.0, help="ble updates per second per drone")
+    parser.add_argument("--telemetry-hz", type=float, default=5.0, help="synthetic RSSI samples per second per drone")
+    parser.add_argument("--ping-interval", type=float, default=5.0)
+    parser.add_argument("--command-rate", type=float, default=10.0, help="track/stop commands per second")
+    parser.add_argument("--encoding", choices=[protocol.MSGPACK, protocol.JSON], default=protocol.MSGPACK)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--report", default=None, help="write the JSON report to this path")
+    parser.add_argument("--compare", default=None, help="baseline report to compare against")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.report:
+        os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to: {args.report}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
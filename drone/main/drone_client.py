@@ -1,119 +1,198 @@
 import asyncio
 import websockets
-import json
 from bleak import BleakScanner
+import protocol
+from telemetry import TelemetryStream
+from rssi_tracker import Config
+from tracker_engine import TrackerEngine, TrackerProcess, ProcessTrackerEngine
 
 DRONE_ID = "drone01"
 SERVER_URI = "ws://52.79.236.231:8765"
+HEARTBEAT_INTERVAL = 5.0  # 서버로 ping을 보내는 주기 (초)
+BLE_BATCH_CHUNK = 0  # 스캔 결과를 ble_batch 메시지로 보낼 때 청크 크기 (0이면 한 프레임)
+# 추적기 실행 방식: "inprocess"(이 이벤트 루프 안) / "process"(별도 프로세스 + 공유 메모리 링 버퍼)
+TRACKER_MODE = "inprocess"
+TRACKER_CONFIG = Config(
+    ema_alpha=0.25,
+    der_alpha=0.35,
+    found_threshold_db=-65.0,
+    close_threshold_db=-40.0,
+    lost_timeout_s=3.0
+)
 tracking_task = None  # 실행 중인 추적 작업을 저장할 변수
+ack_tasks = set()  # 추적 시작 확인(ack_when_started) 작업. 끝나기 전에 가비지 컬렉션되지 않도록 참조를 둠
+tracker_process = None  # TRACKER_MODE="process"일 때 추적마다 다시 쓰는 워커 프로세스
+telemetry = TelemetryStream(DRONE_ID)  # 추적 중 RSSI를 서버로 전송
 
-async def log_stream(stream, prefix):
-    """Subprocess의 출력 스트림을 실시간으로 읽어 화면에 출력하는 헬퍼 함수"""
-    while True:
-        line = await stream.readline()
-        if line:
-            # tracking.py가 출력하는 모든 메시지 앞에 [TRACKING] 또는 [ERROR]를 붙여줍니다.
-            print(f"{prefix} {line.decode(errors='ignore').strip()}")
-        else:
-            break
+def new_engine(target_mac, session):
+    """TRACKER_MODE에 따라 추적 엔진을 만듭니다. 제어 단계마다 RSSI와 추적기 상태를 텔레메트리로 기록합니다."""
+    global tracker_process
+
+    def on_step(rssi, state, ts):
+        telemetry.record(session, target_mac, rssi, state, ts)
 
-async def tracking_worker(target_mac):
-    """백그라운드에서 실제 추적 로직을 수행하는 워커 함수"""
+    if TRACKER_MODE == "process":
+        if tracker_process is None or not tracker_process.alive():
+            tracker_process = TrackerProcess(TRACKER_CONFIG)
+        return ProcessTrackerEngine(tracker_process, on_step=on_step)
+    return TrackerEngine(TRACKER_CONFIG, on_step=on_step)
+
+async def tracking_worker(target_mac, started=None):
+    """백그라운드에서 실제 추적 로직을 수행하는 워커 함수
+    스캐너 콜백이 대상 MAC의 RSSI를 추적 엔진(tracker_engine.py)에 넣고, 엔진이 바로 제어 명령을 만듭니다.
+    started(Future)가 있으면 스캔을 시작했을 때 결과를, 시작하지 못했으면 예외를 넣습니다.
+    """
     print(f"🔍 추적 시작: {target_mac}")
-    tracking_process = None
+    session = telemetry.new_session(target_mac)
+    engine = new_engine(target_mac, session)
+    engine_task = None
     scanner = None
-    log_tasks = []
+    scanning = False  # scanner.start()가 끝났을 때만 stop() 호출
     try:
-        # tracking.py 실행 시 stdout과 stderr를 PIPE로 연결하여 출력을 가로챌 수 있도록 함
-        tracking_process = await asyncio.create_subprocess_exec(
-            "python3", "tracking.py", target_mac,
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-
-        # tracking.py의 출력을 실시간으로 감시하는 백그라운드 작업 시작
-        stdout_task = asyncio.create_task(log_stream(tracking_process.stdout, "[TRACKING]"))
-        stderr_task = asyncio.create_task(log_stream(tracking_process.stderr, "[TRACKING_ERROR]"))
-        log_tasks = [stdout_task, stderr_task]
-
-        rssi_queue = asyncio.Queue()
-
         def detection_callback(device, advertisement_data):
             if device.address.lower() == target_mac.lower():
-                rssi_queue.put_nowait(advertisement_data.rssi)
+                engine.feed(advertisement_data.rssi)
 
+        engine_task = asyncio.create_task(engine.run())
         scanner = BleakScanner(detection_callback=detection_callback)
         await scanner.start()
+        scanning = True
+        if started and not started.done():
+            started.set_result(True)
 
-        while True:
-            rssi = await rssi_queue.get()
-            print(f"📡 RSSI: {rssi}")
-            if tracking_process and tracking_process.stdin and not tracking_process.stdin.is_closing():
-                tracking_process.stdin.write(f"{rssi}\n".encode())
-                await tracking_process.stdin.drain()
+        await engine_task
     except asyncio.CancelledError:
         print("🛑 추적 작업 취소됨")
     except Exception as e:
         print(f"❌ 추적 워커 오류: {e}")
+        if started and not started.done():
+            started.set_exception(e)
     finally:
-        if scanner:
-            await scanner.stop()
-        
-        # 로그 감시 작업들도 함께 취소
-        for task in log_tasks:
-            if not task.done():
-                task.cancel()
-        
-        if tracking_process:
-            print("...tracking.py 프로세스 종료 중...")
+        if started and not started.done():
+            started.cancel()
+        if scanning:
+            try:
+                await scanner.stop()
+            except Exception as e:
+                print(f"⚠️ BLE 스캐너 중지 실패: {e}")  # 원래 오류를 가리지 않음
+        if engine_task and not engine_task.done():
+            engine_task.cancel()
             try:
-                tracking_process.terminate()
-                await tracking_process.wait()
-            except ProcessLookupError:
+                await engine_task
+            except asyncio.CancelledError:
                 pass
+        print(f"📊 추적 통계: {engine.stats()}")
         print("🛑 추적 완전 중단")
 
 
-async def connect():
+async def heartbeat(websocket, encoding):
+    """연결이 살아 있는 동안 주기적으로 ping을 보냅니다."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        await websocket.send(protocol.encode({"type": "ping"}, encoding))
+
+
+async def stop_tracking():
+    global tracking_task
+    if tracking_task and not tracking_task.done():
+        tracking_task.cancel()
+        await tracking_task
+    tracking_task = None
+
+
+async def send_ack(reply, command_id, ok, result, error=None):
+    """명령 실행 결과를 서버에 알립니다 (command_id가 있는 명령만)."""
+    if reply and command_id:
+        try:
+            await reply({"type": "command_ack", "command_id": command_id, "ok": ok, "result": result, "error": error})
+        except websockets.exceptions.ConnectionClosed:
+            print(f"❌ 명령 확인 전송 실패 (연결 끊김): {command_id}")
+
+
+async def ack_when_started(reply, command_id, started):
+    """추적이 실제로 시작되었는지(스캐너 시작) 기다렸다가 알립니다."""
+    try:
+        await started
+        await send_ack(reply, command_id, True, "started")
+    except asyncio.CancelledError:
+        await send_ack(reply, command_id, False, "rejected", "추적이 시작 전에 취소되었습니다")
+    except Exception as e:
+        await send_ack(reply, command_id, False, "rejected", str(e))
+
+
+async def handle_command(data, reply=None):
+    """서버에서 받은 명령 하나를 처리합니다. reply(msg)가 있으면 실행 결과(command_ack)를 보냅니다."""
     global tracking_task
+    command_id = data.get("command_id")
+    if data.get("type") == "track":
+        target_mac = data["mac"]
+
+        if tracking_task and not tracking_task.done():
+            print("...기존 추적 작업을 중단합니다...")
+        await stop_tracking()
+
+        started = asyncio.get_running_loop().create_future()
+        tracking_task = asyncio.create_task(tracking_worker(target_mac, started))
+        ack_task = asyncio.create_task(ack_when_started(reply, command_id, started))
+        ack_tasks.add(ack_task)
+        ack_task.add_done_callback(ack_tasks.discard)
+
+    elif data.get("type") == "stop":
+        await stop_tracking()
+        await send_ack(reply, command_id, True, "stopped")
+
+
+async def connect():
     async with websockets.connect(SERVER_URI) as websocket:
         print("✅ 서버에 연결되었습니다.")
-        await websocket.send(json.dumps({
-            "type": "drone_id",
-            "drone_id": DRONE_ID
-        }))
-
-        print("📡 주변 BLE 장치 스캔 중...")
-        devices = await BleakScanner.discover(timeout=5.0)
-        for d in devices:
-            await websocket.send(json.dumps({
-                "type": "ble",
-                "mac": d.address,
-                "name": d.name or "Unknown"
-            }))
-        print("📡 BLE 스캔 전송 완료")
-
-        async for message in websocket:
-            try:
-                data = json.loads(message)
-                if data.get("type") == "track":
-                    target_mac = data["mac"]
-                    
-                    if tracking_task and not tracking_task.done():
-                        print("...기존 추적 작업을 중단합니다...")
-                        tracking_task.cancel()
-                        await tracking_task
-                    
-                    tracking_task = asyncio.create_task(tracking_worker(target_mac))
+        # 등록 후 서버가 고른 인코딩(msgpack/json)으로 이후 메시지를 주고받음
+        welcome, pending = await protocol.register(websocket, DRONE_ID)
+        encoding = welcome["encoding"]
+        print(f"🔗 메시지 인코딩: {encoding}")
+        heartbeat_task = asyncio.create_task(heartbeat(websocket, encoding))
+        telemetry.bind(websocket, encoding)
+        telemetry_task = asyncio.create_task(telemetry.run())
 
-            except Exception as e:
-                print(f"❌ 명령 처리 중 오류: {e}")
+        if welcome.get("resumed"):
+            # 유예 시간 안에 재연결: 서버가 이전 인벤토리를 그대로 가지고 있음
+            print("🔁 이전 세션 재개 - BLE 인벤토리 업로드 생략")
+        else:
+            print("📡 주변 BLE 장치 스캔 중...")
+            devices = await BleakScanner.discover(timeout=5.0, return_adv=True)
+            inventory = [
+                {"mac": d.address, "name": d.name or "Unknown", "rssi": adv.rssi}
+                for d, adv in devices.values()
+            ]
+            for batch in protocol.ble_batches(inventory, BLE_BATCH_CHUNK):
+                await websocket.send(protocol.encode(batch, encoding))
+            print("📡 BLE 스캔 전송 완료")
+
+        async def reply(msg):
+            await websocket.send(protocol.encode(msg, encoding))
+
+        if pending:
+            await handle_command(pending, reply)
+
+        try:
+            async for message in websocket:
+                try:
+                    await handle_command(protocol.decode(message), reply)
+                except Exception as e:
+                    print(f"❌ 명령 처리 중 오류: {e}")
+        finally:
+            heartbeat_task.cancel()
+            telemetry_task.cancel()
+            telemetry.unbind()
 
 if __name__ == "__main__":
+    if TRACKER_MODE == "process":
+        tracker_process = TrackerProcess(TRACKER_CONFIG)  # 첫 track 명령 전에 워커를 미리 띄움
     try:
         asyncio.run(connect())
     except KeyboardInterrupt:
         print("\n프로그램을 종료합니다.")
     except ConnectionRefusedError:
         print("❌ 서버에 연결할 수 없습니다. 서버가 실행 중인지 확인하세요.")
+    finally:
+        if tracker_process:
+            tracker_process.close()
@@ -0,0 +1,192 @@
+# protocol.py
+# 드론 <-> 서버 메시지 인코딩
+# ⚠️ origin/protocol.py와 drone/main/protocol.py는 같은 파일입니다 (드론/서버가 따로 배포되기 때문에 복사본을 둠).
+#    한 쪽을 고치면 다른 쪽에 그대로 복사하세요. bench/bench_protocol.py가 두 파일이 같은지 확인합니다.
+"""
+JSON(텍스트 프레임)과 MsgPack(바이너리 프레임) 두 가지 인코딩을 지원합니다.
+
+- 드론은 drone_id 등록 메시지에 지원하는 인코딩 목록("encodings")을 JSON으로 보냅니다.
+- 서버는 양쪽이 모두 지원하는 첫 인코딩을 골라 {"type": "welcome", "encoding": ...}으로 응답합니다.
+- 이후 메시지는 선택된 인코딩으로 주고받습니다. msgpack이 설치되지 않았거나 협상이 실패하면 JSON을 사용합니다.
+
+MsgPack 모드에서는 최상위 키와 메시지 타입을 짧은 코드로 바꾸고, 최상위 MAC 주소는 6바이트로 압축합니다.
+장치 목록(devices) / 샘플 목록(samples) 안쪽은 그대로 둡니다 (장치마다 키를 바꾸면 디코딩이 JSON보다 느려짐).
+MAC 주소는 인코딩과 관계없이 대문자로 맞춥니다 (decode()는 최상위 mac, ble_batches()는 보낼 때 장치 목록).
+decode()는 프레임 종류(str/bytes)만 보고 해석하므로, 협상 전후 어느 프레임이든 받을 수 있습니다.
+"""
+
+import asyncio
+import json
+
+try:
+    import msgpack
+except ImportError:  # msgpack이 없으면 JSON만 사용
+    msgpack = None
+
+JSON = "json"
+MSGPACK = "msgpack"
+
+# 긴 키 -> 짧은 키 (MsgPack 전용). 새 키는 뒤에 추가만 하고 기존 코드는 바꾸지 마세요.
+_KEYS = {
+    "type": "t",
+    "drone_id": "d",
+    "mac": "m",
+    "name": "n",
+    "encoding": "e",
+    "encodings": "E",
+    "devices": "v",
+    "chunk": "c",
+    "chunks": "C",
+    "session": "s",
+    "samples": "S",
+    "command_id": "i",
+    "ok": "o",
+    "result": "r",
+    "error": "x",
+    "rssi": "R",
+}
+_KEYS_REV = {v: k for k, v in _KEYS.items()}
+
+# 메시지 타입 -> 정수 코드 (MsgPack 전용)
+_TYPES = {
+    "drone_id": 1,
+    "welcome": 2,
+    "ble": 3,
+    "track": 4,
+    "stop": 5,
+    "ble_batch": 6,
+    "ping": 7,
+    "rssi_batch": 8,
+    "command_ack": 9,
+}
+_TYPES_REV = {v: k for k, v in _TYPES.items()}
+
+# 6바이트로 압축할 MAC 필드
+_MAC_KEYS = {"mac", "mac_address"}
+
+
+def supported_encodings():
+    """이 쪽에서 사용할 수 있는 인코딩 목록 (선호 순서)."""
+    return [MSGPACK, JSON] if msgpack is not None else [JSON]
+
+
+def choose_encoding(offered):
+    """상대가 제시한 인코딩 목록 중 이 쪽도 지원하는 첫 번째를 고릅니다. 없으면 JSON."""
+    supported = supported_encodings()
+    for enc in offered or []:
+        if enc in supported:
+            return enc
+    return JSON
+
+
+def mac_to_bytes(mac):
+    """'AA:BB:CC:DD:EE:FF' -> 6바이트. MAC 형식이 아니면 (예: macOS의 UUID 주소) None."""
+    if not isinstance(mac, str):
+        return None
+    hex_str = mac.replace(":", "").replace("-", "")
+    if len(hex_str) != 12:
+        return None
+    try:
+        return bytes.fromhex(hex_str)
+    except ValueError:
+        return None
+
+
+def bytes_to_mac(raw):
+    return raw.hex(":").upper()
+
+
+def normalize_mac(mac):
+    """MAC 주소를 대문자로 맞춥니다 (문자열이 아니면 그대로)."""
+    return mac.strip().upper() if isinstance(mac, str) else mac
+
+
+def _compact(msg):
+    """최상위 키만 짧은 코드로 바꿉니다."""
+    out = {}
+    for key, value in msg.items():
+        if key in _MAC_KEYS:
+            packed = mac_to_bytes(value)
+            if packed is not None:
+                value = packed
+        elif key == "type" and isinstance(value, str):
+            value = _TYPES.get(value, value)
+        out[_KEYS.get(key, key)] = value
+    return out
+
+
+def _expand(data):
+    out = {}
+    for key, value in data.items():
+        key = _KEYS_REV.get(key, key)
+        if key in _MAC_KEYS and isinstance(value, bytes) and len(value) == 6:
+            value = bytes_to_mac(value)
+        elif key == "type" and isinstance(value, int):
+            value = _TYPES_REV.get(value, value)
+        out[key] = value
+    return out
+
+
+def encode(msg, encoding=JSON):
+    """메시지(dict)를 프레임으로 인코딩합니다. JSON은 str, MsgPack은 bytes."""
+    if encoding == MSGPACK and msgpack is not None:
+        return msgpack.packb(_compact(msg), use_bin_type=True)
+    return json.dumps(msg)
+
+
+def decode(frame):
+    """프레임을 메시지(dict)로 디코딩합니다. 잘못된 프레임이면 ValueError."""
+    if isinstance(frame, (bytes, bytearray)):
+        if msgpack is None:
+            raise ValueError("msgpack이 설치되지 않아 바이너리 프레임을 해석할 수 없습니다")
+        try:
+            data = msgpack.unpackb(frame, raw=False)
+        except Exception as e:
+            raise ValueError(f"잘못된 MsgPack 프레임: {e}")
+        if isinstance(data, dict):
+            data = _expand(data)
+    else:
+        try:
+            data = json.loads(frame)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"잘못된 JSON 프레임: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("메시지는 객체(dict)여야 합니다")
+    for key in _MAC_KEYS:
+        if isinstance(data.get(key), str):
+            data[key] = normalize_mac(data[key])
+    return data
+
+
+def ble_batches(devices, chunk_size=0):
+    """스캔 결과 전체를 ble_batch 메시지로 만듭니다. chunk_size > 0이면 그 크기로 나눕니다.
+    devices: [{"mac": ..., "name": ..., "rssi": ...}, ...] (rssi는 선택). MAC은 대문자로 맞춰 보냅니다.
+    """
+    devices = [dict(device, mac=normalize_mac(device.get("mac"))) for device in devices]
+    if chunk_size <= 0 or len(devices) <= chunk_size:
+        chunks = [devices]
+    else:
+        chunks = [devices[i:i + chunk_size] for i in range(0, len(devices), chunk_size)]
+    for i, chunk in enumerate(chunks):
+        yield {"type": "ble_batch", "devices": chunk, "chunk": i, "chunks": len(chunks)}
+
+
+async def register(websocket, drone_id, timeout=2.0):
+    """드론 등록 메시지를 보내고 서버의 인코딩 선택(welcome)을 기다립니다.
+    반환: (welcome 메시지, 협상 중 먼저 도착한 다른 메시지 또는 None)
+    서버가 응답하지 않으면 JSON으로 동작합니다.
+    """
+    await websocket.send(json.dumps({
+        "type": "drone_id",
+        "drone_id": drone_id,
+        "encodings": supported_encodings()
+    }))
+    welcome = {"type": "welcome", "encoding": JSON}
+    try:
+        data = decode(await asyncio.wait_for(websocket.recv(), timeout))
+    except (asyncio.TimeoutError, ValueError):
+        return welcome, None
+    if data.get("type") != "welcome":
+        return welcome, data
+    data["encoding"] = choose_encoding([data.get("encoding")])
+    return data, None
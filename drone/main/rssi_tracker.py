@@ -15,6 +15,11 @@ from typing import Optional, Deque, Tuple
 from collections import deque
 import time
 
+try:
+    import numpy as np
+except ImportError:  # numpy가 없으면 BatchRSSITracker만 사용할 수 없음
+    np = None
+
 # ---------------------------- 필터 및 헬퍼 클래스 ----------------------------
 
 class EMA:
@@ -182,6 +187,107 @@ class RSSITracker:
         # 예외 상황 처리
         return ControlCmd(0.0, 0.0, note="IDLE")
 
+# ---------------------- 여러 트랙 일괄 처리 (NumPy) ----------------------
+
+@dataclass
+class BatchControlCmd:
+    """트랙별 제어 명령 배열 (ControlCmd의 배열 버전)."""
+    forward: "np.ndarray"   # (N,) 전진 속도 (m/s)
+    yaw_rate: "np.ndarray"  # (N,) 요잉 속도 (rad/s)
+
+class BatchRSSITracker:
+    """N개 트랙의 RSSITracker를 NumPy 배열로 한 번에 진행합니다 (시뮬레이션 / 기록 재생용).
+    트랙마다 RSSITracker(cfg).step()을 부른 것과 같은 결과를 냅니다 (부동소수점 오차 범위 안).
+    - 상태는 배열로 둡니다: EMA / 변화율 / 마지막 수신 시각(없으면 nan), 상태(State.value), 탐색 회전 방향.
+    - 변화율 계산에는 직전 샘플 하나만 쓰이므로 probe_buf 대신 마지막 수신 시각과 직전 EMA 값을 씁니다.
+    """
+    def __init__(self, n: int, cfg: Config = Config()):
+        if np is None:
+            raise ImportError("BatchRSSITracker에는 numpy가 필요합니다")
+        self.cfg = cfg
+        self.n = n
+        self.rssi_ema = np.full(n, np.nan)
+        self.der_ema = np.full(n, np.nan)
+        self.last_rx_time = np.full(n, np.nan)
+        self.state = np.full(n, State.SEARCH.value, dtype=np.int8)
+        self._yaw_sign = np.ones(n)
+
+    def reset(self, index) -> None:
+        """index 트랙(정수, 슬라이스, 마스크)을 새 추적으로 초기화합니다."""
+        self.rssi_ema[index] = np.nan
+        self.der_ema[index] = np.nan
+        self.last_rx_time[index] = np.nan
+        self.state[index] = State.SEARCH.value
+        self._yaw_sign[index] = 1.0
+
+    def states(self):
+        """트랙별 State 목록."""
+        return [State(v) for v in self.state.tolist()]
+
+    def step(self, rssi_raw, now=None) -> BatchControlCmd:
+        """모든 트랙을 한 사이클 진행합니다.
+        :param rssi_raw: (N,) 최신 RSSI (dBm). nan이면 그 트랙은 이번 사이클에 패킷 없음.
+        :param now: 타임스탬프 (초, 스칼라 또는 (N,)). None이면 time.time() 사용.
+        """
+        cfg = self.cfg
+        now = np.broadcast_to(np.asarray(time.time() if now is None else now, dtype=float), (self.n,))
+        rssi = np.asarray(rssi_raw, dtype=float)
+        rx = ~np.isnan(rssi)
+        seen = ~np.isnan(self.last_rx_time)
+
+        # _update_signal: 수신 없음 -> 타임아웃이면 LOST
+        lost = ~rx & seen & ((now - self.last_rx_time) > cfg.lost_timeout_s)
+        self.state[lost] = State.LOST.value
+
+        # 수신 -> EMA, 직전 샘플과의 변화율 (첫 샘플은 변화율 0)
+        prev_ema = self.rssi_ema
+        ema = np.where(np.isnan(prev_ema), rssi, cfg.ema_alpha * rssi + (1 - cfg.ema_alpha) * prev_ema)
+        self.rssi_ema = np.where(rx, ema, prev_ema)
+        dt = np.maximum(1e-3, now - self.last_rx_time)
+        der = np.where(seen & (cfg.probe_window > 0), (self.rssi_ema - prev_ema) / dt, 0.0)
+        der = np.where(np.isnan(self.der_ema), der, cfg.der_alpha * der + (1 - cfg.der_alpha) * self.der_ema)
+        self.der_ema = np.where(rx, der, self.der_ema)
+        self.last_rx_time = np.where(rx, now, self.last_rx_time)
+
+        # _decide_state
+        has = ~np.isnan(self.rssi_ema)
+        hold = has & (self.rssi_ema >= cfg.close_threshold_db)
+        approach = has & ~hold & (self.rssi_ema >= cfg.found_threshold_db)
+        weak = has & ~hold & ~approach & (self.state != State.APPROACH.value) & (self.state != State.HOLD.value)
+        self.state[hold] = State.HOLD.value
+        self.state[approach] = State.APPROACH.value
+        self.state[weak] = State.SEARCH.value
+
+        # 상태별 제어 명령 (어느 상태에도 해당하지 않으면 IDLE: 0, 0)
+        forward = np.zeros(self.n)
+        yaw = np.zeros(self.n)
+
+        search = self.state == State.SEARCH.value
+        sweep_sign = np.where(np.trunc(now * (1/1.5)) % 2 == 0, 1.0, -1.0)
+        self._yaw_sign = np.where(search, sweep_sign, self._yaw_sign)
+        forward[search] = 0.3
+        yaw[search] = self._yaw_sign[search] * cfg.yaw_sweep_rate
+
+        approach = (self.state == State.APPROACH.value) & has
+        der_s = np.nan_to_num(self.der_ema, nan=0.0)
+        der_eff = np.where(np.abs(der_s) < 0.05, 0.0, der_s)
+        speed = np.clip(cfg.approach_speed + cfg.der_gain * der_eff, cfg.min_speed, cfg.max_speed)
+        turn = np.where(self._yaw_sign > 0, 1.0, -1.0) * cfg.yaw_nudge_rate
+        nudge = np.where(der_eff < 0, -turn, np.where(der_eff > 0, turn, 0.0))
+        forward[approach] = speed[approach]
+        yaw[approach] = nudge[approach]
+
+        hold = self.state == State.HOLD.value
+        forward[hold] = cfg.hold_hover_speed
+        yaw[hold] = 0.0
+
+        lost = self.state == State.LOST.value
+        forward[lost] = 0.2
+        yaw[lost] = cfg.yaw_sweep_rate * 1.2
+        self.state[lost] = State.SEARCH.value
+
+        return BatchControlCmd(forward, yaw)
+
 # ---------------------- 시리얼 통신 비계 (주석 처리됨) ----------------------
 
 class SerialController:
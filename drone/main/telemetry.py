@@ -0,0 +1,79 @@
+# telemetry.py
+# RSSI / 추적 상태 텔레메트리 전송 (drone_client.py, track_mac.py 공용)
+"""
+추적 중 수집한 RSSI 샘플과 추적기 상태를 모아 두었다가 flush_interval 초마다
+rssi_batch 메시지로 서버에 보냅니다. 서버 연결이 없으면 최근 max_buffer개만 보관합니다.
+전송에 실패한 배치의 샘플은 버퍼에 되돌려 다음 flush(다음 연결)에서 다시 보냅니다.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+try:
+    import protocol
+except ImportError:  # 저장소 루트에서 실행 (python -m drone.main.track_mac)
+    from drone.main import protocol
+
+
+class TelemetryStream:
+    """추적 세션별 RSSI 샘플 버퍼. bind()로 연결된 WebSocket에 주기적으로 전송합니다."""
+    def __init__(self, drone_id, flush_interval=1.0, max_buffer=5000):
+        self.drone_id = drone_id
+        self.flush_interval = flush_interval
+        self._buf = deque(maxlen=max_buffer)  # (session, mac, ts, rssi, state)
+        self._websocket = None
+        self._encoding = protocol.JSON
+
+    def bind(self, websocket, encoding):
+        """서버 연결이 생기면 호출합니다."""
+        self._websocket = websocket
+        self._encoding = encoding
+
+    def unbind(self):
+        self._websocket = None
+
+    def new_session(self, mac):
+        """추적 명령 하나에 대한 세션 id를 만듭니다."""
+        return f"{self.drone_id}-{mac.replace(':', '')}-{int(time.time() * 1000)}"
+
+    def record(self, session, mac, rssi, state=None, ts=None):
+        """샘플 하나를 기록합니다. rssi가 None이면 이번 주기에 수신이 없었다는 뜻."""
+        self._buf.append((session, mac, ts if ts is not None else time.time(), rssi, state))
+
+    def _build_batches(self):
+        groups = {}
+        while self._buf:
+            session, mac, ts, rssi, state = self._buf.popleft()
+            groups.setdefault((session, mac), []).append([ts, rssi, state])
+        return [
+            {"type": "rssi_batch", "session": session, "mac": mac, "samples": samples}
+            for (session, mac), samples in groups.items()
+        ]
+
+    def _requeue(self, batches):
+        """보내지 못한 배치의 샘플을 버퍼 앞에 되돌립니다 (max_buffer를 넘으면 오래된 것부터 버림)."""
+        samples = [
+            (batch["session"], batch["mac"], ts, rssi, state)
+            for batch in batches
+            for ts, rssi, state in batch["samples"]
+        ]
+        self._buf = deque(samples + list(self._buf), maxlen=self._buf.maxlen)
+
+    async def flush(self):
+        if self._websocket is None or not self._buf:
+            return
+        batches = self._build_batches()
+        for i, batch in enumerate(batches):
+            try:
+                await self._websocket.send(protocol.encode(batch, self._encoding))
+            except (Exception, asyncio.CancelledError):
+                # 연결이 끊겼거나 작업이 취소됨: 다음 연결에서 다시 보냄
+                self._requeue(batches[i:])
+                raise
+
+    async def run(self):
+        """연결이 있는 동안 주기적으로 전송합니다. 연결 작업(task)으로 실행하세요."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
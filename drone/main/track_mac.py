@@ -9,20 +9,27 @@ track_mac.py (웹소켓 + 내장 트래커 버전)
 
 import asyncio
 import websockets
-import json
 import time
 from typing import Optional
 
 from bleak import BleakScanner, BleakError
 from drone.main.rssi_tracker import RSSITracker, Config, ControlCmd
+from drone.main import protocol
+from drone.main.telemetry import TelemetryStream
 
 # --- 설정 ---
 SERVER_URI = "ws://52.79.236.231:8765"
 DRONE_ID = "drone01"
+HEARTBEAT_INTERVAL = 5.0  # 서버로 ping을 보내는 주기 (초)
+BLE_BATCH_CHUNK = 0  # 스캔 결과를 ble_batch 메시지로 보낼 때 청크 크기 (0이면 한 프레임)
 
 # --- 전역 변수 ---
 # 현재 실행 중인 추적 작업을 관리하기 위한 변수
 tracking_task = None
+# 추적 시작 확인(ack_when_started) 작업. 끝나기 전에 가비지 컬렉션되지 않도록 참조를 둠
+ack_tasks = set()
+# 추적 중 RSSI와 추적기 상태를 서버로 전송
+telemetry = TelemetryStream(DRONE_ID)
 
 # --- 추적 로직 (원래 track_mac.py의 핵심 기능) ---
 
@@ -53,13 +60,15 @@ class MacRssiFeeder:
             return self._last_rssi
 
 
-async def tracker_loop(target_mac: str):
+async def tracker_loop(target_mac: str, started: Optional[asyncio.Future] = None):
     """
     지정된 MAC 주소를 추적하는 실제 작업을 수행하는 워커 함수.
     이 함수는 내장된 RSSITracker 알고리즘을 직접 사용합니다.
+    started(Future)가 있으면 스캔을 시작했을 때 결과를, 시작하지 못했으면 예외를 넣습니다.
     """
     print(f"✅ 추적 루프 시작: 대상 MAC = {target_mac}")
     feeder = MacRssiFeeder(target_mac)
+    session = telemetry.new_session(target_mac)
     
     # 추적 알고리즘 설정
     cfg = Config(
@@ -72,11 +81,32 @@ async def tracker_loop(target_mac: str):
     scanner = BleakScanner(detection_callback=feeder.on_detect)
     
     print("📡 BLE 스캔 시작...")
-    await scanner.start()
+    try:
+        await scanner.start()
+        if started and not started.done():
+            started.set_result(True)
+    except asyncio.CancelledError:
+        # 스캔 시작 중에 stop / 새 track으로 취소됨: 예외를 밖으로 내보내면 await tracking_task에서 수신 루프가 멈춤
+        print("🟡 BLE 스캔 시작 중에 추적이 취소되었습니다.")
+        try:
+            await scanner.stop()
+        except Exception:
+            pass  # 스캐너가 시작되지 않았음
+        return
+    except Exception as e:
+        print(f"❌ BLE 스캔을 시작할 수 없습니다: {e}")
+        if started and not started.done():
+            started.set_exception(e)
+        return
+    finally:
+        if started and not started.done():
+            started.cancel()  # 스캔 시작 전에 취소됨
     try:
         while True:
             rssi = await feeder.take_latest()
-            cmd: ControlCmd = tracker.step(rssi, now=time.time())
+            now = time.time()
+            cmd: ControlCmd = tracker.step(rssi, now=now)
+            telemetry.record(session, target_mac, rssi, tracker.state.name, now)
             
             # 콘솔에 현재 상태 및 제어 명령 출력
             print(f"RSSI={str(rssi):>4} dBm | 상태={tracker.state.name:<10} "
@@ -97,50 +127,111 @@ async def tracker_loop(target_mac: str):
 
 # --- 통신 로직 ---
 
+async def heartbeat(websocket, encoding):
+    """연결이 살아 있는 동안 주기적으로 ping을 보냅니다."""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        await websocket.send(protocol.encode({"type": "ping"}, encoding))
+
+
+async def send_ack(reply, command_id, ok, result, error=None):
+    """명령 실행 결과를 서버에 알립니다 (command_id가 있는 명령만)."""
+    if reply and command_id:
+        try:
+            await reply({"type": "command_ack", "command_id": command_id, "ok": ok, "result": result, "error": error})
+        except websockets.exceptions.ConnectionClosed:
+            print(f"❌ 명령 확인 전송 실패 (연결 끊김): {command_id}")
+
+
+async def ack_when_started(reply, command_id, started):
+    """추적이 실제로 시작되었는지(스캐너 시작) 기다렸다가 알립니다."""
+    try:
+        await started
+        await send_ack(reply, command_id, True, "started")
+    except asyncio.CancelledError:
+        await send_ack(reply, command_id, False, "rejected", "추적이 시작 전에 취소되었습니다")
+    except Exception as e:
+        await send_ack(reply, command_id, False, "rejected", str(e))
+
+
+async def handle_command(data, reply=None):
+    """서버에서 받은 명령 하나를 처리합니다. reply(msg)가 있으면 실행 결과(command_ack)를 보냅니다."""
+    global tracking_task
+    command_id = data.get("command_id")
+    print(data.get("type"))
+    if data.get("type") == "stop":
+        if tracking_task and not tracking_task.done():
+            print(f"🎯 서버로부터 추적 중지 명령 수신")
+            tracking_task.cancel()
+            await tracking_task
+        await send_ack(reply, command_id, True, "stopped")
+
+    if data.get("type") == "track":
+        target_mac = data["mac"]
+        print(f"🎯 서버로부터 추적 명령 수신: {target_mac}")
+
+        if tracking_task and not tracking_task.done():
+            print("...기존 추적 작업을 중단합니다...")
+            tracking_task.cancel()
+            await tracking_task
+
+        # tracking.py 프로세스 대신, 내장된 tracker_loop 함수를 직접 실행
+        started = asyncio.get_running_loop().create_future()
+        tracking_task = asyncio.create_task(tracker_loop(target_mac, started))
+        ack_task = asyncio.create_task(ack_when_started(reply, command_id, started))
+        ack_tasks.add(ack_task)
+        ack_task.add_done_callback(ack_tasks.discard)
+
+
 async def main_loop():
     """
     메인 루프: 서버에 연결하고, 메시지를 수신하여 추적 작업을 관리합니다.
     """
-    global tracking_task
     while True:
         try:
             async with websockets.connect(SERVER_URI) as websocket:
                 print(f"✅ 서버({SERVER_URI})에 연결되었습니다.")
-                await websocket.send(json.dumps({"type": "drone_id", "drone_id": DRONE_ID}))
+                # 등록 후 서버가 고른 인코딩(msgpack/json)으로 이후 메시지를 주고받음
+                welcome, pending = await protocol.register(websocket, DRONE_ID)
+                encoding = welcome["encoding"]
+                print(f"🔗 메시지 인코딩: {encoding}")
+                heartbeat_task = asyncio.create_task(heartbeat(websocket, encoding))
+                telemetry.bind(websocket, encoding)
+                telemetry_task = asyncio.create_task(telemetry.run())
+
+                if welcome.get("resumed"):
+                    # 유예 시간 안에 재연결: 서버가 이전 인벤토리를 그대로 가지고 있음
+                    print("🔁 이전 세션 재개 - BLE 인벤토리 업로드 생략")
+                else:
+                    print("📡 주변 BLE 장치 스캔 중 (5초)...")
+                    try:
+                        devices = await BleakScanner.discover(timeout=5.0, return_adv=True)
+                        inventory = [
+                            {"mac": d.address, "name": d.name or "Unknown", "rssi": adv.rssi}
+                            for d, adv in devices.values()
+                        ]
+                        for batch in protocol.ble_batches(inventory, BLE_BATCH_CHUNK):
+                            await websocket.send(protocol.encode(batch, encoding))
+                        print(f"📡 BLE 스캔 완료. {len(devices)}개의 장치를 서버에 전송했습니다.")
+                    except BleakError as e:
+                        print(f"❌ 초기 BLE 스캔 실패: {e}. 스캐너를 사용할 수 없는 환경일 수 있습니다.")
+
+                async def reply(msg):
+                    await websocket.send(protocol.encode(msg, encoding))
+
+                if pending:
+                    await handle_command(pending, reply)
 
-                print("📡 주변 BLE 장치 스캔 중 (5초)...")
                 try:
-                    devices = await BleakScanner.discover(timeout=5.0)
-                    for d in devices:
-                        await websocket.send(json.dumps({
-                            "type": "ble", "mac": d.address, "name": d.name or "Unknown"
-                        }))
-                    print(f"📡 BLE 스캔 완료. {len(devices)}개의 장치를 서버에 전송했습니다.")
-                except BleakError as e:
-                    print(f"❌ 초기 BLE 스캔 실패: {e}. 스캐너를 사용할 수 없는 환경일 수 있습니다.")
-                
-                async for message in websocket:
-                    try:
-                        data = json.loads(message)
-                        print(data.get("type"))
-                        if data.get("type") == "stop" and not tracking_task.done():
-                            print(f"🎯 서버로부터 추적 중지 명령 수신")
-                            tracking_task.cancel()
-
-                        if data.get("type") == "track":
-                            target_mac = data["mac"]
-                            print(f"🎯 서버로부터 추적 명령 수신: {target_mac}")
-                            
-                            if tracking_task and not tracking_task.done():
-                                print("...기존 추적 작업을 중단합니다...")
-                                tracking_task.cancel()
-                                await tracking_task
-                            
-                            # tracking.py 프로세스 대신, 내장된 tracker_loop 함수를 직접 실행
-                            tracking_task = asyncio.create_task(tracker_loop(target_mac))
-
-                    except Exception as e:
-                        print(f"❌ 메시지 처리 중 오류: {e}")
+                    async for message in websocket:
+                        try:
+                            await handle_command(protocol.decode(message), reply)
+                        except Exception as e:
+                            print(f"❌ 메시지 처리 중 오류: {e}")
+                finally:
+                    heartbeat_task.cancel()
+                    telemetry_task.cancel()
+                    telemetry.unbind()
         
         except websockets.exceptions.ConnectionClosed:
             print("🔌 서버와 연결이 끊겼습니다. 5초 후 재연결을 시도합니다.")
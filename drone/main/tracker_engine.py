@@ -0,0 +1,305 @@
+# tracker_engine.py
+# 추적 엔진: BLE 광고 RSSI -> RSSITracker -> 드론 제어 명령 (drone_client.py)
+"""
+drone_client.py가 track 명령마다 tracking.py 프로세스를 띄우고 RSSI를 stdin 텍스트로 넘기던 것을 대신합니다.
+
+- TrackerEngine: 같은 이벤트 루프 안에서 실행합니다. 스캐너 콜백이 feed()로 asyncio.Queue에 (수신 시각, RSSI)를 넣고
+  run()이 꺼내 바로 tracker.step()을 호출합니다. scan_period 동안 광고가 없으면 step(None)으로 신호 손실을 판단합니다.
+- ProcessTrackerEngine: 추적기와 드론 제어를 별도 프로세스(TrackerProcess)에서 실행합니다 (스캔/서버 통신과 분리).
+  RSSI는 공유 메모리 링 버퍼(SharedRing)로 넘기고, 결과(제어 명령, 상태)는 다른 링 버퍼로 돌려받습니다.
+  워커 프로세스는 처음 한 번만 띄우고 다음 추적에서도 다시 씁니다 (세대 번호로 추적기를 새로 만듦).
+
+두 엔진 모두 광고 수신 -> 제어 명령까지의 지연을 기록합니다 (stats()).
+시각은 time.perf_counter()로 잽니다 (Linux / Windows / macOS에서 프로세스 간에도 같은 시계).
+bench/bench_tracking.py로 tracking.py 서브프로세스 방식과 비교할 수 있습니다.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+try:
+    from rssi_tracker import RSSITracker, State
+    from tracking import send_drone_command
+except ImportError:  # 저장소 루트에서 실행 (bench/bench_tracking.py)
+    from drone.main.rssi_tracker import RSSITracker, State
+    from drone.main.tracking import send_drone_command
+
+STATES = list(State)  # 링 버퍼에는 상태를 인덱스로 기록
+
+IN_FIELDS = 3    # (세대, 수신 시각, rssi)
+OUT_FIELDS = 7   # (세대, 수신 시각, 명령 시각, rssi, 전진, 회전, 상태 인덱스). 없는 값은 nan
+
+
+def _percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100.0
+    lo, hi = math.floor(k), math.ceil(k)
+    return round(ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo), 3)
+
+
+def _none(value):
+    return None if math.isnan(value) else value
+
+
+def _nan(value):
+    return math.nan if value is None else value
+
+
+class LatencyLog:
+    """광고 수신 -> 제어 명령 지연 (최근 maxlen개) 과 처리 수."""
+    def __init__(self, maxlen=1000):
+        self.samples = 0     # 광고로 받은 RSSI
+        self.steps = 0       # tracker.step() 호출 (광고 없는 주기 포함)
+        self.dropped = 0     # 큐 / 링 버퍼가 밀려 버린 항목
+        self.t_first = None  # 첫 제어 명령 시각 (perf_counter)
+        self._ms = deque(maxlen=maxlen)
+
+    def add(self, t_rx, t_cmd):
+        if self.t_first is None:
+            self.t_first = t_cmd
+        self.samples += 1
+        self._ms.append((t_cmd - t_rx) * 1000.0)
+
+    def summary(self):
+        values = list(self._ms)
+        return {
+            "samples": self.samples,
+            "steps": self.steps,
+            "dropped": self.dropped,
+            "latency_ms_p50": _percentile(values, 50),
+            "latency_ms_p99": _percentile(values, 99),
+        }
+
+
+class TrackerEngine:
+    """이벤트 루프 안에서 실행하는 추적 엔진."""
+    def __init__(self, cfg, on_command=send_drone_command, on_step=None, queue_size=256):
+        self.cfg = cfg
+        self.tracker = RSSITracker(cfg)
+        self.on_command = on_command   # def on_command(cmd): 드론 제어 (기본: tracking.send_drone_command)
+        self.on_step = on_step         # def on_step(rssi, state, ts): 텔레메트리 기록 등
+        self.latency = LatencyLog()
+        self._queue = asyncio.Queue(maxsize=queue_size)
+
+    def feed(self, rssi, t_rx=None):
+        """스캐너 콜백에서 호출합니다 (이벤트 루프 스레드). 큐가 가득 차면 가장 오래된 RSSI를 버립니다."""
+        item = (time.perf_counter() if t_rx is None else t_rx, rssi)
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                self._queue.get_nowait()
+                self.latency.dropped += 1
+
+    def _step(self, rssi, t_rx):
+        now = time.time()
+        cmd = self.tracker.step(rssi, now=now)
+        self.on_command(cmd)
+        self.latency.steps += 1
+        if t_rx is not None:
+            self.latency.add(t_rx, time.perf_counter())
+        if self.on_step:
+            self.on_step(rssi, self.tracker.state.name, now)
+
+    async def run(self):
+        """추적이 끝날 때까지(취소) 큐의 RSSI를 처리합니다."""
+        while True:
+            try:
+                t_rx, rssi = await asyncio.wait_for(self._queue.get(), self.cfg.scan_period)
+            except asyncio.TimeoutError:
+                self._step(None, None)  # 이번 주기에 광고 없음
+                continue
+            self._step(rssi, t_rx)
+
+    def stats(self):
+        return self.latency.summary()
+
+
+class SharedRing:
+    """float64 레코드를 담는 공유 메모리 링 버퍼 (쓰는 프로세스 하나, 읽는 프로세스 하나).
+    헤더는 지금까지 쓴 레코드 수 하나입니다. 읽는 쪽이 capacity보다 뒤처지면 밀린 레코드를 버리고 dropped에 셉니다.
+    쓰는 쪽은 레코드를 쓴 뒤 Event.set()으로 알리므로(세마포어 = 메모리 배리어) 읽는 쪽은 헤더를 믿고 읽을 수 있습니다.
+    name이 없으면 새로 만들고, 있으면 다른 프로세스가 만든 버퍼에 붙습니다.
+    """
+    def __init__(self, fields, capacity=1024, name=None):
+        self.fields = fields
+        self.capacity = capacity
+        self.dropped = 0
+        size = 8 + 8 * fields * capacity
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        self._views = [self.shm.buf[:8], self.shm.buf[8:size]]
+        self._head = self._views[0].cast("q")
+        self._data = self._views[1].cast("d")
+        if name is None:
+            self._head[0] = 0
+        self._tail = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, record):
+        head = self._head[0]
+        base = (head % self.capacity) * self.fields
+        for i, value in enumerate(record):
+            self._data[base + i] = value
+        self._head[0] = head + 1
+
+    def read(self):
+        """아직 읽지 않은 레코드 목록 [(필드, ...), ...]."""
+        head = self._head[0]
+        if head - self._tail > self.capacity:
+            self.dropped += head - self._tail - self.capacity
+            self._tail = head - self.capacity
+        records = []
+        while self._tail < head:
+            base = (self._tail % self.capacity) * self.fields
+            records.append(tuple(self._data[base:base + self.fields].tolist()))
+            self._tail += 1
+        return records
+
+    def close(self, unlink=False):
+        for view in (self._head, self._data, *self._views):
+            view.release()  # 남아 있는 memoryview가 있으면 공유 메모리를 닫을 수 없음
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def _attach(name):
+    """다른 프로세스가 만든 공유 메모리에 붙습니다. 지우는 것은 만든 쪽(TrackerProcess.close)이 합니다.
+    Python 3.12 이하에서는 spawn한 워커가 부모의 resource_tracker를 같이 쓰므로 중복 등록되어도 한 번만 정리됩니다.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _worker(cfg, rx_name, tx_name, capacity, wake, stop, active):
+    """추적 워커 프로세스 본체. active.value: 지금 추적 중인 세대 (0이면 대기)."""
+    rx = SharedRing(IN_FIELDS, capacity, rx_name)
+    tx = SharedRing(OUT_FIELDS, capacity, tx_name)
+    tracker, generation = None, 0
+
+    def step(rssi, t_rx):
+        cmd = tracker.step(rssi, now=time.time())
+        send_drone_command(cmd)
+        tx.write((generation, _nan(t_rx), time.perf_counter(), _nan(rssi),
+                  cmd.forward, cmd.yaw_rate, STATES.index(tracker.state)))
+
+    try:
+        while not stop.is_set():
+            wake.wait(cfg.scan_period)
+            wake.clear()
+            records = rx.read()
+            if active.value != generation:
+                generation = active.value
+                tracker = RSSITracker(cfg) if generation else None
+            if tracker is None:
+                continue
+            samples = [(t_rx, rssi) for gen, t_rx, rssi in records if gen == generation]
+            for t_rx, rssi in samples:
+                step(rssi, t_rx)
+            if not samples:
+                step(None, None)  # 이번 주기에 광고 없음
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rx.close()
+        tx.close()
+
+
+class TrackerProcess:
+    """추적 워커 프로세스. 한 번 띄워 두고 추적마다 begin() / end()로 세대를 바꿉니다."""
+    def __init__(self, cfg, capacity=1024):
+        ctx = multiprocessing.get_context("spawn")  # 이벤트 루프 / BLE 스레드를 복제하지 않도록 spawn
+        self.cfg = cfg
+        self.rx = SharedRing(IN_FIELDS, capacity)    # 부모 -> 워커: RSSI
+        self.tx = SharedRing(OUT_FIELDS, capacity)   # 워커 -> 부모: 제어 명령
+        self._wake = ctx.Event()
+        self._stop = ctx.Event()
+        self._active = ctx.Value("q", 0, lock=False)
+        self._generation = 0
+        self.process = ctx.Process(
+            target=_worker, name="tracker-worker", daemon=True,
+            args=(cfg, self.rx.name, self.tx.name, capacity, self._wake, self._stop, self._active)
+        )
+        self.process.start()
+
+    def alive(self):
+        return self.process.is_alive()
+
+    def begin(self):
+        """새 추적 세대를 시작하고 세대 번호를 반환합니다."""
+        self._generation += 1
+        self._active.value = self._generation
+        self._wake.set()
+        return self._generation
+
+    def end(self, generation):
+        if self._active.value == generation:
+            self._active.value = 0
+            self._wake.set()
+
+    def feed(self, generation, rssi, t_rx):
+        self.rx.write((generation, t_rx, rssi))
+        self._wake.set()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.rx.close(unlink=True)
+        self.tx.close(unlink=True)
+
+
+class ProcessTrackerEngine:
+    """TrackerEngine과 같은 사용법. 추적기는 TrackerProcess에서 실행하고 결과만 읽어 옵니다."""
+    def __init__(self, process, on_step=None):
+        self.process = process
+        self.cfg = process.cfg
+        self.on_step = on_step
+        self.latency = LatencyLog()
+        self.generation = process.begin()
+
+    def feed(self, rssi, t_rx=None):
+        self.process.feed(self.generation, rssi, time.perf_counter() if t_rx is None else t_rx)
+
+    def drain(self):
+        """워커가 보낸 결과를 읽어 지연을 기록하고 on_step을 호출합니다."""
+        offset = time.time() - time.perf_counter()
+        for gen, t_rx, t_cmd, rssi, _forward, _yaw, state in self.process.tx.read():
+            if gen != self.generation:
+                continue
+            self.latency.steps += 1
+            if not math.isnan(t_rx):
+                self.latency.add(t_rx, t_cmd)
+            if self.on_step:
+                self.on_step(_none(rssi), STATES[int(state)].name, t_cmd + offset)
+        self.latency.dropped = self.process.tx.dropped
+
+    async def run(self):
+        """추적이 끝날 때까지(취소) scan_period마다 결과를 읽습니다."""
+        try:
+            while True:
+                await asyncio.sleep(self.cfg.scan_period)
+                self.drain()
+        finally:
+            self.process.end(self.generation)
+            self.drain()
+
+    def stats(self):
+        return self.latency.summary()
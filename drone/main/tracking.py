@@ -3,7 +3,10 @@ import time
 import asyncio
 
 # rssi_tracker.py에서 핵심 추적 알고리즘을 가져옵니다.
-from rssi_tracker import RSSITracker, Config, ControlCmd
+try:
+    from rssi_tracker import RSSITracker, Config, ControlCmd
+except ImportError:  # 저장소 루트에서 import (tracker_engine.py)
+    from drone.main.rssi_tracker import RSSITracker, Config, ControlCmd
 
 # ============ 설정 ============ #
 # 실제 드론과 통신하기 위한 시리얼 포트 정보 (현재는 사용되지 않음)
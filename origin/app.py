@@ -1,31 +1,84 @@
 from flask import Flask, request, flash, render_template, redirect, url_for, jsonify
 import db
 import dronedb
-import asyncio
-import json  # ✅ JSON 모듈 추가
-import websockets
+import commands
+import telemetry
+import schema
+import cache
+import events
+import queue
+import tagio
+from commandlog import command_log
+from commandstatus import command_status, FINAL_STATES
+from scheduler import scheduler
 
 app = Flask(__name__)
 app.secret_key = "your_secret_key"
 
-trackResult = []
-
 @app.route('/')
 def index():
    result, statusCode = db.get_all_tags()
    drones, statusCode = dronedb.get_all_drones()
-   return render_template('index.html', data = result["tags"], drones = drones["drones"], track = trackResult)
+   return render_template('index.html', data = result["tags"], drones = drones["drones"], track = command_log.recent())
 
 @app.route('/logging/')
 def logging():
-   result, statusCode = db.get_all_tags()
+   result, statusCode = dronedb.tag_sightings(**tag_filters())
    resultDrone, statusCode = dronedb.get_all_drones()
-   return render_template('logging.html', data = result["tags"], droneData = resultDrone["drones"])
+   sightings, statusCode = dronedb.find_sightings(**sighting_filters())
+   return render_template('logging.html', data = result["tags"], nextTag = result["next"],
+                          droneData = resultDrone["drones"], logs = sightings.get("sightings", []),
+                          nextLog = sightings.get("next"), query = request.args)
 
 @app.route('/register/')
 def register():
-   result, statusCode = db.get_all_tags()
-   return render_template('register.html', data = result["tags"])
+   result, statusCode = db.find_tags(**tag_filters())
+   return render_template('register.html', data = result["tags"], nextTag = result["next"], query = request.args)
+
+# 검색 / 페이지 조건 (쿼리 문자열)
+def tag_filters():
+   return {
+      "name": request.args.get('name'),
+      "mac_prefix": request.args.get('mac'),
+      "location": request.args.get('location'),
+      "after": request.args.get('after'),
+      "limit": request.args.get('limit', db.DEFAULT_PAGE_SIZE, type=int)
+   }
+
+def sighting_filters():
+   return {
+      "drone_id": request.args.get('drone_id'),
+      "mac_prefix": request.args.get('log_mac'),
+      "after": request.args.get('log_after'),
+      "limit": request.args.get('log_limit', db.DEFAULT_PAGE_SIZE, type=int)
+   }
+
+# 태그 / BLE 발견 기록 페이지 조회 (JSON, 응답의 next를 after로 넘기면 다음 페이지)
+@app.route('/api/tags', methods=['GET'])
+def api_tags():
+   result, statusCode = db.find_tags(**tag_filters())
+   return jsonify(result), statusCode
+
+# 태그별 발견 집계: [{mac_address, tag_name, location, drones: [{drone_id, last_seen, sightings}], drone_count, last_seen, sightings}]
+# ?drone_id=: 그 드론의 발견만, ?seen=1: 발견 기록이 있는 태그만
+@app.route('/api/tag-sightings', methods=['GET'])
+def api_tag_sightings():
+   result, statusCode = dronedb.tag_sightings(
+      drone_id=request.args.get('drone_id'),
+      seen_only=request.args.get('seen', '') in ('1', 'true'),
+      **tag_filters()
+   )
+   return jsonify(result), statusCode
+
+@app.route('/api/sightings', methods=['GET'])
+def api_sightings():
+   result, statusCode = dronedb.find_sightings(
+      drone_id=request.args.get('drone_id'),
+      mac_prefix=request.args.get('mac'),
+      after=request.args.get('after'),
+      limit=request.args.get('limit', db.DEFAULT_PAGE_SIZE, type=int)
+   )
+   return jsonify(result), statusCode
 
 '''
  # 드론 등록
@@ -55,6 +108,36 @@ def registerTag():
       flash(result["message"], "success")
    return redirect(url_for('register'))
 
+# 태그 일괄 가져오기 (CSV / JSON Lines)
+# 본문 그대로 올리거나(Content-Type: text/csv, application/x-ndjson) 폼의 file 필드로 올림
+# ?format=csv|jsonl (없으면 Content-Type / 파일 확장자로 판단), ?on_conflict=update|skip
+@app.route('/tags/import', methods=['POST'])
+def import_tags():
+   upload = request.files.get('file')
+   stream = upload.stream if upload else request.stream
+   fmt = request.args.get('format') or request.form.get('format') or import_format(upload)
+   result, statusCode = tagio.import_tags(
+      tagio.decode_lines(stream), fmt,
+      on_conflict=request.args.get('on_conflict') or request.form.get('on_conflict', 'update')
+   )
+   return jsonify(result), statusCode
+
+def import_format(upload):
+   name = (upload.filename or '') if upload else ''
+   if name.endswith(('.jsonl', '.ndjson')) or 'ndjson' in (request.mimetype or '') or 'jsonl' in (request.mimetype or ''):
+      return 'jsonl'
+   return 'csv'
+
+# 태그 일괄 내보내기 (커서에서 바로 스트리밍)
+@app.route('/tags/export', methods=['GET'])
+def export_tags():
+   fmt = request.args.get('format', 'csv')
+   if fmt not in tagio.FORMATS:
+      return jsonify({"error": f"지원하지 않는 형식입니다: {fmt}"}), 400
+   mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+   return app.response_class(tagio.export_tags(fmt), mimetype=mimetype,
+                             headers={'Content-Disposition': f'attachment; filename=tags.{fmt}'})
+
 # 태그 삭제
 @app.route('/submit/delete/tag/', methods=['POST'])
 def deleteTag():
@@ -78,51 +161,201 @@ def editTag():
       flash(result["message"], "success")
    return redirect(url_for('register'))
 
+# 추적 작업 등록: 드론을 고르지 않으면(drone_id 빈 값) 스케줄러가 발견 기록 / RSSI / 부하로 고름
 @app.route('/submit/track', methods=['POST'])
 def track_device():
-    drone_id = 'drone01'
+    drone_id = request.form.get('drone_id') or None
     mac_address = request.form.get('mac_address')
     command_type = "track"
 
-    if not drone_id or not mac_address:
-        trackResult.append("드론 또는 MAC 주소가 선택되지 않았습니다.")
+    if not mac_address:
+        command_log.record(drone_id, command_type, mac_address, "invalid",
+                           message="MAC 주소가 선택되지 않았습니다.")
+        return redirect(url_for('index'))
+    mac = db.normalize_mac(mac_address)
+    if mac is None:
+        command_log.record(drone_id, command_type, mac_address, "invalid",
+                           message=f"잘못된 MAC 주소입니다: {mac_address}")
         return redirect(url_for('index'))
 
-    try:
-        asyncio.run(send_command(command_type, drone_id, mac_address))
-        trackResult.append(f"{drone_id}에게 {mac_address} 추적 명령 전송 완료")
-    except Exception as e:
-        trackResult.append(f"{drone_id} 명령 전송 실패: {e}")
-
+    scheduler.submit(mac, drone_id)
     return redirect(url_for('index'))
 
+# 드론 상태 목록: [{'drone_id': ..., 'status': ..., 'last_seen': ...}, ...]
+# - ETag = 상태 버전, If-None-Match가 같으면 304 (상태가 바뀌지 않음)
+# - since=<버전>: 그 이후 상태가 바뀐 드론만 {"version", "full": false, "drones", "removed"}로 반환
+#   (버전을 모르면 "full": true와 전체 목록)
 @app.route('/drones/status', methods=['GET'])
 def drones_status():
-    return jsonify(dronedb.get_all_drones_status())  # [{'drone_id': ..., 'status': ...}, ...]
+    drones = dronedb.get_all_drones_status()
+    version = dronedb.status_versions.update(drones)
+    if request.if_none_match.contains(version):
+        response = app.response_class(status=304)
+    elif 'since' in request.args:
+        changed = dronedb.status_versions.changed_since(request.args.get('since'))
+        if changed is None:
+            response = jsonify({"version": version, "full": True, "drones": drones})
+        else:
+            current = {d["drone_id"] for d in drones}
+            response = jsonify({
+                "version": version,
+                "full": False,
+                "drones": [d for d in drones if d["drone_id"] in changed],
+                "removed": sorted(changed - current)
+            })
+    else:
+        response = jsonify(drones)
+    response.set_etag(version)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# 대시보드 실시간 이벤트 (Server-Sent Events)
+# 같은 프로세스의 WebSocket 서버(run_server.py)가 events.bus에 올린 드론/BLE/명령 이벤트를 전달
+@app.route('/events', methods=['GET'])
+def events_stream():
+    q = events.bus.subscribe(request.headers.get('Last-Event-ID', type=int))
 
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = q.get(timeout=events.KEEPALIVE_S)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield events.format_sse(item)
+        finally:
+            events.bus.unsubscribe(q)
+
+    return app.response_class(stream(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# 목록 캐시 적중률 등 (cache.py), 인덱스 상태 (schema.py)
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({**cache.listings.stats(), "aggregates": cache.aggregates.stats(), "indexes": schema.status()})
+
+# 추적 세션 목록 / 구간별 RSSI (min/mean/max)
+@app.route('/telemetry/sessions', methods=['GET'])
+def telemetry_sessions():
+    result, statusCode = telemetry.list_sessions(
+        drone_id=request.args.get('drone_id'),
+        mac=request.args.get('mac'),
+        limit=request.args.get('limit', 50, type=int)
+    )
+    return jsonify(result), statusCode
+
+@app.route('/telemetry/<session>', methods=['GET'])
+def telemetry_series(session):
+    result, statusCode = telemetry.get_series(session, bucket_s=request.args.get('bucket', 1, type=int))
+    return jsonify(result), statusCode
+
+# 추적 중지: 그 MAC의 작업을 끝내고 배정된 드론에 stop
+# 작업이 없으면(다른 워커가 보낸 track 등) 드론 상태에서 그 MAC을 추적 중인 드론을 찾아 보냄
 @app.route('/submit/stop', methods=['POST'])
 def stop():
-   drone_id = 'drone01'
    mac_address = request.form.get('mac_address')
    command_type = "stop"
-   try:
-        asyncio.run(send_command(command_type, drone_id, mac_address))
-        trackResult.append(f"{drone_id}에게 {mac_address} 추적 중지 명령 전송 완료")
-   except Exception as e:
-        trackResult.append(f"{drone_id} 명령 전송 실패: {e}")
+   # MAC이 없으면 아래 드론 목록 비교에서 추적 중이 아닌(tracking=None) 드론이 모두 걸리므로 먼저 검사
+   mac = db.normalize_mac(mac_address)
+   if mac is None:
+      command_log.record(None, command_type, mac_address, "invalid",
+                         message="MAC 주소가 선택되지 않았습니다." if not mac_address
+                         else f"잘못된 MAC 주소입니다: {mac_address}")
+      return redirect(url_for('index'))
+   if scheduler.stop(mac) is None:
+      drone_ids = [d["drone_id"] for d in dronedb.get_all_drones_status()
+                   if db.normalize_mac(d["tracking"]) == mac]
+      if not drone_ids:
+         command_log.record(None, command_type, mac, "invalid",
+                            message=f"{mac}를 추적 중인 드론이 없습니다.")
+      for drone_id in drone_ids:
+         send_command(command_type, drone_id, mac)
    return redirect(url_for('index'))
 
-# JSON 형식으로 WebSocket 명령 전송
-async def send_command(command_type, drone_id, mac_address):
-    try:
-        async with websockets.connect("ws://52.79.236.231:8765") as ws:
-            await ws.send(json.dumps({
-                "type": command_type,
-                "drone_id": drone_id,
-                "mac": mac_address
-            }))
-    except Exception as e:
-        raise RuntimeError(f"WebSocket 전송 실패: {e}")
+# 추적 작업 목록 / 통계 (scheduler.py)
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({"jobs": scheduler.jobs(), "stats": scheduler.stats()}), 200
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_state(job_id):
+    job = scheduler.get(job_id)
+    if job is None:
+        return jsonify({"error": "알 수 없는 작업입니다."}), 404
+    return jsonify(job), 200
+
+# 추적 작업 등록 (JSON): {"mac", "drone_id"(선택)} -> 202 {"job_id", "state", "status_url"}
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    body = request.get_json(silent=True) or {}
+    if not body.get('mac'):
+        return jsonify({"error": "mac이 필요합니다."}), 400
+    mac = db.normalize_mac(body['mac'])
+    if mac is None:
+        result, statusCode = db.invalid_mac(body['mac'])
+        return jsonify(result), statusCode
+    job = scheduler.submit(mac, body.get('drone_id') or None)
+    return jsonify({"job_id": job["job_id"], "state": job["state"],
+                    "status_url": url_for('job_state', job_id=job["job_id"])}), 202
+
+# 추적 작업 중지
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    job = scheduler.stop(job_id=job_id)
+    if job is None:
+        return jsonify({"error": "진행 중인 작업이 아닙니다."}), 404
+    return jsonify(job), 200
+
+# 명령 상태 조회 (릴레이 / 드론 확인 단계별 시각과 지연)
+@app.route('/commands/<command_id>', methods=['GET'])
+def command_state(command_id):
+    entry = command_status.get(command_id)
+    if entry is None:
+        return jsonify({"error": "알 수 없는 명령입니다."}), 404
+    return jsonify(entry), 200
+
+# 명령 보내기 (JSON): {"type": "track"|"stop", "drone_id", "mac"} -> 202 {"command_id", "status_url"}
+@app.route('/commands', methods=['POST'])
+def create_command():
+    body = request.get_json(silent=True) or {}
+    command_type, drone_id, mac_address = body.get('type'), body.get('drone_id'), body.get('mac')
+    if command_type not in ('track', 'stop') or not drone_id or (command_type == 'track' and not mac_address):
+        return jsonify({"error": "type(track/stop), drone_id, mac이 필요합니다."}), 400
+    command_id = send_command(command_type, drone_id, mac_address)
+    return jsonify({"command_id": command_id, "status_url": url_for('command_state', command_id=command_id)}), 202
+
+# 명령을 디스패처에 넘기고 바로 command_id 반환
+# 상태가 바뀔 때마다 command 이벤트, 끝나면 command_log에 기록하고 result 이벤트 (+ on_final(state))
+def send_command(command_type, drone_id, mac_address, on_final=None):
+    action = "추적" if command_type == "track" else "추적 중지"
+
+    def on_update(state):
+        events.bus.publish("command", state)
+        if state["state"] not in FINAL_STATES:
+            return
+        if state["state"] == "acked":
+            outcome = "acked"
+            message = f"{drone_id}가 {mac_address} {action} 명령을 실행했습니다 ({state['ack_ms']:.0f} ms)"
+        elif state["state"] == "timeout":
+            outcome, message = "timeout", f"{drone_id} 명령 확인 시간 초과: {state['error']}"
+        elif state["result"] == "not_connected":
+            outcome, message = "not_connected", f"{drone_id} 명령 전송 실패: 드론이 연결되어 있지 않습니다."
+        else:
+            outcome = state["result"]
+            message = f"{drone_id} 명령 전송 실패: {state['error'] or state['result']}"
+        entry = command_log.record(drone_id, command_type, mac_address, outcome,
+                                   error=state["error"], message=message,
+                                   requested_at=state["requested_at"], command_id=state["command_id"])
+        events.bus.publish("result", entry)
+        if on_final:
+            on_final(state)
+
+    return commands.dispatcher.submit(command_type, drone_id, mac_address, on_update=on_update)
+
+scheduler.attach(send_command)
 
 if __name__ == '__main__':
+   schema.ensure_indexes()
    app.run('0.0.0.0', port=5000, debug=True)
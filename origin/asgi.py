@@ -0,0 +1,360 @@
+# asgi.py
+# 대시보드(HTTP) + 드론 WebSocket 통합 운영 서버 (uvicorn)
+"""
+하나의 ASGI 이벤트 루프에서 Flask 대시보드와 드론 WebSocket을 함께 처리합니다.
+run_server.py(Flask 개발 서버 + 별도 스레드의 WebSocket 서버)를 대신하는 운영용 진입점입니다.
+
+- WebSocket 요청(경로 무관)   -> server.handler (드론 연결, 기존과 같은 프로토콜)
+- GET /events                 -> 이벤트 루프에서 바로 처리하는 SSE (연결마다 스레드를 쓰지 않음)
+- 그 외 HTTP                  -> Flask 앱 (크기가 제한된 스레드 풀에서 실행, 요청/응답 본문은 스트리밍)
+
+여러 워커(--workers)는 uvicorn이 같은 포트를 나눠 받게 하고, 드론 라우팅은 mongo 레지스트리를 사용합니다.
+종료 신호를 받으면 새 연결을 받지 않고 SSE 스트림을 닫습니다. 드론 연결은 uvicorn이 1012(서비스 재시작)로 닫아
+드론이 다른 워커로 다시 붙고, 연결이 모두 끝나면 lifespan 종료에서 밀린 BLE / last_seen / 텔레메트리를 저장하고 끝냅니다.
+
+Usage (origin/ 에서):
+  python asgi.py --port 8765 --workers 4 --keep-alive 5
+  uvicorn asgi:app --port 8765              # 워커 1개
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import uvicorn
+import websockets
+
+import events
+
+HTTP_THREADS = int(os.environ.get("ASGI_HTTP_THREADS", "16"))
+
+
+# ---------------------------- 드론 WebSocket ----------------------------
+
+class AsgiWebSocket:
+    """ASGI WebSocket을 server.handler가 쓰는 websockets 연결처럼 보이게 하는 어댑터.
+    (async for 수신, send(str|bytes), 끊기면 ConnectionClosed)
+    """
+    def __init__(self, scope, receive, send):
+        self.scope = scope
+        self._receive = receive
+        self._send = send
+        self.closed = False
+
+    @property
+    def remote_address(self):
+        return tuple(self.scope.get("client") or ())
+
+    async def accept(self):
+        message = await self._receive()
+        if message["type"] != "websocket.connect":
+            self.closed = True
+            return False
+        await self._send({"type": "websocket.accept"})
+        return True
+
+    async def recv(self):
+        if self.closed:
+            raise websockets.exceptions.ConnectionClosed(None, None)
+        message = await self._receive()
+        if message["type"] == "websocket.disconnect":
+            self.closed = True
+            raise websockets.exceptions.ConnectionClosed(None, None)
+        return message["text"] if message.get("text") is not None else message.get("bytes")
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.recv()
+        except websockets.exceptions.ConnectionClosed:
+            raise StopAsyncIteration
+
+    async def send(self, data):
+        if self.closed:
+            raise websockets.exceptions.ConnectionClosed(None, None)
+        key = "bytes" if isinstance(data, (bytes, bytearray)) else "text"
+        try:
+            await self._send({"type": "websocket.send", key: data})
+        except (OSError, RuntimeError):  # 이미 끊긴 연결 (uvicorn ClientDisconnected 등)
+            self.closed = True
+            raise websockets.exceptions.ConnectionClosed(None, None)
+
+
+# ---------------------------- SSE ----------------------------
+
+async def sse(scope, receive, send, draining):
+    """/events: events.bus를 asyncio.Queue로 구독해 Server-Sent Events로 보냅니다."""
+    headers = dict(scope.get("headers") or [])
+    last_id = headers.get(b"last-event-id", b"").decode()
+    q = events.bus.subscribe_async(int(last_id) if last_id.isdigit() else None)
+
+    async def stream():
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b"retry: 3000\n\n", "more_body": True})
+        while True:
+            try:
+                item = await asyncio.wait_for(q.get(), events.KEEPALIVE_S)
+                chunk = events.format_sse(item)
+            except asyncio.TimeoutError:
+                chunk = ": keepalive\n\n"
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+
+    async def disconnected():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    tasks = [
+        asyncio.ensure_future(stream()),
+        asyncio.ensure_future(disconnected()),
+        asyncio.ensure_future(draining.wait()),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        if tasks[2] in done:
+            # 종료 중: 스트림을 끝내면 브라우저가 다른 워커로 재연결 (Last-Event-ID)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        for task in done:
+            if not task.cancelled():
+                task.exception()  # 끊긴 연결로 보내다 난 오류는 무시
+    finally:
+        for task in tasks:
+            task.cancel()
+        events.bus.unsubscribe(q)
+
+
+# ---------------------------- Flask (WSGI) ----------------------------
+
+class _RequestBody(io.RawIOBase):
+    """스레드 풀의 WSGI 앱이 읽는 요청 본문. 읽을 때마다 이벤트 루프에서 receive()로 받아 옵니다."""
+    def __init__(self, loop, receive):
+        self._loop = loop
+        self._receive = receive
+        self._buffer = b""
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer and not self._done:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                self._done = True
+            else:
+                self._buffer = message.get("body", b"")
+                self._done = not message.get("more_body", False)
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+class WsgiBridge:
+    """Flask(WSGI) 앱을 ASGI에서 실행합니다.
+    요청마다 스레드 풀에서 앱을 실행하고, 응답 조각은 만들어지는 대로 이벤트 루프로 보냅니다
+    (태그 내보내기처럼 큰 응답도 메모리에 모으지 않음).
+    """
+    def __init__(self, wsgi_app, threads=16, multiprocess=False):
+        self.wsgi_app = wsgi_app
+        self.multiprocess = multiprocess
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="wsgi")
+
+    def environ(self, scope, body):
+        server = scope.get("server") or ("localhost", 80)
+        client = scope.get("client") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": scope["method"],
+            "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+            "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+            "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+            "SERVER_NAME": server[0],
+            "SERVER_PORT": str(server[1]),
+            "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+            "REMOTE_ADDR": client[0],
+            "REMOTE_PORT": str(client[1]),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": scope.get("scheme", "http"),
+            "wsgi.input": io.BufferedReader(body),
+            "wsgi.input_terminated": True,
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": self.multiprocess,
+            "wsgi.run_once": False,
+        }
+        for name, value in scope.get("headers", []):
+            name = name.decode("latin1")
+            value = value.decode("latin1")
+            if name == "content-type":
+                environ["CONTENT_TYPE"] = value
+            elif name == "content-length":
+                environ["CONTENT_LENGTH"] = value
+            else:
+                key = "HTTP_" + name.upper().replace("-", "_")
+                environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _run(self, loop, environ, send):
+        """스레드 풀에서 실행: WSGI 앱을 호출하고 응답을 조각마다 send()로 넘깁니다."""
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [(int(status.split(" ", 1)[0]),
+                           [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers])]
+            return lambda data: None
+
+        def push(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        result = self.wsgi_app(environ, start_response)
+        try:
+            sent_start = False
+            for chunk in result:
+                if not sent_start:
+                    push({"type": "http.response.start", "status": started[0][0], "headers": started[0][1]})
+                    sent_start = True
+                if chunk:
+                    push({"type": "http.response.body", "body": chunk, "more_body": True})
+            if not sent_start:
+                push({"type": "http.response.start", "status": started[0][0], "headers": started[0][1]})
+            push({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+    async def __call__(self, scope, receive, send):
+        loop = asyncio.get_running_loop()
+        environ = self.environ(scope, _RequestBody(loop, receive))
+        await loop.run_in_executor(self.executor, self._run, loop, environ, send)
+
+
+# ---------------------------- ASGI 앱 ----------------------------
+
+class DashboardApp:
+    """HTTP는 Flask / SSE, WebSocket은 드론 핸들러로 보내는 ASGI 앱."""
+    def __init__(self):
+        self.server = None
+        self.wsgi = None
+        self.draining = None
+
+    def load(self):
+        # server / app은 워커 프로세스 안에서 처음 쓸 때 import (워커마다 자기 Mongo 클라이언트, WORKER_ID 사용)
+        if self.server is None:
+            import app as flask_app
+            import server
+            self.server = server
+            self.wsgi = WsgiBridge(flask_app.app, threads=HTTP_THREADS,
+                                   multiprocess=os.environ.get("ROUTING_BACKEND") == "mongo")
+            self.draining = asyncio.Event()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.load()
+                self.hook_exit_signals()
+                await self.server.start_services()
+                print(f"🚀 통합 서버 워커 시작됨 ({self.server.WORKER_ID})")
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.begin_drain()
+                try:
+                    await self.server.stop_services()
+                except Exception as e:
+                    print(f"❌ 종료 정리 실패: {e}")
+                self.wsgi.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def hook_exit_signals(self):
+        """uvicorn의 종료 신호 처리 앞에 begin_drain()을 끼워 넣습니다.
+        끝나지 않는 SSE 응답이 graceful shutdown 시간을 다 잡아먹지 않도록 종료 신호를 받는 즉시 스트림을 닫습니다.
+        (신호 처리기를 알 수 없으면 --graceful-timeout이 지난 뒤 uvicorn이 정리)
+        """
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                self.begin_drain()
+                previous(signum, frame)
+
+            try:
+                signal.signal(sig, handler)
+            except ValueError:  # 메인 스레드가 아님
+                return
+
+    def begin_drain(self):
+        if self.draining is not None:
+            self.draining.set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+            return
+        self.load()
+        if scope["type"] == "websocket":
+            ws = AsgiWebSocket(scope, receive, send)
+            if await ws.accept():
+                await self.server.handler(ws, scope.get("path", "/"))
+        elif scope["path"] == "/events" and scope["method"] == "GET":
+            await sse(scope, receive, send, self.draining)
+        else:
+            await self.wsgi(scope, receive, send)
+
+
+app = DashboardApp()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.environ.get("ASGI_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ASGI_PORT", "8765")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("ASGI_WORKERS", "1")),
+                        help="워커 프로세스 수 (2 이상이면 ROUTING_BACKEND=mongo)")
+    parser.add_argument("--keep-alive", type=int, default=int(os.environ.get("ASGI_KEEPALIVE", "5")),
+                        help="HTTP keep-alive 유지 시간 (초)")
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.environ.get("ASGI_GRACEFUL_TIMEOUT", "10")),
+                        help="종료 시 진행 중인 요청/연결을 기다리는 최대 시간 (초)")
+    parser.add_argument("--ws-ping-interval", type=float, default=float(os.environ.get("ASGI_WS_PING_INTERVAL", "20")))
+    parser.add_argument("--ws-ping-timeout", type=float, default=float(os.environ.get("ASGI_WS_PING_TIMEOUT", "20")))
+    parser.add_argument("--limit-concurrency", type=int, default=None, help="동시 연결 수 제한 (넘으면 503)")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # 워커마다 드론 소켓이 나뉘므로 명령은 mongo 레지스트리로 소켓을 가진 워커에 전달
+        os.environ.setdefault("ROUTING_BACKEND", "mongo")
+
+    try:
+        uvicorn.run(
+            "asgi:app",
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            timeout_keep_alive=args.keep_alive,
+            timeout_graceful_shutdown=args.graceful_timeout,
+            ws_ping_interval=args.ws_ping_interval,
+            ws_ping_timeout=args.ws_ping_timeout,
+            limit_concurrency=args.limit_concurrency,
+            lifespan="on",
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# cache.py
+# 목록 조회용 읽기 캐시 (app.py 페이지 렌더링)
+"""
+get_all_tags / get_all_drones 결과를 프로세스 메모리에 잠시 보관합니다.
+
+- 네임스페이스("tags", "drones")마다 버전 번호를 두고, 쓰기가 일어나면 invalidate()로 버전을 올립니다.
+  이전 버전으로 저장된 항목은 더 이상 쓰이지 않습니다.
+- 다른 프로세스(server.py 별도 실행 등)에서 바뀐 내용은 알 수 없으므로 ttl 초가 지나면 다시 읽습니다.
+- 항목 수는 maxsize로 제한하고, 넘으면 가장 오래 쓰이지 않은 항목부터 버립니다.
+- 태그별 발견 집계(dronedb.tag_sightings)는 BLE 갱신마다 바뀌므로 무효화하지 않고 짧은 TTL의 aggregates 캐시를 씁니다.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_TTL = float(os.environ.get("LISTING_CACHE_TTL", "5"))     # 0이면 캐시 사용 안 함
+CACHE_SIZE = int(os.environ.get("LISTING_CACHE_SIZE", "64"))
+AGGREGATE_CACHE_TTL = float(os.environ.get("AGGREGATE_CACHE_TTL", "2"))
+
+
+class ReadThroughCache:
+    """네임스페이스별 버전 번호 + TTL + 크기 제한(LRU) 캐시. Flask 스레드에서 같이 쓸 수 있습니다."""
+    def __init__(self, ttl=5.0, maxsize=64):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # {(namespace, key): (version, expires_at, value)}
+        self._versions = {}             # {namespace: int}
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def version(self, namespace):
+        return self._versions.get(namespace, 0)
+
+    def get(self, namespace, key, loader):
+        """캐시에 있으면 반환하고, 없거나 만료/무효화되었으면 loader()로 읽어 저장합니다."""
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return loader()
+
+        entry_key = (namespace, key)
+        now = time.monotonic()
+        with self._lock:
+            version = self.version(namespace)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._entries.move_to_end(entry_key)
+                self._stats["hits"] += 1
+                return entry[2]
+            self._stats["misses"] += 1
+
+        # DB 조회는 락 밖에서 (느린 조회가 다른 키의 캐시 히트를 막지 않도록)
+        value = loader()
+
+        with self._lock:
+            # 조회 중에 무효화되었으면 오래된 결과이므로 저장하지 않음
+            if self.version(namespace) == version:
+                self._entries[entry_key] = (version, time.monotonic() + self.ttl, value)
+                self._entries.move_to_end(entry_key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._stats["evictions"] += 1
+        return value
+
+    def invalidate(self, namespace):
+        """namespace의 버전을 올리고 저장된 항목을 지웁니다."""
+        with self._lock:
+            self._versions[namespace] = self.version(namespace) + 1
+            for entry_key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[entry_key]
+            self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["size"] = len(self._entries)
+            s["versions"] = dict(self._versions)
+        total = s["hits"] + s["misses"]
+        s["hit_ratio"] = round(s["hits"] / total, 3) if total else None
+        return s
+
+
+# db.py / dronedb.py가 같이 쓰는 캐시
+listings = ReadThroughCache(ttl=CACHE_TTL, maxsize=CACHE_SIZE)
+aggregates = ReadThroughCache(ttl=AGGREGATE_CACHE_TTL, maxsize=CACHE_SIZE)
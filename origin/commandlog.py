@@ -0,0 +1,111 @@
+# commandlog.py
+# track/stop 명령 결과 기록 (app.py)
+"""
+명령 결과를 구조화된 기록으로 남깁니다.
+
+- 메모리에는 최근 maxlen개만 링 버퍼(deque)로 보관합니다. 오래된 기록은 자동으로 밀려납니다.
+- 모든 기록은 capped 컬렉션(command_log)에도 저장합니다. 컬렉션 크기도 고정이라 DB가 계속 커지지 않습니다.
+- 저장은 mongo.submit()으로 스레드 풀에 넘기므로, 이벤트 루프 스레드에서 불리는 명령 완료 콜백을 막지 않습니다.
+- 프로세스가 다시 시작되면 첫 조회 때 capped 컬렉션의 최근 기록으로 링 버퍼를 채웁니다.
+
+기록 형식:
+  {"command_id", "drone_id", "command", "mac", "requested_at", "completed_at", "ok", "outcome", "error", "message"}
+  outcome: "acked"(드론이 실행) / "not_connected" / "dropped" / "superseded" / "disconnected" / "rejected"
+           / "timeout" / "error" / "invalid"  (command_id로 /commands/<id>의 단계별 기록을 볼 수 있음)
+"""
+
+import datetime
+import os
+import threading
+from collections import deque
+
+from pymongo.errors import CollectionInvalid
+
+import mongo
+
+COLLECTION = "command_log"
+CAPPED_BYTES = int(os.environ.get("COMMAND_LOG_BYTES", str(1024 * 1024)))
+CAPPED_MAX = int(os.environ.get("COMMAND_LOG_MAX", "5000"))
+MEMORY_SIZE = int(os.environ.get("COMMAND_LOG_MEMORY", "200"))
+SHOW_LAST = int(os.environ.get("COMMAND_LOG_SHOW", "20"))    # index.html에 표시할 개수
+
+
+def ensure_collection():
+    """capped 컬렉션을 만듭니다. 이미 있으면 그대로 둡니다."""
+    try:
+        mongo.get_db().create_collection(COLLECTION, capped=True, size=CAPPED_BYTES, max=CAPPED_MAX)
+    except CollectionInvalid:
+        pass
+
+
+class CommandLog:
+    """최근 명령 결과 링 버퍼 + capped 컬렉션 저장."""
+    def __init__(self, maxlen=200):
+        self.collection = mongo.get_collection(COLLECTION)
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._ensured = False
+        self._started = datetime.datetime.utcnow()
+
+    def record(self, drone_id, command, mac, outcome, error=None, message=None, requested_at=None, command_id=None):
+        """결과 하나를 기록하고 그 기록(dict)을 반환합니다."""
+        now = datetime.datetime.utcnow()
+        entry = {
+            "command_id": command_id,
+            "drone_id": drone_id,
+            "command": command,
+            "mac": mac,
+            "requested_at": requested_at or now,
+            "completed_at": now,
+            "ok": outcome == "acked",
+            "outcome": outcome,
+            "error": str(error) if error is not None else None,
+            "message": message
+        }
+        with self._lock:
+            self._records.append(entry)
+        mongo.submit(self._persist, dict(entry))
+        return entry
+
+    def _persist(self, entry):
+        try:
+            if not self._ensured:
+                ensure_collection()
+                self._ensured = True
+            self.collection.insert_one(entry)
+        except Exception as e:
+            print(f"❌ 명령 기록 저장 실패: {e}")
+
+    def _load(self):
+        """capped 컬렉션의 최근 기록으로 링 버퍼를 채웁니다 (처음 한 번)."""
+        self._loaded = True
+        try:
+            # 이번 프로세스 시작 전 기록만 (이후 기록은 이미 메모리에 있음)
+            docs = list(
+                self.collection.find({"completed_at": {"$lt": self._started}}, {"_id": 0})
+                .sort("$natural", -1).limit(self._records.maxlen)
+            )
+        except Exception as e:
+            print(f"❌ 명령 기록 불러오기 실패: {e}")
+            return
+        with self._lock:
+            current = list(self._records)
+            self._records.clear()
+            self._records.extend(reversed(docs))
+            self._records.extend(current)
+
+    def recent(self, n=SHOW_LAST):
+        """최근 n개 기록 (오래된 것 -> 최근 순)."""
+        if not self._loaded:
+            self._load()
+        with self._lock:
+            records = list(self._records)
+        return records[-n:] if n > 0 else []
+
+    def __len__(self):
+        return len(self._records)
+
+
+# app.py에서 사용하는 기록
+command_log = CommandLog(maxlen=MEMORY_SIZE)
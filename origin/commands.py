@@ -0,0 +1,173 @@
+# commands.py
+# Flask -> WebSocket 릴레이 명령 전달 (app.py 기반)
+"""
+track/stop 명령을 오래 유지되는 경로로 릴레이에 전달합니다.
+
+- 같은 프로세스에서 WebSocket 서버가 돌고 있으면(run_server.py) 서버 이벤트 루프에 바로 넘깁니다.
+- 아니면 백그라운드 스레드의 이벤트 루프가 RELAY_URI로 열어 둔 WebSocket 연결(풀)을 재사용합니다.
+- submit()은 명령에 id를 붙여 바로 반환합니다. 진행 상태는 commandstatus.command_status에 기록되고,
+  바뀔 때마다 콜백으로 알려 줍니다.
+- 릴레이는 명령을 드론 송신 큐에 넣으면, 드론은 추적을 시작/중지하면 command_ack를 보냅니다.
+  원격이면 명령을 보낸 연결로 돌아오고, 같은 프로세스면 relay_command의 reply로 바로 받습니다.
+  제한 시간 안에 확인이 없으면 timeout으로 끝냅니다.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import threading
+
+import websockets
+
+from commandstatus import ACK_TIMEOUT, FINAL_STATES, RELAY_TIMEOUT, command_status, new_id
+
+RELAY_URI = os.environ.get("RELAY_URI", "ws://52.79.236.231:8765")
+RELAY_POOL_SIZE = int(os.environ.get("RELAY_POOL_SIZE", "2"))
+SEND_TIMEOUT = float(os.environ.get("RELAY_SEND_TIMEOUT", "5.0"))
+
+
+class CommandDispatcher:
+    """track/stop 명령 전달기. 같은 프로세스면 큐처럼, 원격이면 지속 연결 풀로 동작합니다."""
+    def __init__(self, relay_uri=RELAY_URI, pool_size=RELAY_POOL_SIZE):
+        self.relay_uri = relay_uri
+        self.pool_size = max(1, pool_size)
+        self._local = None             # (서버 이벤트 루프, relay_command 코루틴 함수)
+        self._loop = None              # 원격 전달용 백그라운드 이벤트 루프
+        self._thread = None
+        self._lock = threading.Lock()
+        self._pool = [None] * self.pool_size   # 지속 WebSocket 연결
+        self._pool_locks = None                # 연결별 asyncio.Lock (백그라운드 루프에서 생성)
+        self._next = itertools.count()
+        self._callbacks = {}                   # {command_id: on_update}
+
+    # ---------------- 같은 프로세스 (run_server.py) ----------------
+
+    def attach_local(self, loop, relay):
+        """WebSocket 서버가 자신의 루프와 relay_command를 등록합니다."""
+        self._local = (loop, relay)
+
+    def detach_local(self):
+        self._local = None
+
+    # ---------------- 원격 릴레이 ----------------
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._pool_locks = [asyncio.Lock() for _ in range(self.pool_size)]
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="command-dispatcher", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    async def _send_remote(self, message):
+        slot = next(self._next) % self.pool_size
+        async with self._pool_locks[slot]:
+            # 끊어진 연결은 한 번 다시 연결해서 재전송
+            for attempt in range(2):
+                ws = self._pool[slot]
+                try:
+                    if ws is None:
+                        ws = await websockets.connect(self.relay_uri)
+                        self._pool[slot] = ws
+                        asyncio.get_running_loop().create_task(self._read_acks(ws))
+                    await asyncio.wait_for(ws.send(message), SEND_TIMEOUT)
+                    return True
+                except (websockets.exceptions.ConnectionClosed, OSError):
+                    self._pool[slot] = None
+                    if attempt == 1:
+                        raise
+
+    async def _read_acks(self, ws):
+        """릴레이가 같은 연결로 돌려보내는 command_ack를 처리합니다."""
+        try:
+            async for frame in ws:
+                try:
+                    data = json.loads(frame)
+                except ValueError:
+                    continue
+                if data.get("type") == "command_ack":
+                    await self._on_ack(data)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    # ---------------- 확인 / 제한 시간 ----------------
+
+    async def _on_ack(self, ack):
+        """릴레이 / 드론 확인을 상태에 반영합니다 (명령을 보낸 이벤트 루프에서 실행)."""
+        command_id = ack.get("command_id")
+        if ack.get("stage") == "relay":
+            entry = command_status.relay_ack(command_id, bool(ack.get("ok")), ack.get("result"), ack.get("error"))
+            if entry is not None and entry["state"] == "relayed":
+                asyncio.get_running_loop().call_later(ACK_TIMEOUT, self._expire, command_id, "relayed")
+        else:
+            entry = command_status.drone_ack(command_id, bool(ack.get("ok")), ack.get("result"), ack.get("error"))
+        self._notify(entry)
+
+    def _expire(self, command_id, state):
+        self._notify(command_status.expire(command_id, state))
+
+    def _notify(self, entry):
+        if entry is None:
+            return
+        if entry["state"] in FINAL_STATES:
+            on_update = self._callbacks.pop(entry["command_id"], None)
+        else:
+            on_update = self._callbacks.get(entry["command_id"])
+        if on_update is not None:
+            try:
+                on_update(entry)
+            except Exception as e:
+                print(f"❌ 명령 상태 콜백 오류: {e}")
+
+    # ---------------- 공용 ----------------
+
+    def submit(self, command_type, drone_id, mac_address, on_update=None):
+        """명령에 id를 붙여 넣고 바로 id를 반환합니다.
+        on_update(entry)는 상태가 바뀔 때마다 호출됩니다. entry["state"]가 FINAL_STATES 중 하나면 마지막 호출입니다.
+        """
+        command_id = new_id()
+        data = {"type": command_type, "drone_id": drone_id, "mac": mac_address, "command_id": command_id}
+        command_status.create(command_id, command_type, drone_id, mac_address)
+        if on_update is not None:
+            self._callbacks[command_id] = on_update
+
+        local = self._local
+        if local is not None:
+            loop, relay = local
+            future = asyncio.run_coroutine_threadsafe(relay(data, reply=self._on_ack), loop)
+        else:
+            loop = self._ensure_loop()
+            future = asyncio.run_coroutine_threadsafe(self._send_remote(json.dumps(data)), loop)
+        loop.call_soon_threadsafe(loop.call_later, RELAY_TIMEOUT, self._expire, command_id, "pending")
+
+        def _done(f):
+            try:
+                f.result()
+            except Exception as e:
+                self._notify(command_status.fail(command_id, e))
+        future.add_done_callback(_done)
+        return command_id
+
+    def close(self):
+        """열린 연결과 백그라운드 루프를 정리합니다."""
+        if self._loop is None:
+            return
+
+        async def _close_all():
+            for ws in self._pool:
+                if ws is not None:
+                    await ws.close()
+
+        asyncio.run_coroutine_threadsafe(_close_all(), self._loop).result(timeout=SEND_TIMEOUT)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=SEND_TIMEOUT)
+        self._loop = None
+        self._pool = [None] * self.pool_size
+
+
+# 프로세스 공용 인스턴스 (app.py, server.py가 함께 사용)
+dispatcher = CommandDispatcher()
@@ -0,0 +1,153 @@
+# commandstatus.py
+# track/stop 명령 진행 상태 (commands.py, app.py /commands/<id>)
+"""
+명령마다 id를 붙이고, 릴레이와 드론의 확인(ack)에 따라 상태를 바꿉니다.
+
+  pending --(릴레이 ack: 드론 송신 큐에 넣음)--> relayed --(드론 ack: 추적 시작/중지)--> acked
+     |                                             |
+     +--(드론 없음 / 큐에서 버려짐 / 전송 오류)-----+--(드론이 실패 보고)--> failed
+     +--(RELAY_TIMEOUT 안에 릴레이 ack 없음)--------+--(ACK_TIMEOUT 안에 드론 ack 없음)--> timeout
+
+- 상태는 메모리(최근 maxlen개)에 두고, 바뀔 때마다 mongo.submit()으로 commands 컬렉션에도 저장합니다.
+  다른 프로세스(asgi.py 워커 여럿)에서 보낸 명령도 /commands/<id>로 조회할 수 있습니다.
+  저장 작업은 스레드 풀에서 순서 없이 실행될 수 있으므로 seq가 더 큰 기록만 덮어씁니다.
+- 기록 형식:
+  {"command_id", "command", "drone_id", "mac", "state", "result", "error",
+   "requested_at", "relayed_at", "acked_at", "completed_at", "relay_ms", "ack_ms"}
+  result: "queued" / "not_connected" / "dropped" / "superseded" / "started" / "stopped" / "rejected" / "timeout" / "error"
+"""
+
+import datetime
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from pymongo.errors import DuplicateKeyError
+
+import mongo
+
+COLLECTION = "commands"
+RELAY_TIMEOUT = float(os.environ.get("COMMAND_RELAY_TIMEOUT", "5.0"))   # 릴레이 ack 대기 (초)
+ACK_TIMEOUT = float(os.environ.get("COMMAND_ACK_TIMEOUT", "10.0"))      # 릴레이 이후 드론 ack 대기 (초)
+MEMORY_SIZE = int(os.environ.get("COMMAND_STATUS_MEMORY", "1000"))
+RETENTION_S = int(os.environ.get("COMMAND_STATUS_RETENTION", str(24 * 3600)))  # commands 컬렉션 보관 기간 (TTL 인덱스)
+
+FINAL_STATES = ("acked", "failed", "timeout")
+
+
+def new_id():
+    return uuid.uuid4().hex
+
+
+def _ms(start, end):
+    return round((end - start).total_seconds() * 1000.0, 1)
+
+
+class CommandStatusTable:
+    """명령 id -> 진행 상태. 전이 메서드는 상태가 바뀌었으면 기록 복사본을, 아니면 None을 반환합니다."""
+    def __init__(self, maxlen=1000):
+        self.collection = mongo.get_collection(COLLECTION)
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._commands = OrderedDict()
+
+    def create(self, command_id, command, drone_id, mac):
+        entry = {
+            "command_id": command_id,
+            "command": command,
+            "drone_id": drone_id,
+            "mac": mac,
+            "state": "pending",
+            "result": None,
+            "error": None,
+            "requested_at": datetime.datetime.utcnow(),
+            "relayed_at": None,
+            "acked_at": None,
+            "completed_at": None,
+            "relay_ms": None,
+            "ack_ms": None,
+            "seq": 0,
+        }
+        with self._lock:
+            self._commands[command_id] = entry
+            while len(self._commands) > self.maxlen:
+                self._commands.popitem(last=False)
+            entry = dict(entry)
+        mongo.submit(self._persist, entry)
+        return entry
+
+    def _transition(self, command_id, allowed, update):
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            entry = self._commands.get(command_id)
+            if entry is None or entry["state"] not in allowed:
+                return None  # 모르는 id, 이미 끝난 명령, 순서가 뒤바뀐 ack
+            update(entry, now)
+            entry["seq"] += 1
+            if entry["state"] in FINAL_STATES:
+                entry["completed_at"] = now
+            entry = dict(entry)
+        mongo.submit(self._persist, entry)
+        return entry
+
+    def relay_ack(self, command_id, ok, result, error=None):
+        """릴레이가 명령을 처리했음 (ok: 드론 송신 큐에 들어감)."""
+        def update(entry, now):
+            entry["result"] = result
+            entry["error"] = error
+            entry["relayed_at"] = now
+            entry["relay_ms"] = _ms(entry["requested_at"], now)
+            entry["state"] = "relayed" if ok else "failed"
+        return self._transition(command_id, ("pending",), update)
+
+    def drone_ack(self, command_id, ok, result, error=None):
+        """드론이 명령을 실행했음 (ok: 추적 시작 / 중지). 릴레이 ack보다 먼저 와도 받습니다."""
+        def update(entry, now):
+            entry["result"] = result or ("started" if entry["command"] == "track" else "stopped")
+            entry["error"] = error
+            entry["acked_at"] = now
+            entry["ack_ms"] = _ms(entry["requested_at"], now)
+            entry["state"] = "acked" if ok else "failed"
+        return self._transition(command_id, ("pending", "relayed"), update)
+
+    def fail(self, command_id, error):
+        """전송 자체가 실패했음 (릴레이 연결 오류 등)."""
+        def update(entry, now):
+            entry["result"] = "error"
+            entry["error"] = str(error)
+            entry["state"] = "failed"
+        return self._transition(command_id, ("pending", "relayed"), update)
+
+    def expire(self, command_id, state):
+        """state에 머물러 있으면 timeout으로 바꿉니다."""
+        def update(entry, now):
+            entry["result"] = "timeout"
+            entry["error"] = "릴레이 응답 없음" if state == "pending" else "드론 응답 없음"
+            entry["state"] = "timeout"
+        return self._transition(command_id, (state,), update)
+
+    def get(self, command_id):
+        """상태 기록 복사본. 이 프로세스에 없으면 commands 컬렉션에서 찾습니다. 없으면 None."""
+        with self._lock:
+            entry = self._commands.get(command_id)
+            if entry is not None:
+                return dict(entry)
+        return self.collection.find_one({"command_id": command_id}, {"_id": 0})
+
+    def _persist(self, entry):
+        try:
+            self.collection.update_one(
+                {"command_id": entry["command_id"], "seq": {"$lt": entry["seq"]}}, {"$set": entry}, upsert=True
+            )
+        except DuplicateKeyError:
+            pass  # 더 새로운 상태가 이미 저장됨 (command_id unique 인덱스)
+        except Exception as e:
+            print(f"❌ 명령 상태 저장 실패: {e}")
+
+    def __len__(self):
+        return len(self._commands)
+
+
+# commands.py / app.py가 같이 쓰는 상태 표
+command_status = CommandStatusTable(maxlen=MEMORY_SIZE)
@@ -1,30 +1,103 @@
-from pymongo import MongoClient
+import re
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+import mongo
+import schema
+from cache import listings
 
-# MongoDB 연결
-client = MongoClient('mongodb://localhost:27017')
-db = client['DroneDB']
-tags_collection = db['tags']
+# MongoDB 연결 (공용 클라이언트, 첫 쿼리 때 연결)
+tags_collection = mongo.get_collection('tags')
+
+# 페이지 조회 시 가져오는 필드 / 한 페이지 최대 개수
+TAG_FIELDS = {'_id': 0, 'mac_address': 1, 'tag_name': 1, 'location': 1}
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAC_RE = re.compile(r"^[0-9A-F]{2}(:[0-9A-F]{2}){5}$")
+UNIQUE_INDEX_MISSING = "tags.mac_address unique 인덱스가 없어 태그를 저장할 수 없습니다 (/cache/stats의 indexes 확인)"
+
+def page_size(limit):
+    """요청한 페이지 크기를 1 ~ MAX_PAGE_SIZE로 맞춥니다."""
+    if not limit or limit <= 0:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+# MAC 주소를 저장 형식(대문자)으로 맞춥니다. 형식이 틀리면 None
+# 드론이 보내는 ble_logs.mac_address와 같은 형식이어야 검색 / $lookup 집계 / unique 인덱스가 맞음
+def normalize_mac(mac_address):
+    mac = str(mac_address or "").strip().upper()
+    return mac if MAC_RE.match(mac) else None
+
+def invalid_mac(mac_address):
+    return {"error": f"잘못된 MAC 주소입니다: {mac_address!r} (예: AA:BB:CC:DD:EE:FF)"}, 400
+
+# 수정 / 삭제 조건: 대문자로 맞추기 전에 저장된 예전 태그(소문자 등)도 찾도록 입력값 그대로도 함께 조회
+def mac_filter(mac, mac_address):
+    raw = str(mac_address).strip()
+    return {"mac_address": mac if raw == mac else {"$in": [mac, raw]}}
 
 # 태그 등록
+# 중복 검사는 tags.mac_address unique 인덱스(schema.py)가 처리 -> 한 번의 insert로 원자적 등록
+# 인덱스가 확인되지 않으면(생성 실패 등) 중복이 들어갈 수 있으므로 등록하지 않음
 def register_tag(mac_address, tag_name, location):
-    if tags_collection.find_one({"mac_address": mac_address}):
+    if not schema.unique_index_ready("tags", "mac_address_unique"):
+        return {"error": UNIQUE_INDEX_MISSING}, 503
+    mac = normalize_mac(mac_address)
+    if mac is None:
+        return invalid_mac(mac_address)
+    try:
+        tags_collection.insert_one({
+            "mac_address": mac,
+            "tag_name": tag_name,
+            "location": location
+        })
+    except DuplicateKeyError:
         return {"error": "이미 등록된 MAC 주소입니다"}, 409
-
-    tags_collection.insert_one({
-        "mac_address": mac_address,
-        "tag_name": tag_name,
-        "location": location
-    })
+    listings.invalidate("tags")
     return {"message": "태그 등록 성공"}, 201
 
-# 태그 전체 조회
+# 태그 전체 조회 (캐시, 태그 등록/수정/삭제 시 무효화)
 def get_all_tags():
-    tags = list(tags_collection.find({}, {'_id': 0}))  # ObjectId 제외
+    tags = listings.get("tags", "all", lambda: list(tags_collection.find({}, {'_id': 0})))  # ObjectId 제외
     return {"tags": tags}, 200
 
+# 태그 페이지 조회 (mac_address 기준 keyset 페이지네이션)
+# after: 이전 페이지 마지막 mac_address (없으면 첫 페이지)
+# name / location: 대소문자 무시 부분 일치, mac_prefix: 대문자 MAC 앞부분 (mac_address 인덱스 사용)
+def find_tags(name=None, mac_prefix=None, location=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    limit = page_size(limit)
+    query = tag_query(name, mac_prefix, location, after)
+
+    def load():
+        # limit + 1개를 읽어 다음 페이지가 있는지 확인
+        return list(tags_collection.find(query, TAG_FIELDS).sort("mac_address", 1).limit(limit + 1))
+
+    key = ("page", name, mac_prefix, location, after, limit)
+    tags = listings.get("tags", key, load)
+    has_more = len(tags) > limit
+    tags = tags[:limit]
+    return {"tags": tags, "next": tags[-1]["mac_address"] if has_more else None}, 200
+
+# 태그 검색 조건 (find_tags, dronedb.tag_sightings 공용)
+def tag_query(name=None, mac_prefix=None, location=None, after=None):
+    query = {}
+    mac_cond = {}
+    if mac_prefix:
+        mac_cond["$regex"] = "^" + re.escape(mac_prefix.strip().upper())
+    if after:
+        mac_cond["$gt"] = after
+    if mac_cond:
+        query["mac_address"] = mac_cond
+    if name:
+        query["tag_name"] = {"$regex": re.escape(name.strip()), "$options": "i"}
+    if location:
+        query["location"] = {"$regex": re.escape(location.strip()), "$options": "i"}
+    return query
+
 # 태그 수정 (mac_address 기준)
 def update_tag(mac_address, new_tag_name=None, new_location=None):
+    mac = normalize_mac(mac_address)
+    if mac is None:
+        return invalid_mac(mac_address)
     update_fields = {}
     if new_tag_name:
         update_fields['tag_name'] = new_tag_name
@@ -35,19 +108,24 @@ def update_tag(mac_address, new_tag_name=None, new_location=None):
         return {"error": "변경할 내용이 없습니다."}, 400
 
     result = tags_collection.update_one(
-        {"mac_address": mac_address},
+        mac_filter(mac, mac_address),
         {"$set": update_fields}
     )
 
     if result.matched_count == 0:
         return {"error": "해당 MAC 주소를 찾을 수 없습니다."}, 404
 
+    listings.invalidate("tags")
     return {"message": "태그 수정 성공"}, 200
 
 # 태그 삭제 (mac_address 기준)
 def delete_tag(mac_address):
-    result = tags_collection.delete_one({"mac_address": mac_address})
+    mac = normalize_mac(mac_address)
+    if mac is None:
+        return invalid_mac(mac_address)
+    result = tags_collection.delete_one(mac_filter(mac, mac_address))
     if result.deleted_count == 0:
         return {"error": "삭제할 태그를 찾을 수 없습니다."}, 404
 
+    listings.invalidate("tags")
     return {"message": "태그 삭제 성공"}, 200
\ No newline at end of file
@@ -1,33 +1,211 @@
-from pymongo import MongoClient
 from bson import ObjectId
 from datetime import datetime
+import os
+import re
+import threading
+import time
+import mongo
+from cache import listings, aggregates
+from db import page_size, tag_query, tags_collection, DEFAULT_PAGE_SIZE
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["DroneDB"]
-drone_status = db["drones"]
+drone_status = mongo.get_collection("drones")
+ble_logs = mongo.get_collection("ble_logs")
 
-# 드론론 전체 조회
+# 발견 기록 페이지에서 가져오는 필드
+SIGHTING_FIELDS = {"drone_id": 1, "mac_address": 1, "device_name": 1, "timestamp": 1}
+
+# 하트비트 경과 시간(초)으로 상태 판단: ONLINE 이하 -> online, OFFLINE 이하 -> stale, 그 이상 -> offline
+ONLINE_THRESHOLD_S = float(os.environ.get("DRONE_ONLINE_THRESHOLD", "15"))
+OFFLINE_THRESHOLD_S = float(os.environ.get("DRONE_OFFLINE_THRESHOLD", "60"))
+
+def derive_status(stored_status, last_seen, now=None):
+    """저장된 상태와 마지막 하트비트 시각으로 현재 상태를 계산합니다."""
+    if str(stored_status or "offline").strip().lower() == "offline" or last_seen is None:
+        return "offline"
+    age = ((now or datetime.utcnow()) - last_seen).total_seconds()
+    if age <= ONLINE_THRESHOLD_S:
+        return "online"
+    if age <= OFFLINE_THRESHOLD_S:
+        return "stale"
+    return "offline"
+
+# 같은 프로세스의 WebSocket 서버가 가진 접속 현황 레지스트리 (presence.PresenceTracker)
+# server.start_services()가 워커 1개일 때 연결하며, 연결되어 있으면 드론 조회는 DB 대신 이 표를 읽습니다.
+live = None
+
+def attach_live(tracker):
+    global live
+    live = tracker
+
+def detach_live():
+    global live
+    live = None
+
+# 드론론 전체 조회 (캐시, 드론 상태가 바뀌면 invalidate() 호출)
 def get_all_drones():
-    drones = list(drone_status.find({}, {'_id': 0}))  # ObjectId 제외
+    if live is not None:
+        return {"drones": live.snapshot()}, 200
+    drones = listings.get("drones", "all", lambda: list(drone_status.find({}, {'_id': 0})))  # ObjectId 제외
     return {"drones": drones}, 200
 
+# drones 컬렉션을 바꾼 쪽(server.py 하트비트 저장, 만료 정리)에서 호출
+def invalidate():
+    listings.invalidate("drones")
+
 # 드론 상태만 조회 + 상태 판단
+# (접속 현황 레지스트리가 있으면 메모리에서, 없으면 drones 목록 캐시를 거쳐 DB에서 읽음)
 def get_all_drones_status():
-    cursor = drone_status.find({}, {"_id": 0, "drone_id": 1, "status": 1, "last_seen": 1})
+    if live is not None:
+        cursor = live.snapshot()
+    else:
+        cursor = listings.get("drones", "status", lambda: list(
+            drone_status.find({}, {"_id": 0, "drone_id": 1, "status": 1, "last_seen": 1, "connected_at": 1, "tracking": 1})
+        ))
     drones = []
+    now = datetime.utcnow()
 
     for doc in cursor:
-        # status는 a.py에서 저장된 값 그대로 사용
-        status = str(doc.get("status", "offline")).strip().lower()
-
-        # last_seen은 ISO 문자열로 변환 (없으면 공백)
+        # status는 하트비트(last_seen) 경과 시간으로 판단
         last_seen = doc.get("last_seen")
+        status = derive_status(doc.get("status"), last_seen, now)
+
+        # 시각은 ISO 문자열로 변환 (없으면 공백)
         last_seen_str = last_seen.isoformat() if last_seen else ""
+        connected_at = doc.get("connected_at")
 
         drones.append({
             "drone_id": doc.get("drone_id"),
             "status": status,
-            "last_seen": last_seen_str
+            "last_seen": last_seen_str,
+            "connected_at": connected_at.isoformat() if connected_at else "",
+            "tracking": doc.get("tracking") if status != "offline" else None
         })
 
-    return drones
\ No newline at end of file
+    return drones
+
+# 드론 상태 버전 (/drones/status의 ETag, since 조회)
+# 계산된 상태(online/stale/offline)나 추적 대상이 바뀌거나 드론이 추가/삭제될 때만 버전이 올라갑니다.
+# 버전 문자열 앞에 프로세스 시작 시각을 붙여 재시작 전 버전과 섞이지 않게 합니다.
+class StatusVersions:
+    def __init__(self):
+        self.epoch = format(int(time.time() * 1000), "x")
+        self._lock = threading.Lock()
+        self._version = 0
+        self._last = {}       # {drone_id: (status, tracking)}
+        self._changed = {}    # {drone_id: 마지막으로 바뀐 버전} (삭제된 드론 포함)
+
+    def token(self, version=None):
+        return f"{self.epoch}.{self._version if version is None else version}"
+
+    def update(self, drones):
+        """현재 상태 목록과 이전 목록을 비교해 바뀐 것이 있으면 버전을 올리고 현재 버전 문자열을 반환합니다."""
+        current = {d["drone_id"]: (d["status"], d.get("tracking")) for d in drones}
+        with self._lock:
+            changed = [i for i in current if self._last.get(i) != current[i]]
+            changed += [i for i in self._last if i not in current]
+            if changed:
+                self._version += 1
+                for drone_id in changed:
+                    self._changed[drone_id] = self._version
+                self._last = current
+            return self.token()
+
+    def changed_since(self, token):
+        """token 이후 바뀐 drone_id 집합. 알 수 없는 token(다른 프로세스 / 잘못된 값)이면 None."""
+        epoch, _, version = (token or "").partition(".")
+        if epoch != self.epoch or not version.isdigit():
+            return None
+        version = int(version)
+        with self._lock:
+            if version > self._version:
+                return None
+            return {i for i, v in self._changed.items() if v > version}
+
+status_versions = StatusVersions()
+
+# BLE 발견 기록 페이지 조회 (_id 내림차순 = 최근에 처음 발견된 기록 먼저, keyset 페이지네이션)
+# after: 이전 페이지 마지막 항목의 id
+def find_sightings(drone_id=None, mac_prefix=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    limit = page_size(limit)
+    query = {}
+    if drone_id:
+        query["drone_id"] = drone_id
+    if mac_prefix:
+        query["mac_address"] = {"$regex": "^" + re.escape(mac_prefix.strip().upper())}
+    if after:
+        if not ObjectId.is_valid(after):
+            return {"error": "잘못된 페이지 커서입니다."}, 400
+        query["_id"] = {"$lt": ObjectId(after)}
+
+    docs = list(ble_logs.find(query, SIGHTING_FIELDS).sort("_id", -1).limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    sightings = []
+    for doc in docs:
+        timestamp = doc.get("timestamp")
+        sightings.append({
+            "id": str(doc["_id"]),
+            "drone_id": doc.get("drone_id"),
+            "mac_address": doc.get("mac_address"),
+            "device_name": doc.get("device_name"),
+            "timestamp": timestamp.isoformat() if timestamp else ""
+        })
+    return {"sightings": sightings, "next": sightings[-1]["id"] if has_more else None}, 200
+
+# 태그별 발견 집계 (mac_address keyset 페이지네이션, 검색 조건은 find_tags와 같음)
+# 등록된 태그 한 페이지를 고르고 ble_logs를 mac_address로 $lookup(mac_drone 인덱스)해
+# 드론별 마지막 발견 시각 / 발견 횟수를 $group으로 모읍니다. 결과는 aggregates 캐시(AGGREGATE_CACHE_TTL)에 잠시 보관합니다.
+# drone_id: 그 드론의 발견 기록만 집계, seen_only: 발견 기록이 없는 태그 제외
+def tag_sightings(name=None, mac_prefix=None, location=None, drone_id=None, seen_only=False,
+                  after=None, limit=DEFAULT_PAGE_SIZE):
+    limit = page_size(limit)
+    lookup = {"$lookup": {
+        "from": ble_logs.name,
+        "localField": "mac_address",
+        "foreignField": "mac_address",
+        "pipeline": ([{"$match": {"drone_id": drone_id}}] if drone_id else []) + [
+            {"$group": {
+                "_id": "$drone_id",
+                "last_seen": {"$max": "$timestamp"},
+                "sightings": {"$sum": {"$ifNull": ["$sightings", 1]}}
+            }},
+            {"$sort": {"last_seen": -1}}
+        ],
+        "as": "drones"
+    }}
+    pipeline = [
+        {"$match": tag_query(name, mac_prefix, location, after)},
+        {"$sort": {"mac_address": 1}}
+    ]
+    if seen_only:
+        # 발견 기록이 있는 태그만 limit + 1개 (정렬 순서대로 하나씩 $lookup 하다가 멈춤)
+        pipeline += [lookup, {"$match": {"drones.0": {"$exists": True}}}, {"$limit": limit + 1}]
+    else:
+        pipeline += [{"$limit": limit + 1}, lookup]
+    pipeline.append({"$project": {
+        "_id": 0,
+        "mac_address": 1,
+        "tag_name": 1,
+        "location": 1,
+        "drones": {"$map": {"input": "$drones", "as": "d", "in": {
+            "drone_id": "$$d._id", "last_seen": "$$d.last_seen", "sightings": "$$d.sightings"
+        }}},
+        "drone_count": {"$size": "$drones"},
+        "last_seen": {"$max": "$drones.last_seen"},
+        "sightings": {"$sum": "$drones.sightings"}
+    }})
+
+    def load():
+        rows = list(tags_collection.aggregate(pipeline))
+        for row in rows:
+            row["last_seen"] = row["last_seen"].isoformat() if row.get("last_seen") else ""
+            for drone in row["drones"]:
+                drone["last_seen"] = drone["last_seen"].isoformat() if drone.get("last_seen") else ""
+        return rows
+
+    # 태그가 수정되면(listings "tags" 버전) 다른 키가 되므로 바로 반영
+    key = (name, mac_prefix, location, drone_id, bool(seen_only), after, limit, listings.version("tags"))
+    rows = aggregates.get("tag_sightings", key, load)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {"tags": rows, "next": rows[-1]["mac_address"] if has_more else None}, 200
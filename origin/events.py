@@ -0,0 +1,116 @@
+# events.py
+# 프로세스 내 이벤트 버스 (server.py -> app.py, asgi.py /events SSE)
+"""
+WebSocket 서버(server.py)가 드론 등록/연결 종료, BLE 갱신, 명령 전달 결과를 publish하면
+같은 프로세스(run_server.py)의 Flask /events 연결들이 Server-Sent Events로 받아 브라우저에 바로 보냅니다.
+
+- publish는 asyncio 루프 스레드, 구독은 Flask 요청 스레드에서 일어나므로 구독자마다 queue.Queue를 둡니다.
+  asgi.py의 /events처럼 이벤트 루프에서 구독할 때는 subscribe_async()로 asyncio.Queue를 받습니다.
+- 구독자 큐가 가득 차면(느린 브라우저) 가장 오래된 이벤트를 버립니다. publish는 막히지 않습니다.
+- 최근 이벤트 history개를 보관해 재연결한 브라우저(Last-Event-ID)가 놓친 이벤트를 받을 수 있게 합니다.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import threading
+from collections import deque
+
+EVENT_HISTORY = int(os.environ.get("EVENT_HISTORY", "200"))
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "256"))
+KEEPALIVE_S = float(os.environ.get("SSE_KEEPALIVE", "15"))   # 이벤트가 없을 때 연결 유지용 주석 전송 주기
+
+
+class EventBus:
+    """publish / subscribe. 이벤트는 {"id", "event", "data"} dict."""
+    def __init__(self, history=200, queue_size=256):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._async_subscribers = {}    # {asyncio.Queue: loop}
+        self._next_id = 1
+        self._stats = {"published": 0, "dropped": 0}
+
+    def publish(self, event, data):
+        with self._lock:
+            item = {"id": self._next_id, "event": event, "data": data}
+            self._next_id += 1
+            self._history.append(item)
+            self._stats["published"] += 1
+            subscribers = list(self._subscribers)
+            async_subscribers = list(self._async_subscribers.items())
+        for q in subscribers:
+            self._put(q, item)
+        for q, loop in async_subscribers:
+            try:
+                loop.call_soon_threadsafe(self._put_async, q, item)
+            except RuntimeError:  # 루프가 이미 닫힘
+                self.unsubscribe(q)
+        return item["id"]
+
+    def _put(self, q, item):
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                    self._stats["dropped"] += 1
+                except queue.Empty:
+                    pass
+
+    def _put_async(self, q, item):
+        while True:
+            try:
+                q.put_nowait(item)
+                return
+            except asyncio.QueueFull:
+                q.get_nowait()
+                self._stats["dropped"] += 1
+
+    def subscribe(self, last_id=None):
+        """구독 큐를 만듭니다. last_id를 주면 그 이후 history 이벤트를 먼저 넣어 둡니다."""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if last_id is not None:
+                for item in self._history:
+                    if item["id"] > last_id:
+                        self._put(q, item)
+            self._subscribers.add(q)
+        return q
+
+    def subscribe_async(self, last_id=None):
+        """subscribe()와 같지만 실행 중인 이벤트 루프용 asyncio.Queue를 반환합니다."""
+        q = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if last_id is not None:
+                for item in self._history:
+                    if item["id"] > last_id:
+                        self._put_async(q, item)
+            self._async_subscribers[q] = asyncio.get_running_loop()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+            self._async_subscribers.pop(q, None)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["subscribers"] = len(self._subscribers) + len(self._async_subscribers)
+            s["last_id"] = self._next_id - 1
+        return s
+
+
+def format_sse(item):
+    """이벤트 하나를 text/event-stream 형식으로 바꿉니다."""
+    data = json.dumps(item["data"], ensure_ascii=False, default=str)
+    return f"id: {item['id']}\nevent: {item['event']}\ndata: {data}\n\n"
+
+
+# server.py / app.py가 같이 쓰는 버스
+bus = EventBus(history=EVENT_HISTORY, queue_size=EVENT_QUEUE_SIZE)
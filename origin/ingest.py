@@ -0,0 +1,178 @@
+# ingest.py
+# ble_logs 수집 버퍼 (server.py 기반)
+"""
+드론이 보내는 BLE 갱신을 드론별로 모아 두었다가 한 번의 bulk_write로 저장합니다.
+
+- (drone_id, mac_address) 기준으로 마지막 값만 남깁니다 (last-write-wins).
+  합쳐진 갱신 수는 sightings 필드에 더해 발견 횟수로 남깁니다 ($inc).
+- 드론 하나의 버퍼가 max_batch 개에 도달하거나, flush_interval 초가 지나면 flush 합니다.
+- bulk_write가 실패하면 그 배치를 버퍼에 되돌려 다음 flush에 다시 저장합니다.
+- pymongo 호출은 mongo.run()으로 이벤트 루프 밖(스레드 풀)에서 실행되어 다른 드론의 메시지 처리를 막지 않습니다.
+"""
+
+import asyncio
+import datetime
+import time
+
+from pymongo import UpdateOne
+
+import mongo
+
+
+def _sighting_fields(fields):
+    """저장할 필드. RSSI를 보내지 않는 드론이면 이전 RSSI를 그대로 둡니다."""
+    out = {"device_name": fields["device_name"], "timestamp": fields["timestamp"]}
+    if fields.get("rssi") is not None:
+        out["rssi"] = fields["rssi"]
+    return out
+
+
+class BleIngestBuffer:
+    """드론별 BLE 갱신 버퍼. 크기/시간 임계값에 따라 unordered bulk_write로 flush 합니다."""
+    def __init__(self, collection, max_batch=500, flush_interval=0.5):
+        self.collection = collection
+        self.max_batch = max_batch            # 드론 하나당 버퍼 최대 크기
+        self.flush_interval = flush_interval  # 주기적 flush 간격 (초)
+        self._pending = {}                    # {drone_id: {mac: {"device_name", "timestamp", "rssi", "count"}}}
+        self._lock = asyncio.Lock()           # flush 직렬화
+        self._task = None
+        self._flush_tasks = {}                # {drone_id: 크기 임계값으로 시작된 flush 작업} (드론당 하나)
+        self._stats = {
+            "flushes": 0,           # flush 횟수
+            "ops": 0,               # 저장된 upsert 수 (누적)
+            "coalesced": 0,         # 같은 키로 덮어써진 갱신 수
+            "errors": 0,            # 실패한 flush 수
+            "requeued": 0,          # 실패한 flush에서 버퍼로 되돌린 갱신 수 (누적)
+            "last_flush_size": 0,
+            "max_flush_size": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+
+    def add(self, drone_id, mac, name, rssi=None):
+        """BLE 갱신 하나를 버퍼에 넣습니다. 같은 (drone_id, mac)은 마지막 값으로 덮어씁니다."""
+        devices = self._pending.setdefault(drone_id, {})
+        count = 1
+        if mac in devices:
+            self._stats["coalesced"] += 1
+            count += devices[mac]["count"]
+        devices[mac] = {
+            "device_name": name,
+            "timestamp": datetime.datetime.utcnow(),
+            "rssi": rssi,
+            "count": count
+        }
+        if len(devices) >= self.max_batch and drone_id not in self._flush_tasks:
+            # 이미 시작된 flush가 버퍼를 비우기 전까지는 새 작업을 만들지 않음
+            task = asyncio.get_running_loop().create_task(self.flush(drone_id))
+            self._flush_tasks[drone_id] = task
+            task.add_done_callback(lambda _: self._flush_tasks.pop(drone_id, None))
+
+    def add_many(self, drone_id, devices):
+        """ble_batch 메시지의 장치 목록을 한 번에 버퍼에 넣습니다. 크기 임계값 flush는 호출자가 결정합니다.
+        dict가 아니거나 mac이 문자열이 아닌 항목은 건너뜁니다. 버퍼에 넣은 항목 수를 반환합니다.
+        """
+        pending = self._pending.setdefault(drone_id, {})
+        now = datetime.datetime.utcnow()
+        accepted = 0
+        for device in devices:
+            mac = device.get("mac") if isinstance(device, dict) else None
+            if not mac or not isinstance(mac, str):
+                continue
+            accepted += 1
+            count = 1
+            if mac in pending:
+                self._stats["coalesced"] += 1
+                count += pending[mac]["count"]
+            pending[mac] = {
+                "device_name": device.get("name"),
+                "timestamp": now,
+                "rssi": device.get("rssi"),
+                "count": count
+            }
+        return accepted
+
+    def _requeue(self, batch):
+        """저장하지 못한 갱신을 버퍼에 되돌립니다. 그 사이 들어온 같은 키의 갱신이 있으면 그 값을 두고 횟수만 더합니다."""
+        for drone_id, devices in batch.items():
+            pending = self._pending.setdefault(drone_id, {})
+            for mac, fields in devices.items():
+                if mac in pending:
+                    pending[mac]["count"] += fields["count"]
+                else:
+                    pending[mac] = fields
+        self._stats["requeued"] += sum(len(devices) for devices in batch.values())
+
+    def pending_count(self):
+        return sum(len(devices) for devices in self._pending.values())
+
+    async def flush(self, drone_id=None):
+        """버퍼를 비우고 한 번의 bulk_write로 저장합니다. drone_id를 주면 해당 드론만 flush."""
+        async with self._lock:
+            if drone_id is None:
+                batch, self._pending = self._pending, {}
+            else:
+                devices = self._pending.pop(drone_id, None)
+                batch = {drone_id: devices} if devices else {}
+
+            ops = [
+                UpdateOne(
+                    {"drone_id": d_id, "mac_address": mac},
+                    {"$set": _sighting_fields(fields), "$inc": {"sightings": fields["count"]}},
+                    upsert=True
+                )
+                for d_id, devices in batch.items()
+                for mac, fields in devices.items()
+            ]
+            if not ops:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                await mongo.run(self.collection.bulk_write, ops, ordered=False)
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._requeue(batch)
+                print(f"❌ BLE bulk_write 실패 ({len(ops)}건, 다음 flush에 다시 시도): {e}")
+                return 0
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+            s = self._stats
+            s["flushes"] += 1
+            s["ops"] += len(ops)
+            s["last_flush_size"] = len(ops)
+            s["max_flush_size"] = max(s["max_flush_size"], len(ops))
+            s["last_flush_ms"] = elapsed_ms
+            s["max_flush_ms"] = max(s["max_flush_ms"], elapsed_ms)
+            s["total_flush_ms"] += elapsed_ms
+            return len(ops)
+
+    def stats(self):
+        """flush 크기/지연 카운터를 반환합니다."""
+        s = dict(self._stats)
+        s["pending"] = self.pending_count()
+        s["avg_flush_size"] = s["ops"] / s["flushes"] if s["flushes"] else 0.0
+        s["avg_flush_ms"] = s["total_flush_ms"] / s["flushes"] if s["flushes"] else 0.0
+        return s
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """주기적 flush 작업을 시작합니다. 이벤트 루프 안에서 호출해야 합니다."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """주기적 flush를 멈추고 남은 갱신을 모두 저장합니다."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
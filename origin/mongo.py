@@ -0,0 +1,90 @@
+# mongo.py
+# MongoDB 공용 접근 계층 (db.py, dronedb.py, server.py 공용)
+"""
+프로세스 전체에서 MongoClient 하나만 사용합니다.
+
+- 클라이언트는 처음 필요할 때 만들어지고(connect=False), 첫 쿼리 때 실제로 연결됩니다.
+- 풀 크기 등은 환경 변수로 설정합니다 (MONGO_URI, MONGO_DB, MONGO_MAX_POOL, MONGO_MIN_POOL).
+- pymongo는 블로킹 드라이버이므로, 비동기 코드에서는 run()으로 크기가 제한된 스레드 풀에서 실행합니다.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("MONGO_DB", "DroneDB")
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL", "50"))
+MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL", "0"))
+EXECUTOR_WORKERS = int(os.environ.get("MONGO_EXECUTOR_WORKERS", "8"))
+
+_client = None
+_executor = None
+_lock = threading.Lock()
+
+
+def get_client():
+    """공용 MongoClient를 반환합니다. 처음 호출될 때 만들어집니다."""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=MAX_POOL_SIZE,
+                    minPoolSize=MIN_POOL_SIZE,
+                    connect=False
+                )
+    return _client
+
+
+def get_db():
+    return get_client()[DB_NAME]
+
+
+def get_collection(name):
+    return get_db()[name]
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                # 동시에 실행되는 DB 작업 수를 풀 크기 이하로 제한
+                _executor = ThreadPoolExecutor(
+                    max_workers=min(EXECUTOR_WORKERS, MAX_POOL_SIZE),
+                    thread_name_prefix="mongo"
+                )
+    return _executor
+
+
+async def run(fn, *args, **kwargs):
+    """블로킹 pymongo 호출을 스레드 풀에서 실행하고 결과를 기다립니다.
+    예: await mongo.run(collection.update_one, filter, update, upsert=True)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def submit(fn, *args, **kwargs):
+    """블로킹 pymongo 호출을 스레드 풀에 넣고 바로 반환합니다 (결과는 concurrent.futures.Future).
+    이벤트 루프 콜백처럼 기다릴 수 없는 곳에서 기록만 남길 때 사용합니다.
+    """
+    return _get_executor().submit(fn, *args, **kwargs)
+
+
+def close():
+    """클라이언트와 스레드 풀을 정리합니다."""
+    global _client, _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+            _executor = None
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,117 @@
+# outbound.py
+# 드론별 송신 큐 (server.py 기반)
+"""
+드론마다 크기가 제한된 송신 큐와 전용 writer 작업을 둡니다.
+명령을 보낸 쪽의 메시지 루프는 큐에 넣고 바로 돌아가므로, 느리거나 멈춘 드론 연결이
+다른 연결의 처리를 막지 않습니다.
+
+- 새 track/stop 명령은 아직 보내지 못한 이전 track/stop 명령을 대체합니다 (마지막 명령만 의미가 있음).
+- 큐가 가득 차면 overflow 정책에 따라 가장 오래된 메시지("drop_oldest") 또는 새 메시지("drop_newest")를 버립니다.
+- 보내지 못하고 버린 메시지는 on_discard(msg, reason)로 알립니다 (reason: "superseded" / "dropped" / "disconnected" / "error").
+- 인코딩/전송 중 오류가 난 메시지는 로그를 남기고 "error"로 버린 뒤 다음 메시지를 계속 보냅니다.
+"""
+
+import asyncio
+from collections import deque
+
+import websockets
+
+import protocol
+
+# 서로 대체되는 명령 타입
+SUPERSEDING_TYPES = ("track", "stop")
+
+
+class DroneOutbox:
+    """드론 하나의 송신 큐 + writer 작업."""
+    def __init__(self, drone_id, websocket, encoding=protocol.JSON, maxsize=32, overflow="drop_oldest",
+                 on_discard=None):
+        if overflow not in ("drop_oldest", "drop_newest"):
+            raise ValueError(f"알 수 없는 overflow 정책: {overflow}")
+        self.drone_id = drone_id
+        self.websocket = websocket
+        self.encoding = encoding
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.on_discard = on_discard
+        self._queue = deque()
+        self._ready = asyncio.Event()
+        self._task = None
+        self._stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "superseded": 0,   # 새 명령으로 대체된 명령 수
+            "dropped": 0,      # 큐가 가득 차서 버린 메시지 수
+            "errors": 0,       # 인코딩/전송 오류로 버린 메시지 수
+            "max_depth": 0,
+        }
+
+    @property
+    def depth(self):
+        return len(self._queue)
+
+    def put(self, msg):
+        """메시지를 큐에 넣습니다. 반환: "queued" / "dropped"."""
+        if msg.get("type") in SUPERSEDING_TYPES:
+            kept = deque(m for m in self._queue if m.get("type") not in SUPERSEDING_TYPES)
+            self._stats["superseded"] += len(self._queue) - len(kept)
+            for m in self._queue:
+                if m.get("type") in SUPERSEDING_TYPES:
+                    self._discard(m, "superseded")
+            self._queue = kept
+
+        if len(self._queue) >= self.maxsize:
+            self._stats["dropped"] += 1
+            if self.overflow == "drop_newest":
+                return "dropped"
+            self._discard(self._queue.popleft(), "dropped")
+
+        self._queue.append(msg)
+        self._stats["enqueued"] += 1
+        self._stats["max_depth"] = max(self._stats["max_depth"], len(self._queue))
+        self._ready.set()
+        return "queued"
+
+    async def _writer(self):
+        while True:
+            await self._ready.wait()
+            while self._queue:
+                msg = self._queue.popleft()
+                try:
+                    await self.websocket.send(protocol.encode(msg, self.encoding))
+                except websockets.exceptions.ConnectionClosed:
+                    self._discard(msg, "disconnected")
+                    return
+                except Exception as e:
+                    # 메시지 하나의 실패로 writer가 멈추면 이후 명령이 조용히 쌓이므로 버리고 계속 진행
+                    self._stats["errors"] += 1
+                    print(f"❌ 드론 {self.drone_id}에게 메시지 전송 실패 ({msg.get('type')}): {e}")
+                    self._discard(msg, "error")
+                    continue
+                self._stats["sent"] += 1
+            self._ready.clear()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._writer())
+
+    def _discard(self, msg, reason):
+        if self.on_discard is not None:
+            self.on_discard(msg, reason)
+
+    async def stop(self):
+        """writer를 멈춥니다. 보내지 못한 메시지는 버립니다."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue:
+            self._discard(self._queue.popleft(), "disconnected")
+
+    def stats(self):
+        s = dict(self._stats)
+        s["depth"] = len(self._queue)
+        return s
@@ -0,0 +1,182 @@
+# presence.py
+# 드론 접속 현황 레지스트리 / last_seen 관리 (server.py 기반)
+"""
+드론별 접속 현황(연결 시각, 마지막 수신 시각, 추적 중인 MAC)을 메모리에 두는 레지스트리입니다.
+같은 프로세스의 Flask(run_server.py, asgi.py 워커 1개)는 dronedb를 통해 이 표를 바로 읽으므로
+/drones/status가 DB를 거치지 않습니다.
+
+drones 컬렉션은 비동기 사본(write-behind)입니다.
+- 드론이 보내는 ping(및 모든 메시지)은 메모리에만 기록하고,
+  flush_interval 초마다 바뀐 드론만 한 번의 bulk_write로 저장합니다.
+- 저장된 status가 바뀐 드론(새로 online / offline)이 있으면 flush 후 on_change(drone_ids)를 호출합니다.
+- 연결이 끊긴 드론은 offline으로 남아 있다가, 유예 시간이 지나 remove()될 때 표에서 빠집니다.
+
+이벤트 루프 스레드가 갱신하고 Flask 요청 스레드가 snapshot()으로 읽으므로 표는 lock으로 보호합니다.
+"""
+
+import asyncio
+import datetime
+import threading
+
+from pymongo import UpdateOne
+
+import mongo
+
+
+class PresenceTracker:
+    """드론별 접속 현황을 메모리에 두고 주기적으로 DB에 반영합니다."""
+    def __init__(self, collection, flush_interval=5.0, on_change=None):
+        self.collection = collection
+        self.flush_interval = flush_interval  # DB 반영 주기 (초)
+        self.on_change = on_change            # def on_change(drone_ids): status가 바뀐 드론
+        self._lock = threading.Lock()
+        self._drones = {}                     # {drone_id: {"online", "connected_at", "last_seen", "tracking"}}
+        self._dirty = set()                   # 아직 DB에 반영하지 않은 drone_id
+        self._changed = set()                 # status가 바뀌어 on_change로 알릴 drone_id
+        self._task = None
+
+    def load(self, docs):
+        """drones 컬렉션의 기존 기록으로 표를 채웁니다 (시작 시 한 번, 이미 있는 드론은 건너뜀).
+        이전 프로세스의 드론은 연결되어 있지 않으므로 offline으로 둡니다.
+        """
+        with self._lock:
+            for doc in docs:
+                drone_id = doc.get("drone_id")
+                if drone_id is None or drone_id in self._drones:
+                    continue
+                self._drones[drone_id] = {
+                    "online": False,
+                    "connected_at": doc.get("connected_at"),
+                    "last_seen": doc.get("last_seen"),
+                    "tracking": doc.get("tracking"),
+                }
+
+    def connect(self, drone_id, resumed=False):
+        """드론 등록. 유예 시간 안에 다시 연결한 경우(resumed)에는 추적 대상을 유지합니다."""
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            entry = self._drones.get(drone_id)
+            if entry is None or not entry["online"]:
+                self._changed.add(drone_id)
+            self._drones[drone_id] = {
+                "online": True,
+                "connected_at": now,
+                "last_seen": now,
+                "tracking": entry["tracking"] if entry and resumed else None,
+            }
+            self._dirty.add(drone_id)
+
+    def touch(self, drone_id):
+        """drone_id에서 메시지를 받았음을 기록합니다."""
+        if drone_id is None:
+            return
+        now = datetime.datetime.utcnow()
+        with self._lock:
+            entry = self._drones.get(drone_id)
+            if entry is None:
+                entry = self._drones[drone_id] = {"online": False, "connected_at": now, "tracking": None}
+            if not entry["online"]:
+                self._changed.add(drone_id)  # 새로 online
+                entry["online"] = True
+            entry["last_seen"] = now
+            self._dirty.add(drone_id)
+
+    def set_tracking(self, drone_id, mac):
+        """드론에게 전달한 track(mac) / stop(None) 명령을 기록합니다."""
+        with self._lock:
+            entry = self._drones.get(drone_id)
+            if entry is not None and entry["tracking"] != mac:
+                entry["tracking"] = mac
+                self._dirty.add(drone_id)
+
+    def mark_offline(self, drone_id):
+        """연결이 끊긴 드론을 offline으로 바꾸고 다음 flush 때 저장합니다."""
+        with self._lock:
+            entry = self._drones.get(drone_id)
+            if entry is not None and entry["online"]:
+                entry["online"] = False
+                self._dirty.add(drone_id)
+                self._changed.add(drone_id)
+
+    def remove(self, drone_id):
+        """표에서 뺍니다 (유예 만료로 DB 기록을 지울 때)."""
+        with self._lock:
+            self._drones.pop(drone_id, None)
+            self._dirty.discard(drone_id)
+            self._changed.discard(drone_id)
+
+    def last_seen(self, drone_id):
+        entry = self._drones.get(drone_id)
+        return entry["last_seen"] if entry else None
+
+    def snapshot(self):
+        """현재 표의 복사본: [{"drone_id", "status", "connected_at", "last_seen", "tracking"}, ...]"""
+        with self._lock:
+            return [
+                {
+                    "drone_id": drone_id,
+                    "status": "online" if entry["online"] else "offline",
+                    "connected_at": entry["connected_at"],
+                    "last_seen": entry["last_seen"],
+                    "tracking": entry["tracking"],
+                }
+                for drone_id, entry in self._drones.items()
+            ]
+
+    def __len__(self):
+        return len(self._drones)
+
+    async def flush(self):
+        """변경된 드론 기록을 한 번의 bulk_write로 저장합니다."""
+        with self._lock:
+            if not self._dirty:
+                return 0
+            dirty, self._dirty = self._dirty, set()
+            ops = [
+                UpdateOne(
+                    {"drone_id": drone_id},
+                    {"$set": {
+                        "status": "online" if entry["online"] else "offline",
+                        "connected_at": entry["connected_at"],
+                        "last_seen": entry["last_seen"],
+                        "tracking": entry["tracking"]
+                    }},
+                    upsert=True
+                )
+                for drone_id, entry in ((i, self._drones.get(i)) for i in dirty) if entry is not None
+            ]
+        if not ops:
+            return 0
+        try:
+            await mongo.run(self.collection.bulk_write, ops, ordered=False)
+        except Exception as e:
+            # 다음 주기에 다시 시도
+            with self._lock:
+                self._dirty |= {i for i in dirty if i in self._drones}
+            print(f"❌ 드론 상태 저장 실패 ({len(ops)}건): {e}")
+            return 0
+        with self._lock:
+            changed = self._changed & dirty
+            self._changed -= changed
+        if changed and self.on_change:
+            self.on_change(sorted(changed))
+        return len(ops)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,204 @@
+# routing.py
+# 드론 라우팅 레지스트리 (server.py 기반)
+"""
+drone_id -> 드론 소켓을 가진 워커(worker_id)를 기록하고, 다른 워커로 명령을 전달합니다.
+WebSocket 서버를 여러 프로세스로 띄워도 track/stop 명령이 드론을 가진 워커에 도착합니다.
+
+- MemoryRegistry: 프로세스 안에서만 공유됩니다 (워커 1개, 또는 한 프로세스 안의 여러 워커).
+- MongoRegistry: drone_routes / route_mailbox 컬렉션을 사용합니다. 각 워커는 자기 우편함을 주기적으로 확인합니다.
+  워커는 ROUTE_TTL의 1/3마다 자기 라우팅 기록의 updated_at을 갱신합니다. ROUTE_TTL 동안 갱신되지 않은 기록
+  (죽은 워커)은 owner()가 무시하고, TTL 인덱스가 지웁니다.
+"""
+
+import abc
+import asyncio
+import datetime
+import os
+
+from pymongo import ASCENDING
+
+import mongo
+
+ROUTE_TTL_S = float(os.environ.get("ROUTE_TTL", "30"))  # 이 시간 동안 갱신되지 않은 라우팅 기록은 죽은 워커의 것
+
+
+class RoutingRegistry(abc.ABC):
+    """라우팅 레지스트리 공통 인터페이스."""
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self._task = None
+
+    @abc.abstractmethod
+    async def claim(self, drone_id):
+        """이 워커가 drone_id의 소켓을 가지고 있음을 기록합니다."""
+
+    @abc.abstractmethod
+    async def release(self, drone_id):
+        """이 워커가 가진 drone_id 기록을 지웁니다 (다른 워커가 가져갔으면 그대로 둠)."""
+
+    @abc.abstractmethod
+    async def owner(self, drone_id):
+        """drone_id를 가진 워커의 id. 없으면 None."""
+
+    @abc.abstractmethod
+    async def forward(self, worker_id, data):
+        """다른 워커에게 명령(dict)을 전달합니다. 전달했으면 True, 받을 우편함이 없으면 False."""
+
+    @abc.abstractmethod
+    async def _receive(self):
+        """이 워커 앞으로 온 명령 목록을 기다렸다가 반환합니다."""
+
+    async def _run(self, deliver):
+        while True:
+            try:
+                for data in await self._receive():
+                    await deliver(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ 라우팅 우편함 처리 오류: {e}")
+                await asyncio.sleep(1.0)
+
+    def start(self, deliver):
+        """전달받은 명령을 deliver(data) 코루틴으로 넘기는 작업을 시작합니다."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(deliver))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class MemoryRegistry(RoutingRegistry):
+    """프로세스 내부 레지스트리. 같은 프로세스의 모든 인스턴스가 표를 공유합니다."""
+    _owners = {}      # {drone_id: worker_id}
+    _mailboxes = {}   # {worker_id: asyncio.Queue}
+
+    def __init__(self, worker_id):
+        super().__init__(worker_id)
+        self._mailbox = MemoryRegistry._mailboxes.setdefault(worker_id, asyncio.Queue())
+
+    async def claim(self, drone_id):
+        MemoryRegistry._owners[drone_id] = self.worker_id
+
+    async def release(self, drone_id):
+        if MemoryRegistry._owners.get(drone_id) == self.worker_id:
+            del MemoryRegistry._owners[drone_id]
+
+    async def owner(self, drone_id):
+        return MemoryRegistry._owners.get(drone_id)
+
+    async def forward(self, worker_id, data):
+        mailbox = MemoryRegistry._mailboxes.get(worker_id)
+        if mailbox is None:
+            return False
+        mailbox.put_nowait(data)
+        return True
+
+    async def _receive(self):
+        return [await self._mailbox.get()]
+
+
+class MongoRegistry(RoutingRegistry):
+    """MongoDB 기반 레지스트리. 여러 프로세스가 같은 mongod를 보면 서로 명령을 주고받을 수 있습니다."""
+    def __init__(self, worker_id, poll_interval=0.05):
+        super().__init__(worker_id)
+        self.poll_interval = poll_interval
+        self.routes = mongo.get_collection("drone_routes")
+        self.mailbox = mongo.get_collection("route_mailbox")
+        self._indexes_ready = False
+        self._heartbeat_task = None
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            await mongo.run(self.routes.create_index, [("drone_id", ASCENDING)], unique=True)
+            await mongo.run(self.routes.create_index, [("updated_at", ASCENDING)],
+                            expireAfterSeconds=int(ROUTE_TTL_S), name="updated_at_ttl")
+            await mongo.run(self.mailbox.create_index, [("worker_id", ASCENDING), ("_id", ASCENDING)])
+            self._indexes_ready = True
+
+    async def _heartbeat(self):
+        """이 워커가 살아 있는 동안 자기 라우팅 기록의 updated_at을 갱신합니다."""
+        while True:
+            await asyncio.sleep(ROUTE_TTL_S / 3)
+            try:
+                await mongo.run(
+                    self.routes.update_many,
+                    {"worker_id": self.worker_id},
+                    {"$set": {"updated_at": datetime.datetime.utcnow()}}
+                )
+            except Exception as e:
+                print(f"❌ 라우팅 기록 갱신 실패: {e}")
+
+    def start(self, deliver):
+        super().start(deliver)
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+
+    async def claim(self, drone_id):
+        await self._ensure_indexes()
+        await mongo.run(
+            self.routes.update_one,
+            {"drone_id": drone_id},
+            {"$set": {"worker_id": self.worker_id, "updated_at": datetime.datetime.utcnow()}},
+            upsert=True
+        )
+
+    async def release(self, drone_id):
+        await mongo.run(self.routes.delete_one, {"drone_id": drone_id, "worker_id": self.worker_id})
+
+    async def owner(self, drone_id):
+        # ROUTE_TTL 동안 갱신되지 않은 기록(죽은 워커)은 TTL 인덱스가 지우기 전이라도 무시
+        fresh = datetime.datetime.utcnow() - datetime.timedelta(seconds=ROUTE_TTL_S)
+        doc = await mongo.run(self.routes.find_one, {"drone_id": drone_id, "updated_at": {"$gte": fresh}},
+                              {"_id": 0, "worker_id": 1})
+        return doc["worker_id"] if doc else None
+
+    async def forward(self, worker_id, data):
+        await mongo.run(self.mailbox.insert_one, {
+            "worker_id": worker_id,
+            "data": data,
+            "created_at": datetime.datetime.utcnow()
+        })
+        return True
+
+    def _take_all(self):
+        # 가져온 문서만 지워서 그 사이 들어온 명령을 잃지 않도록 함
+        docs = list(self.mailbox.find({"worker_id": self.worker_id}).sort("_id", ASCENDING).limit(100))
+        if docs:
+            self.mailbox.delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+        return [d["data"] for d in docs]
+
+    async def _receive(self):
+        await self._ensure_indexes()
+        while True:
+            items = await mongo.run(self._take_all)
+            if items:
+                return items
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self):
+        await super().stop()
+        if self._heartbeat_task:
+            self._heartbeat_task.cancel()
+            try:
+                await self._heartbeat_task
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat_task = None
+        # 이 워커가 가진 라우팅 기록 정리
+        await mongo.run(self.routes.delete_many, {"worker_id": self.worker_id})
+
+
+def create_registry(backend, worker_id):
+    """backend: "memory" 또는 "mongo"."""
+    if backend == "mongo":
+        return MongoRegistry(worker_id)
+    if backend == "memory":
+        return MemoryRegistry(worker_id)
+    raise ValueError(f"알 수 없는 라우팅 백엔드: {backend}")
@@ -0,0 +1,362 @@
+# scheduler.py
+# 추적 작업 스케줄러: MAC마다 추적할 드론을 고르고, 대기열 / 재배정 관리 (app.py /submit/track, /jobs)
+"""
+대시보드에서 태그 추적을 요청하면 작업(job)을 만들고, 추적할 드론을 스케줄러 스레드가 고릅니다.
+
+후보: online 상태이고 빈 슬롯(TRACK_SLOTS_PER_DRONE)이 있는 드론
+  - 이 프로세스가 배정한 작업 수 + 드론 상태의 tracking(다른 워커가 보낸 track)으로 부하를 셉니다.
+점수: 최근 발견 + RSSI - 부하 (score() 참고)
+  - ble_logs에서 SIGHTING_WINDOW_S 안에 그 MAC을 본 드론일수록, 더 강한 신호로 본 드론일수록 우선합니다.
+- 고를 드론이 없으면 대기열(queued)에 두고, 드론이 등록되거나 다른 작업이 끝나면 먼저 들어온 작업부터 배정합니다.
+- track 명령이 실패하면(드론 거부 / 시간 초과 / 연결 안 됨) 그 드론을 EXCLUDE_S 동안 빼고 다시 배정합니다.
+  MAX_ATTEMPTS번 실패하면 failed로 끝냅니다.
+- 배정된 드론이 REBALANCE_AFTER_S 넘게 offline이거나 기록이 지워지면 작업을 대기열 앞으로 돌려 다른 드론에 배정합니다.
+  유예 시간 안에 다시 연결(resumed)한 드론은 추적을 이어가므로 바로 옮기지 않습니다.
+
+배정은 스케줄러 스레드 하나에서만 합니다. 같은 프로세스의 WebSocket 서버가 events.bus에 올린
+drone / status 이벤트를 받으면 바로, 아니면 INTERVAL초마다 다시 확인합니다 (Flask만 따로 띄운 경우).
+작업 표는 이 프로세스의 메모리에만 있습니다.
+
+작업 형식:
+  {"job_id", "mac", "state", "drone_id", "pinned", "command_id", "attempts", "rebalanced", "error",
+   "created_at", "assigned_at", "started_at", "finished_at", "wait_ms"}
+  state: queued / assigning(track 명령 확인 대기) / tracking / stopped / failed
+"""
+
+import datetime
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import dronedb
+from events import bus
+
+INTERVAL = float(os.environ.get("SCHEDULER_INTERVAL", "2.0"))                    # 재확인 주기 (초)
+SLOTS_PER_DRONE = int(os.environ.get("TRACK_SLOTS_PER_DRONE", "1"))              # 드론 하나가 동시에 맡는 작업 수
+SIGHTING_WINDOW_S = float(os.environ.get("SCHEDULER_SIGHTING_WINDOW", "600"))    # 이 시간 안의 발견 기록만 점수에 반영
+REBALANCE_AFTER_S = float(os.environ.get("SCHEDULER_REBALANCE_AFTER", "10"))     # offline이 이만큼 계속되면 재배정
+EXCLUDE_S = float(os.environ.get("SCHEDULER_EXCLUDE", "30"))                     # track 실패한 드론을 빼 두는 시간
+MAX_ATTEMPTS = int(os.environ.get("SCHEDULER_MAX_ATTEMPTS", "5"))
+HISTORY = int(os.environ.get("SCHEDULER_HISTORY", "200"))                        # 끝난 작업 보관 개수
+# stop 직후 드론 상태의 tracking이 아직 지워지지 않았을 수 있으므로(drones 사본, 목록 캐시) 이 시간 동안은 무시
+RELEASE_GRACE_S = float(os.environ.get("HEARTBEAT_FLUSH_INTERVAL", "5.0")) + 5.0
+
+ACTIVE_STATES = ("assigning", "tracking")
+FINAL_STATES = ("stopped", "failed")
+
+# 스케줄러 스레드를 깨우는 이벤트 (events.bus의 나머지 이벤트는 무시)
+WAKE_EVENTS = ("wake", "drone", "status")
+
+
+def score(sighting, load, now):
+    """드론 하나의 점수 (클수록 우선).
+    sighting: 그 드론의 ble_logs 기록 {"timestamp", "rssi"} 또는 None, load: 0(비어 있음) ~ 1(가득 참)
+    - 최근 발견: SIGHTING_WINDOW_S 안에 봤으면 50 + 최대 50 (방금 봤을수록 큼)
+    - RSSI: -100 dBm -> 0, -40 dBm 이상 -> 60 (최근 발견일 때만)
+    - 부하: load * 100 감점
+    """
+    value = -100.0 * load
+    timestamp = sighting.get("timestamp") if sighting else None
+    if timestamp is None:
+        return value
+    age = (now - timestamp).total_seconds()
+    if age > SIGHTING_WINDOW_S:
+        return value
+    value += 50.0 + 50.0 * (1.0 - max(age, 0.0) / SIGHTING_WINDOW_S)
+    rssi = sighting.get("rssi")
+    if rssi is not None:
+        value += min(max(rssi + 100.0, 0.0), 60.0)
+    return value
+
+
+def _ms(start, end):
+    return round((end - start).total_seconds() * 1000.0, 1)
+
+
+class TrackScheduler:
+    """추적 작업 표 + 배정 스레드. send는 app.send_command(command_type, drone_id, mac, on_final) -> command_id."""
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._send = None
+        self._lock = threading.RLock()
+        self._jobs = OrderedDict()    # {job_id: job}
+        self._queue = deque()         # 배정을 기다리는 job_id (먼저 들어온 순서)
+        self._excluded = {}           # {job_id: {drone_id: 다시 후보가 되는 monotonic 시각}}
+        self._lost = {}               # {job_id: 배정된 드론이 offline으로 보인 monotonic 시각}
+        self._released = {}           # {drone_id: 이 프로세스가 작업을 끝낸 monotonic 시각}
+        self._events = None
+        self._thread = None
+        self._stats = {"submitted": 0, "assigned": 0, "rebalanced": 0, "retried": 0, "failed": 0}
+
+    def attach(self, send):
+        self._send = send
+
+    # ---- 요청 스레드 ----
+
+    def submit(self, mac, drone_id=None):
+        """mac 추적 작업을 만들고 배정을 요청합니다. 이미 진행 중인 작업이 있으면 그 작업을 반환합니다.
+        drone_id를 주면 그 드론에만 배정합니다 (그 드론이 비어 있을 때까지 대기).
+        """
+        self.start()
+        with self._lock:
+            job = self._open_job(mac)
+            if job is not None:
+                return dict(job)
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "mac": mac,
+                "state": "queued",
+                "drone_id": None,
+                "pinned": drone_id,
+                "command_id": None,
+                "attempts": 0,
+                "rebalanced": 0,
+                "error": None,
+                "created_at": datetime.datetime.utcnow(),
+                "assigned_at": None,
+                "started_at": None,
+                "finished_at": None,
+                "wait_ms": None,
+            }
+            self._jobs[job["job_id"]] = job
+            self._queue.append(job["job_id"])
+            self._stats["submitted"] += 1
+            self._trim()
+            job = dict(job)
+        self._publish(job)
+        self.wake()
+        return job
+
+    def stop(self, mac=None, job_id=None):
+        """진행 중인 작업을 끝내고 배정된 드론에 stop을 보냅니다. 끝낸 작업 복사본, 없으면 None."""
+        with self._lock:
+            job = self._jobs.get(job_id) if job_id else self._open_job(mac)
+            if job is None or job["state"] in FINAL_STATES:
+                return None
+            drone_id = job["drone_id"] if job["state"] in ACTIVE_STATES else None
+            if job["job_id"] in self._queue:
+                self._queue.remove(job["job_id"])
+            self._finish(job, "stopped")
+            if drone_id:
+                self._released[drone_id] = time.monotonic()
+            job = dict(job)
+        if drone_id:
+            self._send("stop", drone_id, job["mac"])
+        self._publish(job)
+        self.wake()  # 빈 드론에 대기 작업 배정
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def jobs(self):
+        """최근 작업 목록 (최근 것부터)."""
+        with self._lock:
+            return [dict(job) for job in reversed(self._jobs.values())]
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s["waiting"] = len(self._queue)
+            s["active"] = sum(1 for job in self._jobs.values() if job["state"] in ACTIVE_STATES)
+        return s
+
+    def wake(self):
+        """스케줄러 스레드에 바로 다시 확인하라고 알립니다."""
+        if self._events is not None:
+            try:
+                self._events.put_nowait({"event": "wake"})
+            except queue.Full:
+                pass  # 이미 깨울 이벤트가 쌓여 있음
+
+    # ---- 표 관리 (lock 안에서 호출) ----
+
+    def _open_job(self, mac):
+        for job in reversed(self._jobs.values()):
+            if job["mac"] == mac and job["state"] not in FINAL_STATES:
+                return job
+        return None
+
+    def _finish(self, job, state, error=None):
+        job["state"] = state
+        job["error"] = error
+        job["finished_at"] = datetime.datetime.utcnow()
+        self._excluded.pop(job["job_id"], None)
+        self._lost.pop(job["job_id"], None)
+
+    def _requeue(self, job, error):
+        """배정을 취소하고 대기열 앞에 넣습니다."""
+        job["state"] = "queued"
+        job["drone_id"] = None
+        job["command_id"] = None
+        job["error"] = error
+        self._lost.pop(job["job_id"], None)
+        self._queue.appendleft(job["job_id"])
+
+    def _trim(self):
+        finished = [i for i, job in self._jobs.items() if job["state"] in FINAL_STATES]
+        for job_id in finished[:max(len(finished) - HISTORY, 0)]:
+            del self._jobs[job_id]
+
+    # ---- 명령 결과 (명령 디스패처 콜백) ----
+
+    def _on_track_final(self, job_id, attempt, state):
+        """track 명령이 끝났을 때: acked면 tracking, 아니면 그 드론을 잠시 빼고 다시 배정."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] != "assigning" or job["attempts"] != attempt:
+                return  # 그 사이 중지 / 재배정된 작업
+            job["command_id"] = state["command_id"]
+            if state["state"] == "acked":
+                job["state"] = "tracking"
+                job["error"] = None
+                job["started_at"] = datetime.datetime.utcnow()
+            else:
+                error = state["error"] or state["result"]
+                self._excluded.setdefault(job_id, {})[job["drone_id"]] = time.monotonic() + EXCLUDE_S
+                self._released[job["drone_id"]] = time.monotonic()
+                if job["attempts"] >= MAX_ATTEMPTS:
+                    self._finish(job, "failed", error)
+                    self._stats["failed"] += 1
+                else:
+                    self._requeue(job, error)
+                    self._stats["retried"] += 1
+            job = dict(job)
+        self._publish(job)
+        if job["state"] != "tracking":
+            self.wake()
+
+    # ---- 스케줄러 스레드 ----
+
+    def reconcile(self):
+        """배정된 드론이 사라진 작업을 대기열로 돌리고, 대기 작업을 빈 드론에 배정합니다."""
+        drones = {d["drone_id"]: d for d in dronedb.get_all_drones_status()}
+        now = time.monotonic()
+        changed = []
+        with self._lock:
+            for job in self._jobs.values():
+                if job["state"] not in ACTIVE_STATES:
+                    continue
+                drone = drones.get(job["drone_id"])
+                if drone is not None and drone["status"] != "offline":
+                    self._lost.pop(job["job_id"], None)
+                    continue
+                lost_at = self._lost.setdefault(job["job_id"], now)
+                if drone is None or now - lost_at >= REBALANCE_AFTER_S:
+                    self._released[job["drone_id"]] = now
+                    self._requeue(job, f"{job['drone_id']} 연결 끊김")
+                    job["rebalanced"] += 1
+                    self._stats["rebalanced"] += 1
+                    changed.append(dict(job))
+            waiting = list(self._queue)
+            load = self._load(drones, now)
+        for job in changed:
+            self._publish(job)
+        for job_id in waiting:
+            self._assign(job_id, drones, load, now)
+
+    def _load(self, drones, now):
+        """드론별 사용 중인 슬롯 수 (lock 안에서 호출)."""
+        load = {}
+        for job in self._jobs.values():
+            if job["state"] in ACTIVE_STATES:
+                load[job["drone_id"]] = load.get(job["drone_id"], 0) + 1
+        for drone_id, drone in drones.items():
+            # 다른 워커(또는 재시작 전)가 보낸 track: 이 프로세스가 방금 끝낸 드론이 아니면 가득 찬 것으로 봄
+            if drone.get("tracking") and drone_id not in load \
+                    and now - self._released.get(drone_id, float("-inf")) > RELEASE_GRACE_S:
+                load[drone_id] = SLOTS_PER_DRONE
+        return load
+
+    def _candidates(self, job, drones, load, now):
+        excluded = self._excluded.get(job["job_id"], {})
+        return [
+            drone_id for drone_id, drone in drones.items()
+            if drone["status"] == "online"
+            and load.get(drone_id, 0) < SLOTS_PER_DRONE
+            and excluded.get(drone_id, 0) <= now
+            and (job["pinned"] is None or drone_id == job["pinned"])
+        ]
+
+    def _pick(self, mac, candidates, load):
+        """후보 중 점수가 가장 높은 드론. 발견 기록은 (mac_address, drone_id) 인덱스로 한 번에 읽습니다."""
+        if len(candidates) == 1:
+            return candidates[0]
+        sightings = {
+            doc["drone_id"]: doc
+            for doc in dronedb.ble_logs.find(
+                {"mac_address": mac, "drone_id": {"$in": candidates}},
+                {"_id": 0, "drone_id": 1, "timestamp": 1, "rssi": 1}
+            )
+        }
+        now = datetime.datetime.utcnow()
+        # 점수가 같으면 부하가 적은 드론, 그다음 drone_id 순
+        return max(candidates, key=lambda d: (
+            score(sightings.get(d), load.get(d, 0) / SLOTS_PER_DRONE, now), -load.get(d, 0), d
+        ))
+
+    def _assign(self, job_id, drones, load, now):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["state"] != "queued":
+                return
+            candidates = self._candidates(job, drones, load, now)
+        if not candidates:
+            return
+        drone_id = self._pick(job["mac"], candidates, load)
+        with self._lock:
+            if job["state"] != "queued":
+                return  # 고르는 사이 중지됨
+            self._queue.remove(job_id)
+            job["state"] = "assigning"
+            job["drone_id"] = drone_id
+            job["attempts"] += 1
+            job["assigned_at"] = datetime.datetime.utcnow()
+            if job["wait_ms"] is None:
+                job["wait_ms"] = _ms(job["created_at"], job["assigned_at"])
+            load[drone_id] = load.get(drone_id, 0) + 1
+            self._stats["assigned"] += 1
+            mac, attempt = job["mac"], job["attempts"]
+        command_id = self._send("track", drone_id, mac,
+                                on_final=lambda state: self._on_track_final(job_id, attempt, state))
+        with self._lock:
+            # 명령 결과가 먼저 와서 상태가 바뀌었을 수 있으므로 같은 배정일 때만 기록
+            if job["state"] == "assigning" and job["attempts"] == attempt:
+                job["command_id"] = command_id
+            job = dict(job)
+        self._publish(job)
+
+    def _run(self):
+        events = self._events
+        while True:
+            try:
+                item = events.get(timeout=self.interval)
+            except queue.Empty:
+                item = None
+            if item is not None and item["event"] not in WAKE_EVENTS:
+                continue
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"❌ 추적 작업 배정 실패: {e}")
+
+    def start(self):
+        """스케줄러 스레드 시작 (첫 작업을 받을 때)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._events = bus.subscribe()
+            self._thread = threading.Thread(target=self._run, name="track-scheduler", daemon=True)
+            self._thread.start()
+
+    def _publish(self, job):
+        bus.publish("job", job)
+
+
+# app.py가 쓰는 스케줄러
+scheduler = TrackScheduler(interval=INTERVAL)
@@ -0,0 +1,93 @@
+# schema.py
+# 컬렉션 인덱스 생성 (app.py, server.py 시작 시 실행)
+"""
+조회/upsert에 쓰이는 필드에 인덱스를 만듭니다. 이미 있으면 아무 일도 하지 않습니다.
+
+- tags.mac_address        : unique (register_tag의 중복 검사를 DB가 원자적으로 처리)
+                            인덱스가 확인되지 않으면 태그 등록 / 가져오기는 503으로 거절합니다.
+- drones.drone_id         : unique
+- ble_logs(drone_id, mac_address) : unique, BLE upsert 키
+- ble_logs.timestamp      : 최근 발견 순 조회
+- ble_logs(drone_id, _id) : 드론별 발견 기록 페이지 (dronedb.find_sightings)
+- ble_logs(mac_address, drone_id) : 태그별 발견 집계의 $lookup (dronedb.tag_sightings)
+- commands.command_id     : unique, 명령 상태 조회 / 저장 키 (commandstatus.py)
+- commands.requested_at   : TTL, COMMAND_STATUS_RETENTION초가 지난 명령 상태는 자동 삭제
+"""
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+import mongo
+from commandstatus import RETENTION_S as COMMAND_RETENTION_S
+
+INDEXES = {
+    "tags": [
+        ([("mac_address", ASCENDING)], {"unique": True, "name": "mac_address_unique"}),
+    ],
+    "drones": [
+        ([("drone_id", ASCENDING)], {"unique": True, "name": "drone_id_unique"}),
+    ],
+    "ble_logs": [
+        ([("drone_id", ASCENDING), ("mac_address", ASCENDING)], {"unique": True, "name": "drone_mac_unique"}),
+        ([("timestamp", DESCENDING)], {"name": "timestamp_desc"}),
+        ([("drone_id", ASCENDING), ("_id", DESCENDING)], {"name": "drone_recent"}),
+        ([("mac_address", ASCENDING), ("drone_id", ASCENDING)], {"name": "mac_drone"}),
+    ],
+    "commands": [
+        ([("command_id", ASCENDING)], {"unique": True, "name": "command_id_unique"}),
+        ([("requested_at", ASCENDING)], {"expireAfterSeconds": COMMAND_RETENTION_S, "name": "requested_at_ttl"}),
+    ],
+}
+
+
+# 확인된 unique 인덱스 {(컬렉션, 인덱스 이름)}. 중복 검사를 이 인덱스에 맡기는 쓰기는 확인된 뒤에만 허용
+_unique_ready = set()
+_failed = {}   # {"컬렉션.인덱스 이름": 오류 메시지}
+
+
+def ensure_indexes():
+    """INDEXES에 정의된 인덱스를 만듭니다. 실패한 인덱스는 출력하고 나머지를 계속 만든 뒤,
+    unique 인덱스가 하나라도 실패했으면 RuntimeError를 냅니다 (중복 검사가 동작하지 않으므로 시작 중단).
+    """
+    db = mongo.get_db()
+    created = []
+    unique_failed = []
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            name = f"{collection}.{options['name']}"
+            try:
+                created.append(f"{collection}.{db[collection].create_index(keys, **options)}")
+            except OperationFailure as e:
+                # 예: 기존 데이터에 중복이 있어 unique 인덱스를 만들 수 없음
+                print(f"❌ 인덱스 생성 실패 {collection} {keys}: {e}")
+                _failed[name] = str(e)
+                if options.get("unique"):
+                    unique_failed.append(name)
+                continue
+            _failed.pop(name, None)
+            if options.get("unique"):
+                _unique_ready.add((collection, options["name"]))
+    if unique_failed:
+        raise RuntimeError(f"unique 인덱스를 만들 수 없습니다: {', '.join(unique_failed)} (중복 데이터를 정리하세요)")
+    return created
+
+
+def unique_index_ready(collection, name):
+    """unique 인덱스가 있는지 확인합니다. ensure_indexes()가 아직 실행되지 않은 프로세스(Flask만 띄운 경우 등)는
+    index_information()으로 직접 확인하고, 있으면 기억해 둡니다.
+    """
+    if (collection, name) in _unique_ready:
+        return True
+    info = mongo.get_collection(collection).index_information().get(name)
+    if info and info.get("unique"):
+        _unique_ready.add((collection, name))
+        return True
+    return False
+
+
+def status():
+    """인덱스 상태 (/cache/stats)."""
+    return {
+        "unique_ready": sorted(f"{c}.{n}" for c, n in _unique_ready),
+        "failed": dict(_failed),
+    }
@@ -1,89 +1,410 @@
-from pymongo import MongoClient
-import datetime
 import asyncio
+import argparse
+import multiprocessing
+import os
+import socket
 from websockets.legacy.server import serve
 import websockets
 import json
+from ingest import BleIngestBuffer
+from presence import PresenceTracker
+from telemetry import TelemetryWriter
+from outbound import DroneOutbox
+from sessions import DisconnectGrace
+import mongo
+import protocol
+import commands
+import routing
+import schema
+import dronedb
+import commandstatus
+from events import bus
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["DroneDB"]
-ble_logs = db["ble_logs"]
-drone_status = db["drones"]
+ble_logs = mongo.get_collection("ble_logs")
+drone_status = mongo.get_collection("drones")
 
 # ✅ 드론 연결 저장소 추가
 connected_clients = {}
+# 드론별 송신 큐 (협상된 인코딩 포함). 명령은 큐에 넣고 전용 writer가 전송
+outboxes = {}
+OUTBOX_SIZE = int(os.environ.get("OUTBOX_SIZE", "32"))
+OUTBOX_OVERFLOW = os.environ.get("OUTBOX_OVERFLOW", "drop_oldest")
+
+# 명령 id -> 확인(command_ack)을 돌려보낼 곳 (async def reply(ack))
+# 같은 프로세스 Flask면 commands.dispatcher, 원격 Flask면 명령을 보낸 WebSocket, 다른 워커면 그 워커의 우편함
+command_replies = {}
+REPLY_TTL = commandstatus.RELAY_TIMEOUT + commandstatus.ACK_TIMEOUT
+
+# 드론 소켓을 가진 워커를 기록해 다른 워커로 명령을 넘김 (ROUTING_BACKEND=memory|mongo)
+WORKER_ID = os.environ.get("WORKER_ID", f"{socket.gethostname()}:{os.getpid()}")
+registry = routing.create_registry(os.environ.get("ROUTING_BACKEND", "memory"), WORKER_ID)
+
+# BLE 갱신은 드론별로 모아 bulk_write로 저장
+ble_buffer = BleIngestBuffer(ble_logs, max_batch=500, flush_interval=0.5)
+
+# 추적 중 RSSI 샘플은 시계열 컬렉션에 일괄 저장
+telemetry_writer = TelemetryWriter()
+
+# 하트비트: last_seen은 메모리에 두고 주기적으로 한 번에 저장
+# status(online/offline)가 바뀌면 같은 프로세스 Flask(run_server.py)의 드론 목록 캐시 무효화 + 대시보드 알림
+def on_status_change(drone_ids):
+    dronedb.invalidate()
+    bus.publish("status", {"drone_ids": drone_ids})
+
+presence = PresenceTracker(
+    drone_status,
+    flush_interval=float(os.environ.get("HEARTBEAT_FLUSH_INTERVAL", "5.0")),
+    on_change=on_status_change
+)
+
+async def expire_drones(drone_ids):
+    """유예 시간이 지난 드론들의 기록을 한 번에 지웁니다."""
+    # 이 워커에 다시 연결됐거나(connected_clients) 그 사이 다른 워커에 다시 연결된 드론은 건드리지 않음
+    # await 사이에 다시 연결될 수 있으므로 await 뒤마다 connected_clients를 다시 확인
+    expired = []
+    for drone_id in drone_ids:
+        if drone_id in connected_clients:
+            continue
+        owner = await registry.owner(drone_id)
+        if (owner is None or owner == WORKER_ID) and drone_id not in connected_clients:
+            expired.append(drone_id)
+    if not expired:
+        return
+    await mongo.run(drone_status.delete_many, {"drone_id": {"$in": expired}})
+    await mongo.run(ble_logs.delete_many, {"drone_id": {"$in": expired}})
+    dronedb.invalidate()
+    removed = []
+    for drone_id in expired:
+        if drone_id in connected_clients:
+            # 삭제하는 동안 다시 연결됨 (유예 목록에 없었으므로 새 세션으로 등록됨): drones 기록을 다시 저장
+            presence.touch(drone_id)
+            continue
+        presence.remove(drone_id)
+        bus.publish("drone", {"drone_id": drone_id, "status": "removed"})
+        removed.append(drone_id)
+    if removed:
+        print(f"🗑️ 유예 만료 드론 {len(removed)}대 관련 기록 삭제 완료: {removed}")
+
+# 연결이 끊긴 드론은 유예 시간 동안 기록을 유지하고, 만료되면 배치로 삭제
+grace = DisconnectGrace(
+    expire_drones,
+    grace_s=float(os.environ.get("DISCONNECT_GRACE", "30")),
+    sweep_interval=float(os.environ.get("DISCONNECT_SWEEP_INTERVAL", "5"))
+)
+
+async def relay_command(data, forwarded=False, reply=None):
+    """track/stop 명령을 대상 드론에게 전달합니다. 전달했으면 True.
+    드론이 다른 워커에 연결되어 있으면 레지스트리를 통해 그 워커로 넘깁니다.
+    명령에 command_id가 있고 reply가 주어지면 릴레이 / 드론 확인을 reply(ack)로 돌려보냅니다.
+    """
+    msg_type = data.get("type")
+    target_drone = data.get("drone_id")
+    command_id = data.get("command_id")
+    if command_id and reply is not None:
+        command_replies[command_id] = reply
+        asyncio.get_running_loop().call_later(REPLY_TTL, command_replies.pop, command_id, None)
+    if target_drone not in connected_clients:
+        owner = None if forwarded else await registry.owner(target_drone)
+        if owner and owner != WORKER_ID:
+            # 그 워커가 확인을 이 워커로 돌려보내도록 reply_to를 붙임
+            try:
+                forwarded_ok = await registry.forward(owner, {**data, "reply_to": WORKER_ID} if command_id else data)
+            except Exception as e:
+                print(f"❌ 워커 {owner}로 명령 전달 실패: {e}")
+                forwarded_ok = False
+            if forwarded_ok:
+                print(f"🔀 {msg_type} 명령을 워커 {owner}로 전달 → {target_drone}")
+                return True
+        print(f"❌ 드론 {target_drone} 연결되지 않음")
+        publish_command(data, False, "not_connected")
+        await send_ack(command_id, "relay", False, "not_connected")
+        return False
+    # 대상 드론의 송신 큐에 넣고 바로 반환 (느린 드론이 보낸 쪽을 막지 않음)
+    msg = {"type": msg_type, "mac": data.get("mac")}
+    if command_id:
+        msg["command_id"] = command_id
+    outbox = outboxes.get(target_drone)
+    result = outbox.put(msg) if outbox is not None else "not_connected"
+    if result != "queued":
+        print(f"❌ {msg_type} 명령 버려짐 ({result}) → {target_drone}")
+        publish_command(data, False, result)
+        await send_ack(command_id, "relay", False, result)
+        return False
+    print(f"📡 {msg_type} 명령 전달 완료 → {target_drone}")
+    presence.set_tracking(target_drone, data.get("mac") if msg_type == "track" else None)
+    publish_command(data, True, result)
+    await send_ack(command_id, "relay", True, result)
+    return True
+
+async def send_ack(command_id, stage, ok, result, error=None):
+    """명령 확인을 보냅니다. stage: "relay"(송신 큐에 넣음) / "outbox"(보내지 못하고 버림) / "drone"(드론이 실행)."""
+    if command_id:
+        await route_ack({"type": "command_ack", "command_id": command_id, "stage": stage,
+                         "ok": ok, "result": result, "error": error})
+
+async def route_ack(ack):
+    """확인을 명령을 보낸 쪽으로 돌려보냅니다. 마지막 확인이면 기록을 지웁니다."""
+    command_id = ack.get("command_id")
+    final = ack.get("stage") != "relay" or not ack.get("ok")
+    reply = command_replies.pop(command_id, None) if final else command_replies.get(command_id)
+    if reply is None:
+        return
+    try:
+        await reply(ack)
+    except Exception as e:
+        print(f"❌ 명령 확인 전달 실패 ({command_id}): {e}")
+
+def on_outbox_discard(msg, reason):
+    """송신 큐에서 드론에게 보내지 못하고 버린 명령을 실패로 알립니다."""
+    if msg.get("command_id"):
+        asyncio.get_running_loop().create_task(send_ack(msg["command_id"], "outbox", False, reason))
+
+def forward_reply(worker_id):
+    """다른 워커가 넘겨준 명령의 확인을 그 워커의 우편함으로 돌려보내는 reply."""
+    if not worker_id:
+        return None
+
+    async def reply(ack):
+        await registry.forward(worker_id, ack)
+    return reply
+
+def publish_command(data, ok, result):
+    """명령 전달 결과를 대시보드로 보냅니다."""
+    bus.publish("track", {
+        "drone_id": data.get("drone_id"),
+        "command": data.get("type"),
+        "mac": data.get("mac"),
+        "ok": ok,
+        "result": result
+    })
+
+def metrics():
+    """릴레이 상태: 송신 큐 깊이, BLE 수집 통계."""
+    return {
+        "worker_id": WORKER_ID,
+        "connected": len(connected_clients),
+        "offline_in_grace": len(grace.offline_ids()),
+        "presence": len(presence),
+        "outbox_depth_total": sum(o.depth for o in outboxes.values()),
+        "outboxes": {drone: o.stats() for drone, o in outboxes.items()},
+        "ble_ingest": ble_buffer.stats(),
+        "events": bus.stats(),
+    }
+
+async def deliver_forwarded(data):
+    """다른 워커가 넘겨준 명령을 이 워커의 드론에게 전달합니다 (확인이면 명령을 보낸 쪽으로 돌려보냄)."""
+    if data.get("type") == "command_ack":
+        await route_ack(data)
+        return
+    await relay_command(data, forwarded=True, reply=forward_reply(data.pop("reply_to", None)))
 
 async def handler(websocket, path):
     drone_id = None
     try:
         async for message in websocket:
             try:
-                data = json.loads(message)
-            except json.JSONDecodeError:
-                print("❌ 잘못된 JSON 수신:", message)
+                data = protocol.decode(message)
+            except ValueError as e:
+                print(f"❌ 잘못된 메시지 수신: {e}")
                 continue
 
             msg_type = data.get("type")
+            presence.touch(drone_id)  # 등록된 드론의 모든 메시지는 생존 신호
 
             if msg_type == "drone_id":
                 drone_id = data.get("drone_id")
+                # 드론이 인코딩 목록을 보내면 하나를 골라 알려줌 (없으면 JSON 유지)
+                encoding = protocol.choose_encoding(data.get("encodings"))
+                # 유예 시간 안에 다시 연결했으면 기존 세션(BLE 기록)을 그대로 사용
+                resumed = grace.resume(drone_id)
+                if "encodings" in data:
+                    await websocket.send(json.dumps({"type": "welcome", "encoding": encoding, "resumed": resumed}))
+                # 새 송신 큐를 먼저 띄운 뒤 소켓과 함께 await 없이 바꿔 끼움
+                # (relay_command가 큐 없는 드론을 보거나, 멈추는 중인 이전 큐에 명령을 넣지 않도록)
+                outbox = DroneOutbox(drone_id, websocket, encoding, OUTBOX_SIZE, OUTBOX_OVERFLOW,
+                                     on_discard=on_outbox_discard)
+                outbox.start()
+                previous = outboxes.get(drone_id)
+                outboxes[drone_id] = outbox
                 connected_clients[drone_id] = websocket  # 드론 소켓 저장
-                print(f"✅ 드론 등록됨: {drone_id}")
-                drone_status.update_one(
-                    {"drone_id": drone_id},
-                    {"$set": {"status": "online", "last_seen": datetime.datetime.utcnow()}},
-                    upsert=True
-                )
+                if previous is not None:
+                    await previous.stop()  # 이전 연결의 큐 정리 (남은 명령은 on_discard로 실패 처리)
+                print(f"✅ 드론 등록됨: {drone_id} ({encoding}{', 세션 재개' if resumed else ''})")
+                await registry.claim(drone_id)
+                # 등록은 바로 반영 (다른 드론의 밀린 last_seen도 함께 저장됨)
+                presence.connect(drone_id, resumed)
+                await presence.flush()
+                bus.publish("drone", {"drone_id": drone_id, "status": "online", "resumed": resumed})
+
+            elif msg_type == "ping":
+                pass  # 하트비트: presence.touch()로 이미 기록됨
 
             elif msg_type == "ble":
                 mac = data.get("mac")
                 name = data.get("name")
-                ble_logs.update_one(
-                    {"drone_id": drone_id, "mac_address": mac},
-                    {"$set": {
-                        "device_name": name,
-                        "timestamp": datetime.datetime.utcnow()
-                    }},
-                    upsert=True
-                )
+                if not mac or not isinstance(mac, str):
+                    print(f"❌ 잘못된 ble 메시지 ({drone_id}): mac {mac!r}")
+                    continue
+                ble_buffer.add(drone_id, mac, name, data.get("rssi"))
+                bus.publish("ble", {"drone_id": drone_id, "mac": mac, "name": name})
                 print(f"📡 BLE 갱신: {mac} - {name}")
 
-            elif msg_type == "track":
-                print(f"🚀 track 명령 수신: {data}")
-                target_drone = data.get("drone_id")
-                if target_drone in connected_clients:
-                    await connected_clients[target_drone].send(json.dumps({
-                        "type": "track",
-                        "mac": data.get("mac")
-                    }))
-                    print(f"📡 track 명령 전달 완료 → {target_drone}")
-                else:
-                    print(f"❌ 드론 {target_drone} 연결되지 않음")
-
-            elif msg_type == "stop":
-                print(f"🚀 track 명령 수신: {data}")
-                target_drone = data.get("drone_id")
-                if target_drone in connected_clients:
-                    await connected_clients[target_drone].send(json.dumps({
-                        "type": "stop",
-                        "mac": data.get("mac")
-                    }))
-                    print(f"📡 stop 명령 전달 완료 → {target_drone}")
-                else:
-                    print(f"❌ 드론 {target_drone} 연결되지 않음")
+            elif msg_type == "ble_batch":
+                # 스캔 결과 전체(또는 그 일부 청크)를 한 번의 bulk_write로 저장
+                # 형식이 잘못된 배치 / 장치 항목은 버리고 연결은 유지
+                devices = data.get("devices") or []
+                if not isinstance(devices, list):
+                    print(f"❌ 잘못된 ble_batch ({drone_id}): devices가 목록이 아닙니다")
+                    continue
+                accepted = ble_buffer.add_many(drone_id, devices)
+                if accepted < len(devices):
+                    print(f"⚠️ ble_batch ({drone_id}): 잘못된 장치 항목 {len(devices) - accepted}개 버림")
+                saved = await ble_buffer.flush(drone_id)
+                bus.publish("ble", {"drone_id": drone_id, "count": accepted})
+                print(f"📡 BLE 일괄 갱신: {drone_id} {accepted}개 "
+                      f"(청크 {chunk_label(data)}, 저장 {saved}건)")
+
+            elif msg_type == "rssi_batch":
+                # 잘못된 샘플은 버리고(dropped에 집계) 연결은 유지
+                samples = data.get("samples") or []
+                accepted = telemetry_writer.add_batch(drone_id, data)
+                if not isinstance(samples, list):
+                    print(f"❌ 잘못된 rssi_batch ({drone_id}): samples가 목록이 아닙니다")
+                elif accepted < len(samples):
+                    print(f"⚠️ rssi_batch ({drone_id}): 잘못된 샘플 {len(samples) - accepted}개 버림")
+
+            elif msg_type in ("track", "stop"):
+                print(f"🚀 {msg_type} 명령 수신: {data}")
+                # 명령을 보낸 연결(원격 Flask)로 확인을 JSON으로 돌려보냄
+                await relay_command(data, reply=websocket_reply(websocket))
+
+            elif msg_type == "command_ack":
+                # 드론이 명령을 실행(추적 시작/중지)했거나 실패했음
+                await send_ack(data.get("command_id"), "drone", bool(data.get("ok")),
+                               data.get("result"), data.get("error"))
+
+            elif msg_type == "metrics":
+                await websocket.send(json.dumps(metrics()))
 
     except websockets.exceptions.ConnectionClosed:
-        print(f"❌ {drone_id} 연결 종료됨")
-        if drone_id in connected_clients:
-            del connected_clients[drone_id]
-        drone_status.delete_one({"drone_id": drone_id})
-        ble_logs.delete_many({"drone_id": drone_id})
-        print(f"🗑️ {drone_id} 관련 기록 삭제 완료")
+        pass
+    finally:
+        await on_disconnect(drone_id, websocket)
+
+def chunk_label(data):
+    """ble_batch의 "청크 번호/전체" 표시. chunk / chunks가 정수가 아니면 "?"."""
+    chunk, chunks = data.get("chunk", 0), data.get("chunks", 1)
+    if not isinstance(chunk, int) or not isinstance(chunks, int):
+        return "?"
+    return f"{chunk + 1}/{chunks}"
+
+def websocket_reply(websocket):
+    async def reply(ack):
+        await websocket.send(json.dumps(ack))
+    return reply
+
+async def on_disconnect(drone_id, websocket):
+    """연결 종료 처리. 기록은 바로 지우지 않고 유예 목록에 넣습니다."""
+    if drone_id is None:
+        return
+    print(f"❌ {drone_id} 연결 종료됨")
+    # 같은 드론이 이미 새 연결로 재등록했으면 새 연결의 소켓/큐는 그대로 둠
+    if connected_clients.get(drone_id) is not websocket:
+        if drone_id not in connected_clients:
+            grace.mark_offline(drone_id)  # 등록(welcome 전송) 도중 끊김: 유예 목록에 다시 넣음
+        return
+    del connected_clients[drone_id]
+    await outboxes.pop(drone_id).stop()
+    await registry.release(drone_id)
+    presence.mark_offline(drone_id)
+    grace.mark_offline(drone_id)
+    bus.publish("drone", {"drone_id": drone_id, "status": "offline"})
+    print(f"⏳ {drone_id} 오프라인 (유예 {grace.grace_s:.0f}초 후 기록 삭제)")
+
+async def start_services():
+    """인덱스 확인, 버퍼/하트비트/유예/라우팅 작업 시작 (server.py, asgi.py 공용)."""
+    try:
+        await mongo.run(schema.ensure_indexes)
+    except RuntimeError:
+        raise  # unique 인덱스가 없으면 중복 검사가 동작하지 않으므로 시작하지 않음
+    except Exception as e:
+        print(f"❌ 인덱스 확인 실패: {e} (태그 등록은 인덱스가 확인될 때까지 거절)")
+    # 접속 현황 레지스트리를 기존 drones 기록으로 채우고, 워커가 하나면 Flask가 DB 대신 읽도록 연결
+    # (여러 워커면 각 워커는 자기 드론만 알기 때문에 Flask는 drones 컬렉션을 읽음)
+    try:
+        docs = await mongo.run(lambda: list(drone_status.find({}, {"_id": 0})))
+        presence.load(docs)
+        # 이전 프로세스의 드론은 on_disconnect로 유예 목록에 들어갈 연결이 없으므로 여기서 넣음
+        # (유예 시간 안에 다시 연결하면 세션 재개, 아니면 만료되어 기록 삭제)
+        for doc in docs:
+            if doc.get("drone_id") not in connected_clients:
+                grace.mark_offline(doc.get("drone_id"))
+    except Exception as e:
+        print(f"❌ 드론 기록 불러오기 실패: {e}")
+    if isinstance(registry, routing.MemoryRegistry):
+        dronedb.attach_live(presence)
+    ble_buffer.start()
+    presence.start()
+    telemetry_writer.start()
+    grace.start()
+    registry.start(deliver_forwarded)
+    # 같은 프로세스의 Flask(run_server.py, asgi.py)가 소켓 없이 바로 명령을 넘길 수 있도록 등록
+    commands.dispatcher.attach_local(asyncio.get_running_loop(), relay_command)
+
+async def stop_services():
+    """밀린 BLE / last_seen / 텔레메트리를 저장하고 작업을 멈춥니다."""
+    commands.dispatcher.detach_local()
+    dronedb.detach_live()
+    await registry.stop()
+    await ble_buffer.stop()
+    await presence.stop()
+    await telemetry_writer.stop()
+    await grace.stop()
+    print(f"📊 BLE 수집 통계: {ble_buffer.stats()}")
+
+async def start_websocket_server(host="0.0.0.0", port=8765, reuse_port=False):
+    await start_services()
+    try:
+        async with serve(handler, host, port, reuse_port=reuse_port):
+            print(f"🚀 WebSocket 서버 시작됨 (워커 {WORKER_ID})")
+            await asyncio.Future()
+    finally:
+        await stop_services()
 
-async def start_websocket_server():
-    async with serve(handler, "0.0.0.0", 8765):
-        print("🚀 WebSocket 서버 시작됨")
-        await asyncio.Future()
+def run_worker(index, host, port):
+    """워커 프로세스 하나. 모든 워커가 SO_REUSEPORT로 같은 포트를 나눠 받습니다."""
+    global WORKER_ID, registry
+    WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    registry = routing.create_registry("mongo", WORKER_ID)
+    try:
+        asyncio.run(start_websocket_server(host, port, reuse_port=True))
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1, help="WebSocket 워커 프로세스 수 (2 이상이면 mongo 라우팅)")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        asyncio.run(start_websocket_server(args.host, args.port))
+        return
+
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(i, args.host, args.port), daemon=True)
+        for i in range(args.workers)
+    ]
+    for w in workers:
+        w.start()
+    print(f"🚀 WebSocket 워커 {args.workers}개 시작됨")
+    try:
+        for w in workers:
+            w.join()
+    except KeyboardInterrupt:
+        for w in workers:
+            w.terminate()
 
 if __name__ == "__main__":
-    asyncio.run(start_websocket_server())
+    main()
@@ -0,0 +1,73 @@
+# sessions.py
+# 드론 연결 종료 유예 (server.py 기반)
+"""
+드론 연결이 끊겨도 바로 기록을 지우지 않고 grace_s 초 동안 오프라인 상태로 메모리에 둡니다.
+
+- 유예 시간 안에 다시 등록하면 세션을 이어서 사용합니다 (BLE 인벤토리 재업로드 불필요).
+- 유예 시간이 지난 드론은 sweep_interval 초마다 모아서 on_expire(drone_ids)로 한 번에 정리합니다.
+  네트워크 문제로 여러 드론이 한꺼번에 끊겨도 삭제는 주기당 한 번의 배치로 처리됩니다.
+"""
+
+import asyncio
+import time
+
+
+class DisconnectGrace:
+    """연결이 끊긴 드론의 유예 시간 관리."""
+    def __init__(self, on_expire, grace_s=30.0, sweep_interval=5.0):
+        self.on_expire = on_expire          # async def on_expire(drone_ids)
+        self.grace_s = grace_s
+        self.sweep_interval = sweep_interval
+        self._offline = {}                  # {drone_id: 연결 종료 시각 (monotonic)}
+        self._task = None
+
+    def mark_offline(self, drone_id):
+        """연결이 끊긴 드론을 유예 목록에 넣습니다."""
+        if drone_id is not None:
+            self._offline[drone_id] = time.monotonic()
+
+    def resume(self, drone_id):
+        """재등록된 드론이 유예 중이었으면 목록에서 빼고 True를 반환합니다."""
+        return self._offline.pop(drone_id, None) is not None
+
+    def is_offline(self, drone_id):
+        return drone_id in self._offline
+
+    def offline_ids(self):
+        return list(self._offline)
+
+    async def sweep(self, now=None):
+        """유예 시간이 지난 드론을 한 번에 정리합니다."""
+        now = now if now is not None else time.monotonic()
+        expired = [d for d, t in self._offline.items() if now - t >= self.grace_s]
+        if not expired:
+            return []
+        for drone_id in expired:
+            del self._offline[drone_id]
+        try:
+            await self.on_expire(expired)
+        except Exception as e:
+            print(f"❌ 만료 드론 정리 실패 ({len(expired)}대): {e}")
+            # 다음 주기에 다시 시도
+            for drone_id in expired:
+                self._offline.setdefault(drone_id, now - self.grace_s)
+            return []
+        return expired
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            await self.sweep()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
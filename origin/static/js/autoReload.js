@@ -1,18 +1,41 @@
-//이하 자동 갱신
-async function fetchData() {
-    const response = await fetch('/position');
-    const data = await response.json();
-    const list = document.getElementById('data-list');
-    list.innerHTML = '';
-    data.forEach(item => {
-        const li = document.createElement('li');
-        li.textContent = item;
-        list.appendChild(li);
-    });
+// 이하 자동 갱신 (서버 푸시)
+// /events(Server-Sent Events)로 드론 등록/연결 종료, BLE 갱신, 명령 결과를 받아 목록 맨 위에 추가
+const MAX_ITEMS = 100;
+
+function describe(type, data) {
+    switch (type) {
+        case 'drone':
+            return `${data.drone_id} ${data.status}${data.resumed ? ' (세션 재개)' : ''}`;
+        case 'status':
+            return `상태 변경: ${data.drone_ids.join(', ')}`;
+        case 'ble':
+            return data.count !== undefined
+                ? `${data.drone_id} BLE 일괄 갱신 ${data.count}개`
+                : `${data.drone_id} BLE ${data.mac} - ${data.name}`;
+        case 'track':
+            return `${data.drone_id} ${data.command} ${data.mac} → ${data.ok ? '전달' : '실패'} (${data.result})`;
+        case 'command':
+            return `${data.drone_id} ${data.command} ${data.mac || ''} → ${data.state}${data.result ? ` (${data.result})` : ''}`;
+        case 'result':
+            return data.message;
+        case 'job':
+            return `작업 ${data.mac} → ${data.state}${data.drone_id ? ` (${data.drone_id})` : ''}${data.error ? `: ${data.error}` : ''}`;
+        default:
+            return JSON.stringify(data);
+    }
 }
 
-// 처음 로딩 시 실행
-fetchData();
+function addItem(type, data) {
+    const list = document.getElementById('data-list');
+    const li = document.createElement('li');
+    li.textContent = `[${new Date().toLocaleTimeString()}] ${describe(type, data)}`;
+    list.prepend(li);
+    while (list.children.length > MAX_ITEMS) {
+        list.removeChild(list.lastChild);
+    }
+}
 
-// 3초마다 자동 생신
-setInterval(fetchData, 3000);
\ No newline at end of file
+const source = new EventSource('/events');
+['drone', 'status', 'ble', 'track', 'command', 'result', 'job'].forEach(type => {
+    source.addEventListener(type, e => addItem(type, JSON.parse(e.data)));
+});
@@ -1,29 +1,117 @@
+// 하트비트 경과 시간으로 판단된 상태 -> 표시 색상
+const STATUS_CLASSES = {
+    online: 'status-online',
+    stale: 'status-stale',
+    offline: 'status-offline'
+};
+
+// 마지막으로 받은 상태 버전 / 드론 목록
+// - If-None-Match: 상태가 그대로면 서버가 304 (본문 없음)
+// - since: 바뀐 드론만 받음
+let statusVersion = '';
+const drones = new Map();  // drone_id -> { drone_id, status, last_seen, connected_at, tracking }
+
+function renderDrones() {
+    const list = document.getElementById('drone-status-list');
+    list.innerHTML = '';
+
+    drones.forEach(drone => {
+        // ✅ status 안전하게 검사
+        const rawStatus = (drone.status || "").trim().toLowerCase();
+        const statusClass = STATUS_CLASSES[rawStatus] || 'status-offline';
+
+        const span = document.createElement('span');
+        // 추적 중인 태그는 마우스를 올리면 표시
+        span.title = drone.tracking ? `추적 중: ${drone.tracking}` : '';
+        span.innerHTML = `
+            ${drone.drone_id}
+            <span class="status-dot ${statusClass}"></span>
+        `;
+        list.appendChild(span);
+    });
+}
+
 async function fetchDroneStatus() {
     try {
-        const res = await fetch('/drones/status');
+        const headers = statusVersion ? { 'If-None-Match': `"${statusVersion}"` } : {};
+        const res = await fetch(`/drones/status?since=${encodeURIComponent(statusVersion)}`, { headers });
+        if (res.status === 304) return;  // 바뀐 것 없음
         if (!res.ok) throw new Error('드론 상태 로드 실패');
 
-        const data = await res.json(); // [{ drone_id, status, last_seen }, ...]
+        const data = await res.json(); // { version, full, drones: [...], removed: [...] }
 
-        const list = document.getElementById('drone-status-list');
-        list.innerHTML = '';
+        if (data.full) drones.clear();
+        data.drones.forEach(drone => drones.set(drone.drone_id, drone));
+        (data.removed || []).forEach(id => drones.delete(id));
+        statusVersion = data.version;
 
-        data.forEach(drone => {
-            // ✅ status 안전하게 검사
-            const rawStatus = drone.status || "";
-            const statusClass = rawStatus.trim().toLowerCase() === 'online' ? 'status-online' : 'status-offline';
-
-            const span = document.createElement('span');
-            span.innerHTML = `
-                ${drone.drone_id}
-                <span class="status-dot ${statusClass}"></span>
-            `;
-            list.appendChild(span);
-        });
+        renderDrones();
     } catch (err) {
         console.error('드론 상태 표시 중 오류 발생:', err);
     }
 }
 
-setInterval(fetchDroneStatus, 3000);
+// 서버 푸시(/events): 드론 등록/연결 종료/상태 변경 시 바로 갱신, 명령 결과는 Result에 추가
+// 푸시 연결이 살아 있으면 폴링은 stale 전환(시간 경과) 확인용으로만 느리게 돌림
+const POLL_MS = 3000;
+const PUSH_POLL_MS = 15000;
+let pushConnected = false;
+
+const MAX_RESULTS = 20;  // 서버 렌더링(COMMAND_LOG_SHOW)과 같은 개수만 유지
+
+function appendResult(entry) {
+    const sidebar = document.getElementById('track-results');
+    if (!sidebar) return;
+    const pre = document.createElement('pre');
+    // completed_at: "YYYY-MM-DD HH:MM:SS.ffffff" (UTC)
+    const time = (entry.completed_at || '').slice(11, 19);
+    pre.textContent = `[${time}] ${entry.message}`;
+    sidebar.appendChild(pre);
+    while (sidebar.children.length > MAX_RESULTS) {
+        sidebar.removeChild(sidebar.firstChild);
+    }
+}
+
+// 추적 작업(scheduler.py) 중 명령 결과로 알 수 없는 상태만 표시: 대기 / 재배정 / 실패
+function describeJob(job) {
+    if (job.state === 'queued' && job.error) return `${job.mac} 재배정 대기: ${job.error}`;
+    if (job.state === 'queued') return `${job.mac} 추적 대기 중 (빈 드론 없음)`;
+    if (job.state === 'failed') return `${job.mac} 추적 실패: ${job.error}`;
+    return null;
+}
+
+function onJob(job) {
+    const message = describeJob(job);
+    // 방금 등록되어 바로 배정될 작업은 표시하지 않도록 잠시 뒤 다시 확인
+    if (job.state === 'queued' && !job.error) {
+        setTimeout(async () => {
+            const res = await fetch(`/jobs/${job.job_id}`);
+            if (res.ok && (await res.json()).state === 'queued') {
+                appendResult({completed_at: new Date().toISOString(), message});
+            }
+        }, 1000);
+    } else if (message) {
+        appendResult({completed_at: new Date().toISOString(), message});
+    }
+}
+
+if (window.EventSource) {
+    const source = new EventSource('/events');
+    source.onopen = () => { pushConnected = true; };
+    source.onerror = () => { pushConnected = false; };  // 브라우저가 자동 재연결
+    source.addEventListener('drone', fetchDroneStatus);
+    source.addEventListener('status', fetchDroneStatus);
+    source.addEventListener('track', fetchDroneStatus);  // 추적 대상 변경
+    source.addEventListener('result', e => appendResult(JSON.parse(e.data)));
+    source.addEventListener('job', e => onJob(JSON.parse(e.data)));
+}
+
+function schedulePoll() {
+    setTimeout(async () => {
+        await fetchDroneStatus();
+        schedulePoll();
+    }, pushConnected ? PUSH_POLL_MS : POLL_MS);
+}
+
 fetchDroneStatus();  // 최초 1회
+schedulePoll();
@@ -0,0 +1,183 @@
+# tagio.py
+# 태그 일괄 가져오기 / 내보내기 (app.py)
+"""
+CSV 또는 JSON Lines로 태그를 한꺼번에 등록하고 내려받습니다.
+
+가져오기
+- 업로드를 한 줄씩 읽어 chunk_size 행마다 unordered bulk_write(UpdateOne upsert, 키 mac_address)로 저장합니다.
+  파일 전체를 메모리에 올리지 않습니다.
+- 행마다 검사(MAC 형식, tag_name 필수)하고, 실패한 행은 줄 번호와 이유를 결과에 담습니다.
+- on_conflict="update"면 이미 있는 태그를 덮어쓰고, "skip"이면 그대로 둡니다.
+- MAC은 대문자로 저장합니다 (드론이 보내는 형식과 같게).
+
+내보내기
+- 커서에서 한 건씩 읽어 바로 내보내는 generator를 반환합니다 (목록을 만들지 않음).
+"""
+
+import csv
+import io
+import json
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+import db
+import schema
+from cache import listings
+
+FORMATS = ("csv", "jsonl")
+FIELDS = ("mac_address", "tag_name", "location")
+MAX_REPORTED_ERRORS = 1000   # 결과에 담는 행 오류 최대 개수 (개수는 전부 셈)
+
+
+def _rows(lines, fmt):
+    """(줄 번호, dict 또는 오류 문자열)을 하나씩 반환합니다."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        missing = [f for f in ("mac_address", "tag_name") if f not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV 헤더에 {', '.join(missing)} 열이 없습니다")
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, f"JSON 형식 오류: {e}"
+                continue
+            yield line_no, row if isinstance(row, dict) else "JSON 객체가 아닙니다"
+
+
+def _validate(row):
+    """검사한 태그 dict 또는 오류 문자열."""
+    mac = db.normalize_mac(row.get("mac_address"))
+    name = str(row.get("tag_name") or "").strip()
+    if mac is None:
+        return f"잘못된 MAC 주소: {row.get('mac_address')!r}"
+    if not name:
+        return "tag_name이 비어 있습니다"
+    return {"mac_address": mac, "tag_name": name, "location": str(row.get("location") or "").strip()}
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.duplicates = 0     # 같은 파일 안에서 뒤의 행으로 대체된 행
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "duplicates": self.duplicates,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def _write_chunk(chunk, on_conflict, result):
+    """chunk: {mac: (줄 번호, 태그)}. 같은 파일 안의 중복 MAC은 이미 마지막 행으로 합쳐져 있습니다."""
+    entries = list(chunk.values())
+    if on_conflict == "skip":
+        ops = [UpdateOne({"mac_address": t["mac_address"]}, {"$setOnInsert": t}, upsert=True) for _, t in entries]
+    else:
+        ops = [UpdateOne({"mac_address": t["mac_address"]}, {"$set": t}, upsert=True) for _, t in entries]
+    try:
+        res = db.tags_collection.bulk_write(ops, ordered=False)
+        details = res.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for err in details.get("writeErrors", []):
+            result.error(entries[err["index"]][0], err.get("errmsg", "저장 실패"))
+    upserted = details.get("nUpserted", 0)
+    matched = details.get("nMatched", 0)
+    modified = details.get("nModified", 0)
+    result.inserted += upserted
+    result.updated += modified
+    result.unchanged += matched - modified
+
+
+def import_tags(lines, fmt="csv", on_conflict="update", chunk_size=500):
+    """lines(문자열 줄 iterator)를 읽어 태그를 저장합니다. 반환: (결과 dict, 상태 코드)."""
+    if fmt not in FORMATS:
+        return {"error": f"지원하지 않는 형식입니다: {fmt}"}, 400
+    if on_conflict not in ("update", "skip"):
+        return {"error": f"on_conflict는 update 또는 skip이어야 합니다: {on_conflict}"}, 400
+
+    if not schema.unique_index_ready("tags", "mac_address_unique"):
+        return {"error": db.UNIQUE_INDEX_MISSING}, 503
+
+    result = ImportResult()
+    chunk = {}
+    try:
+        for line_no, row in _rows(lines, fmt):
+            result.rows += 1
+            tag = row if isinstance(row, str) else _validate(row)
+            if isinstance(tag, str):
+                result.error(line_no, tag)
+                continue
+            if tag["mac_address"] in chunk:
+                result.duplicates += 1  # 같은 파일의 앞선 행은 마지막 행으로 대체
+            chunk[tag["mac_address"]] = (line_no, tag)
+            if len(chunk) >= chunk_size:
+                _write_chunk(chunk, on_conflict, result)
+                chunk = {}
+        if chunk:
+            _write_chunk(chunk, on_conflict, result)
+    except ValueError as e:  # 헤더 오류 / 디코딩 오류(UnicodeDecodeError)
+        if result.rows == 0:
+            return {"error": str(e)}, 400
+        result.error(result.rows + 1, f"파일을 읽을 수 없습니다: {e}")
+    except csv.Error as e:
+        result.error(result.rows + 1, f"파일을 읽을 수 없습니다: {e}")
+    finally:
+        if result.inserted or result.updated:
+            listings.invalidate("tags")
+
+    if result.rows == 0:
+        return {"error": "가져올 행이 없습니다", **result.to_dict()}, 400
+    return result.to_dict(), 200
+
+
+def decode_lines(stream, encoding="utf-8-sig"):
+    """바이트 스트림을 한 줄씩 문자열로 바꿉니다 (첫 줄의 BOM 제거)."""
+    first = True
+    for raw in stream:
+        line = raw.decode(encoding if first else "utf-8")
+        first = False
+        yield line
+
+
+def export_tags(fmt="csv", batch_size=1000, flush_bytes=64 * 1024):
+    """tags 컬렉션을 커서에서 바로 CSV / JSON Lines 문자열 조각(약 flush_bytes 크기)으로 내보냅니다."""
+    cursor = db.tags_collection.find({}, db.TAG_FIELDS, batch_size=batch_size).sort("mac_address", 1)
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(doc):
+            buffer.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+    for doc in cursor:
+        write(doc)
+        if buffer.tell() >= flush_bytes:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
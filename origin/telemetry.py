@@ -0,0 +1,207 @@
+# telemetry.py
+# RSSI 텔레메트리 시계열 저장 / 조회 (server.py, app.py 공용)
+"""
+드론이 보내는 rssi_batch 샘플을 rssi_telemetry 시계열(time-series) 컬렉션에 저장합니다.
+
+- 문서 형식: {"ts": datetime, "meta": {"drone_id", "mac", "session"}, "rssi": float|None, "state": str|None}
+- 샘플은 메모리에 모았다가 insert_many 한 번으로 저장합니다 (크기 또는 시간 임계값).
+  저장에 실패하면 샘플을 버퍼에 되돌려 다음 flush에 다시 저장합니다 (최대 max_buffer개).
+- get_series()는 $dateTrunc으로 구간별 min/mean/max를 계산해, 긴 세션도 원본 점을 모두 가져오지 않습니다.
+"""
+
+import asyncio
+import datetime
+import math
+
+from pymongo.errors import BulkWriteError, CollectionInvalid
+
+import mongo
+
+COLLECTION = "rssi_telemetry"
+
+
+def ensure_collection():
+    """시계열 컬렉션을 만듭니다. 이미 있으면 그대로 둡니다 (MongoDB 5.0 이상)."""
+    db = mongo.get_db()
+    try:
+        db.create_collection(
+            COLLECTION,
+            timeseries={"timeField": "ts", "metaField": "meta", "granularity": "seconds"}
+        )
+    except CollectionInvalid:
+        pass
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _sample_doc(sample, meta):
+    """[ts, rssi, state] 샘플 하나를 문서로 바꿉니다. ts / rssi가 숫자가 아니면 None."""
+    if not isinstance(sample, (list, tuple)) or not 1 <= len(sample) <= 3:
+        return None
+    ts, rssi, state = (list(sample) + [None, None])[:3]
+    if not _number(ts) or not (rssi is None or _number(rssi)):
+        return None
+    try:
+        timestamp = datetime.datetime.utcfromtimestamp(ts)
+    except (OverflowError, OSError, ValueError):
+        return None  # 범위를 벗어난 시각
+    return {
+        "ts": timestamp,
+        "meta": meta,
+        "rssi": None if rssi is None else float(rssi),
+        "state": state if state is None or isinstance(state, str) else str(state)
+    }
+
+
+class TelemetryWriter:
+    """rssi_batch 샘플 버퍼. max_batch 개가 모이거나 flush_interval 초마다 insert_many로 저장합니다."""
+    def __init__(self, max_batch=1000, flush_interval=1.0, max_buffer=50000):
+        self.collection = mongo.get_collection(COLLECTION)
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer  # 저장 실패가 이어질 때 버퍼에 남겨 두는 최대 샘플 수
+        self._docs = []
+        self._task = None
+        self._flush_tasks = set()
+        self.inserted = 0  # 저장된 샘플 수 (누적)
+        self.dropped = 0   # 버퍼가 넘치거나 저장할 수 없어 버린 샘플 수 (누적)
+
+    def add_batch(self, drone_id, data):
+        """rssi_batch 메시지 하나를 버퍼에 넣습니다. samples: [[ts(초), rssi, state], ...]
+        형식이 잘못된 샘플은 건너뛰고 dropped에 셉니다 (예외를 내지 않음). 버퍼에 넣은 샘플 수를 반환합니다.
+        """
+        meta = {"drone_id": drone_id, "mac": data.get("mac"), "session": data.get("session")}
+        samples = data.get("samples") or []
+        if not isinstance(samples, list):
+            self.dropped += 1
+            return 0
+        accepted = 0
+        for sample in samples:
+            doc = _sample_doc(sample, meta)
+            if doc is None:
+                self.dropped += 1
+                continue
+            self._docs.append(doc)
+            accepted += 1
+        if len(self._docs) >= self.max_batch:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+        return accepted
+
+    def _requeue(self, docs):
+        """저장하지 못한 샘플을 버퍼 앞에 되돌립니다. max_buffer를 넘으면 오래된 샘플부터 버립니다."""
+        self._docs = docs + self._docs
+        excess = len(self._docs) - self.max_buffer
+        if excess > 0:
+            self.dropped += excess
+            del self._docs[:excess]
+
+    async def flush(self):
+        if not self._docs:
+            return 0
+        docs, self._docs = self._docs, []
+        try:
+            await mongo.run(self.collection.insert_many, docs, ordered=False)
+        except BulkWriteError as e:
+            # 일부만 저장됨. 실패한 샘플은 문서 자체의 문제이므로 다시 넣지 않음
+            inserted = e.details.get("nInserted", 0)
+            self.inserted += inserted
+            self.dropped += len(docs) - inserted
+            print(f"❌ 텔레메트리 일부 저장 실패 ({len(docs) - inserted}/{len(docs)}건): {e}")
+            return inserted
+        except Exception as e:
+            self._requeue(docs)
+            print(f"❌ 텔레메트리 저장 실패 ({len(docs)}건, 다음 flush에 다시 시도): {e}")
+            return 0
+        self.inserted += len(docs)
+        return len(docs)
+
+    async def _run(self):
+        try:
+            await mongo.run(ensure_collection)
+        except Exception as e:
+            print(f"❌ 텔레메트리 컬렉션 생성 실패: {e}")
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+# ---------------------------- 조회 ----------------------------
+
+def list_sessions(drone_id=None, mac=None, limit=50):
+    """최근 추적 세션 목록 (세션별 시작/끝 시각, 샘플 수)."""
+    match = {}
+    if drone_id:
+        match["meta.drone_id"] = drone_id
+    if mac:
+        match["meta.mac"] = mac
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$meta.session",
+            "drone_id": {"$first": "$meta.drone_id"},
+            "mac": {"$first": "$meta.mac"},
+            "start": {"$min": "$ts"},
+            "end": {"$max": "$ts"},
+            "samples": {"$sum": 1}
+        }},
+        {"$sort": {"end": -1}},
+        {"$limit": limit},
+        {"$project": {"_id": 0, "session": "$_id", "drone_id": 1, "mac": 1, "start": 1, "end": 1, "samples": 1}}
+    ]
+    sessions = list(mongo.get_collection(COLLECTION).aggregate(pipeline))
+    for s in sessions:
+        s["start"] = s["start"].isoformat()
+        s["end"] = s["end"].isoformat()
+    return {"sessions": sessions}, 200
+
+
+def get_series(session, bucket_s=1, start=None, end=None):
+    """세션의 RSSI를 bucket_s 초 구간으로 줄여 min/mean/max/count를 반환합니다."""
+    if bucket_s < 1:
+        return {"error": "bucket은 1초 이상이어야 합니다."}, 400
+    match = {"meta.session": session}
+    if start or end:
+        match["ts"] = {}
+        if start:
+            match["ts"]["$gte"] = start
+        if end:
+            match["ts"]["$lt"] = end
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"ts": 1}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$ts", "unit": "second", "binSize": int(bucket_s)}},
+            "min": {"$min": "$rssi"},
+            "mean": {"$avg": "$rssi"},
+            "max": {"$max": "$rssi"},
+            "count": {"$sum": 1},
+            "received": {"$sum": {"$cond": [{"$eq": ["$rssi", None]}, 0, 1]}},
+            "state": {"$last": "$state"}
+        }},
+        {"$sort": {"_id": 1}}
+    ]
+    points = []
+    for doc in mongo.get_collection(COLLECTION).aggregate(pipeline):
+        doc["t"] = doc.pop("_id").isoformat()
+        points.append(doc)
+    if not points:
+        return {"error": "해당 세션을 찾을 수 없습니다."}, 404
+    return {"session": session, "bucket_s": int(bucket_s), "points": points}, 200